@@ -0,0 +1,343 @@
+"""Usage: benchmark.py [options]
+
+Runs headless benchmarks of the simulation core: full network steps over a
+matrix of grid sizes, road densities and vehicle counts, plus
+microbenchmarks of core data structures.
+
+Options:
+  --output=<path>     Write results as json to this path
+  --compare=<path>    Compare results against a baseline json written with
+                      --output. Exits with status 1 on regressions.
+  --threshold=<pct>   Percent slowdown counted as a regression [default: 10]
+  --steps=<n>         Timed steps per scenario [default: 200]
+  --filter=<text>     Only run benchmarks with names containing text
+  --quick             Only run the smallest scenario matrix
+
+Exits with status 1 if a benchmark misses its minimum speedup over another
+(see `SPEEDUPS`), whenever both ran.
+"""
+
+import dataclasses
+import itertools
+import json
+import platform
+import random
+import sys
+from datetime import datetime
+from time import perf_counter_ns
+
+import numpy as np
+from docopt import docopt
+
+from config import config
+
+import scenarios
+from physics.collision import CollisionTileGrid
+from physics.pathing import LinearTrajectory
+from physics.rect import Rect
+from road.grid import TileGrid
+
+GRID_SIZES = (10, 25, 50)
+ROAD_DENSITIES = (0.25, 1.0)
+VEHICLE_COUNTS = (100, 1000)
+
+QUICK_GRID_SIZES = (10,)
+QUICK_VEHICLE_COUNTS = (100,)
+
+# Untimed steps to run before measuring each scenario
+WARMUP_STEPS = 20
+
+# Metrics compared against a baseline, and whether higher values are better
+COMPARED_METRICS = {
+    "steps_per_sec": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "ns_per_op": False,
+}
+
+# Minimum speedups of microbenchmarks over others, as
+# {name: (baseline name, factor)}. Set well below what's measured, since
+# both are timed on the same machine but can still be noisy.
+SPEEDUPS = {
+    # Measured about 4-7x on the 25x25 grid
+    "micro/shortest_path_hierarchy": ("micro/shortest_path", 3),
+}
+
+
+#############
+# Scenarios #
+#############
+
+
+def scenario_matrix(steps, quick=False):
+    """Return scenarios for every combination of benchmark parameters"""
+    sizes = QUICK_GRID_SIZES if quick else GRID_SIZES
+    counts = QUICK_VEHICLE_COUNTS if quick else VEHICLE_COUNTS
+    return [
+        scenarios.Scenario(
+            name=f"step/grid{size}_density{density}_vehicles{vehicles}",
+            grid_width=size,
+            grid_height=size,
+            road_density=density,
+            vehicles=vehicles,
+            steps=steps,
+        )
+        for size, density, vehicles in itertools.product(
+            sizes, ROAD_DENSITIES, counts
+        )
+    ]
+
+
+def bench_scenario(scenario):
+    """Time `RoadNetwork.step` over a headless scenario run"""
+    network = scenarios.build_network(config, scenario)
+
+    warmup = dataclasses.replace(scenario, steps=WARMUP_STEPS)
+    scenarios.run(config, warmup, network=network)
+    step_times = scenarios.run(config, scenario, network=network).step_times
+
+    p50, p95, p99 = np.percentile(step_times, [50, 95, 99]) * 1000
+    return {
+        "steps_per_sec": len(step_times) / step_times.sum(),
+        "mean_ms": step_times.mean() * 1000,
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+    }
+
+
+###################
+# Microbenchmarks #
+###################
+
+
+def bench_micro(setup, run, n_ops, repeat=20):
+    """Time `run(setup())`, which performs `n_ops` operations.
+
+    Setup is excluded from timing.
+    """
+    per_op = np.empty(repeat)
+    for i in range(repeat):
+        state = setup()
+        start = perf_counter_ns()
+        run(state)
+        per_op[i] = (perf_counter_ns() - start) / n_ops
+
+    return {
+        "ns_per_op": float(np.median(per_op)),
+        "p95_ns_per_op": float(np.percentile(per_op, 95)),
+        "ops_per_sec": 1e9 / float(np.median(per_op)),
+    }
+
+
+def micro_benchmarks():
+    """Return {name: (setup, run, n_ops)} for all microbenchmarks"""
+    rng = random.Random(0)
+    n_objs = 1000
+    tw, th = config.TILE_WIDTH, config.TILE_HEIGHT
+    grid_size = 50
+    world = grid_size * tw
+
+    rects = [
+        Rect(rng.uniform(0, world - 8), rng.uniform(0, world - 8), 8, 8)
+        for _ in range(n_objs)
+    ]
+
+    def collision_grid():
+        ctg = CollisionTileGrid(grid_size, grid_size, tw, th)
+        for id, rect in enumerate(rects):
+            ctg.upsert_object(id, rect)
+        return ctg
+
+    def upsert_all(ctg):
+        for id, rect in enumerate(rects):
+            ctg.upsert_object(id, rect)
+
+    def check_all(ctg):
+        for id in range(n_objs):
+            ctg.has_collision(id)
+
+    paths_scenario = scenarios.Scenario(
+        "paths", 25, 25, road_density=1.0, vehicles=0
+    )
+    network = scenarios.build_network(config, paths_scenario)
+    nodes = list(network.graph.G.nodes)
+    pairs = [(rng.choice(nodes), rng.choice(nodes)) for _ in range(20)]
+
+    def shortest_paths(graph):
+        for source, target in pairs:
+            graph.shortest_path(source, target)
+
+    hierarchy_network = []
+
+    def hierarchy():
+        # Built once, on a separate network so `micro/shortest_path` still
+        # searches the graph
+        if not hierarchy_network:
+            hierarchy_network.append(
+                scenarios.build_network(config, paths_scenario)
+            )
+            hierarchy_network[0].graph.build_hierarchy()
+        return hierarchy_network[0].graph
+
+    def sample_nodes(rng):
+        network.node_index.sample_uniform(rng, n_objs)
+
+    def fill_grid(grid):
+        grid.add_tile(0, 0, restrict_to_neighbors=False)
+        for r in range(grid.h):
+            for c in range(grid.w):
+                grid.add_tile(r, c)
+
+    def trajectories(diagonal):
+        def setup():
+            return [
+                LinearTrajectory(0, 0, 100, 100 if diagonal else 0)
+                for _ in range(n_objs)
+            ]
+
+        return setup
+
+    def move_all(trajectories):
+        for trajectory in trajectories:
+            trajectory.move(1)
+
+    return {
+        "micro/collision_upsert": (collision_grid, upsert_all, n_objs),
+        "micro/collision_has_collision": (collision_grid, check_all, n_objs),
+        "micro/shortest_path": (
+            lambda: network.graph,
+            shortest_paths,
+            len(pairs),
+        ),
+        "micro/shortest_path_hierarchy": (
+            hierarchy,
+            shortest_paths,
+            len(pairs),
+        ),
+        "micro/node_index_sample": (
+            lambda: np.random.default_rng(0),
+            sample_nodes,
+            n_objs,
+        ),
+        "micro/tile_grid_add_tile": (
+            lambda: TileGrid(100, 100),
+            fill_grid,
+            100 * 100,
+        ),
+        "micro/trajectory_move_straight": (
+            trajectories(diagonal=False),
+            move_all,
+            n_objs,
+        ),
+        "micro/trajectory_move_diagonal": (
+            trajectories(diagonal=True),
+            move_all,
+            n_objs,
+        ),
+    }
+
+
+##########
+# Output #
+##########
+
+
+def compare(results, baseline, threshold):
+    """Print differences from baseline results.
+
+    returns: names of regressed metrics
+    """
+    regressions = []
+    print(f"\n{'benchmark':<52} {'metric':<14} {'baseline':>10} {'now':>10}")
+    for name, metrics in results.items():
+        if name not in baseline:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            if metric not in metrics or metric not in baseline[name]:
+                continue
+            old, new = baseline[name][metric], metrics[metric]
+            change = (new - old) / old if old else 0
+            slowdown = -change if higher_is_better else change
+            flag = ""
+            if slowdown * 100 > threshold:
+                flag = "  REGRESSION"
+                regressions.append(f"{name} {metric}")
+            print(
+                f"{name:<52} {metric:<14} {old:>10.3f} {new:>10.3f}"
+                f" {change:+7.1%}{flag}"
+            )
+    return regressions
+
+
+def check_speedups(results):
+    """Print speedups in `SPEEDUPS` for benchmarks that ran.
+
+    returns: names of benchmarks missing their minimum speedup
+    """
+    missed = []
+    for name, (baseline, factor) in SPEEDUPS.items():
+        if name not in results or baseline not in results:
+            continue
+        speedup = results[baseline]["ns_per_op"] / results[name]["ns_per_op"]
+        flag = ""
+        if speedup < factor:
+            flag = "  TOO SLOW"
+            missed.append(name)
+        print(
+            f"{name} is {speedup:.1f}x faster than {baseline}"
+            f" (minimum {factor}x){flag}"
+        )
+    return missed
+
+
+def main(arguments):
+    steps = int(arguments["--steps"])
+    name_filter = arguments["--filter"] or ""
+
+    results = {}
+
+    for scenario in scenario_matrix(steps, quick=arguments["--quick"]):
+        if name_filter in scenario.name:
+            print(f"Running {scenario.name}...", file=sys.stderr)
+            results[scenario.name] = bench_scenario(scenario)
+
+    for name, (setup, run, n_ops) in micro_benchmarks().items():
+        if name_filter in name:
+            print(f"Running {name}...", file=sys.stderr)
+            results[name] = bench_micro(setup, run, n_ops)
+
+    output = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "steps": steps,
+        },
+        "results": results,
+    }
+
+    if arguments["--output"]:
+        with open(arguments["--output"], "w") as f:
+            json.dump(output, f, indent=2)
+    else:
+        print(json.dumps(output, indent=2))
+
+    status = 1 if check_speedups(results) else 0
+
+    if arguments["--compare"]:
+        with open(arguments["--compare"]) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(
+            results, baseline, float(arguments["--threshold"])
+        )
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) found.")
+            return 1
+
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main(docopt(__doc__)))
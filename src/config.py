@@ -1,13 +1,133 @@
-from dynaconf import settings, Validator
+"""Game settings.
+
+Settings are loaded from settings.toml with dynaconf, validated, and compiled
+once into an immutable `Config`. Reading an attribute of `Config` is a plain
+slot read, so it's safe to use in hot loops.
+
+`config` is loaded on first access, so importing `Config` for type hints or
+unpickling doesn't pull in dynaconf.
+"""
+
+from dataclasses import dataclass, fields
+
+
+class _FrozenSlots:
+    """Pickle support for frozen dataclasses with `__slots__`.
+
+    Default unpickling sets slots with `setattr`, which frozen dataclasses
+    forbid.
+    """
+
+    __slots__ = ()
+
+    def __getstate__(self):
+        return [getattr(self, f.name) for f in fields(self)]
+
+    def __setstate__(self, state):
+        for f, value in zip(fields(self), state):
+            object.__setattr__(self, f.name, value)
+
+
+@dataclass(frozen=True)
+class DebugConfig(_FrozenSlots):
+    __slots__ = ("DISPLAY_TRAVEL_EDGES", "DISPLAY_VEHICLE_COLLISIONS")
+
+    DISPLAY_TRAVEL_EDGES: bool
+    DISPLAY_VEHICLE_COLLISIONS: bool
+
+
+@dataclass(frozen=True)
+class Config(_FrozenSlots):
+    __slots__ = (
+        "GRID_WIDTH",
+        "GRID_HEIGHT",
+        "TILE_WIDTH",
+        "TILE_HEIGHT",
+        "ROAD_WIDTH",
+        "VEHICLE_STOP_WAIT_TIME",
+        "INTERSECTION_CLEAR_TIME",
+        "EVENT_DRIVEN_TRAFFIC",
+        "COLLISION_CELL_SIZE",
+        "COLLISION_HIERARCHY",
+        "REROUTE_INTERVAL",
+        "CONGESTION_VEHICLE_COST",
+        "REROUTE_THRESHOLD",
+        "REROUTE_BUDGET",
+        "RANDOMIZE_VEHICLE_COLOR",
+        "VEHICLE_RADIUS",
+        "FRAME_BUDGET",
+        "STRESS_TEST",
+        "RECORD",
+        "RECORDING_PATH",
+        "METRICS_PORT",
+        "TELEMETRY_PORT",
+        "DEBUG",
+    )
 
-settings.validators.register(
     # Grid
-    Validator("TILE_WIDTH", condition=lambda x: x % 2 == 0),
-    Validator("TILE_HEIGHT", condition=lambda x: x % 2 == 0),
-    Validator("TILE_HEIGHT", eq=settings.TILE_WIDTH),
-    Validator("ROAD_WIDTH", condition=lambda x: x % 2 == 0),
-)
+    GRID_WIDTH: int
+    GRID_HEIGHT: int
+    TILE_WIDTH: int
+    TILE_HEIGHT: int
+    ROAD_WIDTH: int
+    # Traffic
+    VEHICLE_STOP_WAIT_TIME: float
+    INTERSECTION_CLEAR_TIME: float
+    EVENT_DRIVEN_TRAFFIC: bool
+    COLLISION_CELL_SIZE: int
+    COLLISION_HIERARCHY: bool
+    # Routing
+    REROUTE_INTERVAL: float
+    CONGESTION_VEHICLE_COST: float
+    REROUTE_THRESHOLD: float
+    REROUTE_BUDGET: float
+    # Graphics
+    RANDOMIZE_VEHICLE_COLOR: bool
+    VEHICLE_RADIUS: int
+    FRAME_BUDGET: float
+    # Testing
+    STRESS_TEST: bool
+    # Recording
+    RECORD: bool
+    RECORDING_PATH: str
+    # Instrumentation
+    METRICS_PORT: int
+    TELEMETRY_PORT: int
+    # Debug
+    DEBUG: DebugConfig
+
+    @classmethod
+    def from_settings(cls, settings) -> "Config":
+        """Compile a `Config` from validated dynaconf settings"""
+        values = {
+            f.name: settings[f.name] for f in fields(cls) if f.name != "DEBUG"
+        }
+        debug = DebugConfig(
+            **{f.name: settings.DEBUG[f.name] for f in fields(DebugConfig)}
+        )
+        return cls(DEBUG=debug, **values)
+
+
+def load_config() -> Config:
+    """Load, validate and compile settings from settings.toml"""
+    from dynaconf import settings, Validator
+
+    settings.validators.register(
+        # Grid
+        Validator("TILE_WIDTH", condition=lambda x: x % 2 == 0),
+        Validator("TILE_HEIGHT", condition=lambda x: x % 2 == 0),
+        Validator("TILE_HEIGHT", eq=settings.TILE_WIDTH),
+        Validator("ROAD_WIDTH", condition=lambda x: x % 2 == 0),
+    )
+
+    settings.validators.validate()
+
+    return Config.from_settings(settings)
 
-settings.validators.validate()
 
-config = settings
+def __getattr__(name):
+    # Load `config` lazily, on first access
+    if name == "config":
+        globals()["config"] = load_config()
+        return globals()["config"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,11 +1,18 @@
+import numpy as np
 import pygame
 import sys
+from pathlib import Path
+from time import perf_counter_ns
 
 from config import config
 
 import input
+import scenarios
+from governor import FrameGovernor
 from road import graphics as road_gfx
 from road.network import RoadNetwork
+from road.recording import TrafficRecorder
+from road.telemetry import TelemetryServer
 
 """
 This is the main file for game logic. Code here may be messy and break good
@@ -16,6 +23,27 @@ testing.
 WINDOW_WIDTH = config.TILE_WIDTH * config.GRID_WIDTH
 WINDOW_HEIGHT = config.TILE_HEIGHT * config.GRID_HEIGHT
 
+CAPTION = "Traffic Simulator"
+
+# Longest tick stepped at once, in frame budgets (or 60 FPS frames without
+# one). Slower frames slow the simulation down instead of making vehicles
+# jump.
+MAX_TICK_FRAMES = 2
+
+# Share of the frame budget for each phase of a frame, and the timers that
+# make it up. See `create_governor()`.
+FRAME_PHASES = {
+    "step": (
+        ["intersection_step", "vehicle_step", "meso_step", "collision_upsert"],
+        0.45,
+    ),
+    "reroute": (["reroute"], 0.15),
+    "render": (["render_update", "render_draw", "display_flip"], 0.4),
+}
+
+# DEMO: picks where vehicles spawn and travel to
+rng = np.random.default_rng()
+
 
 def init():
     """Initialize game window"""
@@ -26,7 +54,7 @@ def init():
     game_window = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
 
     # Set title
-    pygame.display.set_caption("Traffic Simulator")
+    pygame.display.set_caption(CAPTION)
 
     # Initialize clock
     clock = pygame.time.Clock()
@@ -50,65 +78,177 @@ def game_loop(window, clock, stress_test: bool):
     """Game loop"""
 
     # Create road network
-    network = RoadNetwork(config, config.GRID_WIDTH, config.GRID_HEIGHT)
+    network = RoadNetwork(
+        config,
+        config.GRID_WIDTH,
+        config.GRID_HEIGHT,
+        event_driven=config.EVENT_DRIVEN_TRAFFIC,
+        collision_cell_size=config.COLLISION_CELL_SIZE,
+        collision_hierarchy=config.COLLISION_HIERARCHY,
+    )
+
+    # Stream updates to local clients
+    telemetry = None
+    if config.TELEMETRY_PORT:
+        telemetry = TelemetryServer(config.TELEMETRY_PORT)
+        telemetry.subscribe(network.bus)
 
     # Create road screen (for rendering)
-    road_screen = road_gfx.RoadScreen(config, network)
+    road_screen = road_gfx.RoadScreen(config, network.bus.subscribe())
     road_screen.clear(window, road_screen.bg.image)
 
     # DEMO
     if stress_test:
-        import random
-
         network.add_road(0, 0, restrict_to_neighbors=False)
         # Fill entire network grid
         for r in range(network.h):
             for c in range(network.w):
                 network.add_road(r, c, restrict_to_neighbors=True)
         # Add a bunch of vehicles
-        for n in range(1000):
-            node = random.choice(list(network.graph.G.nodes))
+        for node in network.node_index.sample_uniform(rng, 1000):
             network.traffic.add_vehicle(node)
     else:
         network.add_road(
             network.h // 2, network.w // 2, restrict_to_neighbors=False
         )
 
-    while 1:
-        # Get loop time, convert milliseconds to seconds
-        tick = clock.tick(60) / 1000
+    instruments = network.instruments
+    render_update_timer = instruments.timer("render_update")
+    render_draw_timer = instruments.timer("render_draw")
+    display_flip_timer = instruments.timer("display_flip")
+    if config.METRICS_PORT:
+        instruments.serve(config.METRICS_PORT)
+
+    governor = None
+    if config.FRAME_BUDGET:
+        governor = create_governor(config, network, road_screen)
+    max_tick = MAX_TICK_FRAMES * (config.FRAME_BUDGET or 1000 / 60) / 1000
+    frame = 0
+    governor_level = 0
+
+    recorder = None
+    if config.RECORD:
+        Path(config.RECORDING_PATH).parent.mkdir(parents=True, exist_ok=True)
+        recorder = TrafficRecorder(config.RECORDING_PATH, network)
+
+    try:
+        while 1:
+            # Get loop time, convert milliseconds to seconds
+            tick = min(clock.tick(60) / 1000, max_tick)
+            frame_start = perf_counter_ns()
+
+            # Process user and window inputs
+            # IMPORTANT: do not remove -- this enables us to close the game
+            process_input(config, window, network)
+
+            # # Render mouse grid cursor
+            # display_tile_cursor(window)
+
+            # Step road network one tick
+            network.step(tick)
+            if recorder:
+                recorder.capture(tick)
+
+            # DEMO
+            randomize_vehicle_paths(window, network)
+
+            # Update our display, less often if frames run long
+            render_interval = 1
+            if governor:
+                if governor.is_shed("quarter_render_rate"):
+                    render_interval = 4
+                elif governor.is_shed("half_render_rate"):
+                    render_interval = 2
+            if frame % render_interval == 0:
+                with render_update_timer:
+                    road_screen.update()
+                if telemetry:
+                    telemetry.end_frame(tick)
+                with render_draw_timer:
+                    rects = road_screen.draw(window)
+                with display_flip_timer:
+                    pygame.display.update(rects)
+            frame += 1
+
+            instruments.end_tick()
+            if governor:
+                governor.end_frame(perf_counter_ns() - frame_start)
+                if governor.level != governor_level:
+                    governor_level = governor.level
+                    display_degradations(governor)
+    finally:
+        if recorder:
+            recorder.close()
+        if telemetry:
+            telemetry.close()
+
+
+def create_governor(config, network, road_screen) -> FrameGovernor:
+    """Create a governor that sheds optional work once frames take longer
+    than `FRAME_BUDGET`. Work is shed in order, for the phases over their
+    share of the budget: debug overlays, then rendering every frame, then
+    time spent rerouting.
+    """
+    governor = FrameGovernor(config.FRAME_BUDGET, network.instruments)
+    for name, (timers, share) in FRAME_PHASES.items():
+        governor.add_phase(name, timers, share)
+    debug = config.DEBUG
+
+    if debug.DISPLAY_TRAVEL_EDGES or debug.DISPLAY_VEHICLE_COLLISIONS:
+
+        def hide_debug_overlays():
+            road_screen.show_travel_edges(False)
+            network.traffic.display_collisions = False
+            road_screen.clear_collisions()
+
+        def show_debug_overlays():
+            road_screen.show_travel_edges(debug.DISPLAY_TRAVEL_EDGES)
+            network.traffic.display_collisions = (
+                debug.DISPLAY_VEHICLE_COLLISIONS
+            )
+
+        governor.add(
+            "debug_overlays",
+            shed=hide_debug_overlays,
+            restore=show_debug_overlays,
+        )
+
+    governor.add("half_render_rate", phase="render")
+    governor.add("quarter_render_rate", phase="render")
 
-        # Process user and window inputs
-        # IMPORTANT: do not remove -- this enables us to close the game
-        process_input(config, window, network)
+    def set_reroute_budget(fraction):
+        network.router.budget = config.REROUTE_BUDGET * fraction
 
-        # # Render mouse grid cursor
-        # display_tile_cursor(window)
+    governor.add(
+        "half_reroute_budget",
+        phase="reroute",
+        shed=lambda: set_reroute_budget(0.5),
+        restore=lambda: set_reroute_budget(1),
+    )
+    governor.add(
+        "quarter_reroute_budget",
+        phase="reroute",
+        shed=lambda: set_reroute_budget(0.25),
+        restore=lambda: set_reroute_budget(0.5),
+    )
 
-        # Step road network one tick
-        network.step(tick)
+    return governor
 
-        # DEMO
-        randomize_vehicle_paths(window, network)
 
-        # Update our display
-        road_screen.update()
-        rects = road_screen.draw(window)
-        pygame.display.update(rects)
+def display_degradations(governor):
+    """Show work shed by the governor in the window title"""
+    active = governor.active
+    caption = CAPTION
+    if active:
+        caption += f" (shedding {', '.join(active)})"
+    pygame.display.set_caption(caption)
 
 
 # DEMO
 def randomize_vehicle_paths(window, network):
-    # Send our sim vehicles on random errands
-    import random
-
-    if not list(network.graph.G.nodes):
-        return
-    for v in network.traffic.vehicles:
-        if not v._path:
-            random_node = random.choice(list(network.graph.G.nodes))
-            path = network.graph.shortest_path(v._last_t_node, random_node)
-            v.set_path(path)
+    # Send our sim vehicles on random errands. Removed roads may leave some
+    # errands unreachable, which are retried next frame.
+    scenarios.assign_random_paths(network, rng)
 
 
 #########
@@ -127,6 +267,14 @@ def process_input(config, window, network):
             event.type == pygame.MOUSEMOTION and event.buttons[0] == 1
         ):
             process_mouse_button_down(config, window, network)
+        # Remove road tiles when user presses and holds right mouse button
+        elif (event.type == pygame.MOUSEBUTTONDOWN and event.button == 3) or (
+            event.type == pygame.MOUSEMOTION and event.buttons[2] == 1
+        ):
+            r, c = input.mouse_coords_to_grid_index(
+                config.TILE_WIDTH, config.TILE_HEIGHT
+            )
+            network.remove_road(r, c)
 
 
 def process_mouse_button_down(config, window, network):
@@ -138,10 +286,8 @@ def process_mouse_button_down(config, window, network):
 
     # DEMO
     if not config.STRESS_TEST:
-        import random
-
-        if road_added and random.random() < 0.5:
-            node = random.choice(list(network.graph.G.nodes))
+        if road_added and rng.random() < 0.5:
+            (node,) = network.node_index.sample_uniform(rng, 1)
             network.traffic.add_vehicle(node)
 
 
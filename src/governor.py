@@ -0,0 +1,209 @@
+"""Frame budget governor: keeps frames on time by shedding optional work.
+
+Frames are broken down into phases, each made up of instrumentation timers
+and given a share of the budget. Optional work is registered as named
+degradations, in the order it should be shed, each relieving a phase. Once
+the smoothed frame time goes over budget, the first degradation not yet shed
+is shed whose phase is over its share. Degradations are restored, last shed
+first, once there's room in the budget for the time they saved:
+
+    governor = FrameGovernor(16, instruments)
+    governor.add_phase("render", ["render_update", "render_draw"], 0.4)
+    governor.add("debug_overlays", shed=hide_overlays, restore=show_overlays)
+    governor.add("half_render_rate", phase="render")
+    ...
+    while 1:
+        start = perf_counter_ns()
+        ...
+        if governor.is_shed("half_render_rate") ...
+        governor.end_frame(perf_counter_ns() - start)
+
+After each change the governor waits `settle_frames` for the frame time to
+settle, so the effect of one change is measured before making the next.
+"""
+
+from collections import namedtuple
+from typing import Callable, Dict, Iterable, List
+
+from instrumentation import Instrumentation
+
+Degradation = namedtuple("Degradation", ["name", "phase", "shed", "restore"])
+Phase = namedtuple("Phase", ["timers", "budget_ms"])
+
+
+class FrameGovernor:
+    """Sheds and restores degradations to keep frame times within a budget.
+
+    budget_ms     - frame time budget, in milliseconds, of work done each
+                    frame, less time spent waiting for the next frame
+    instruments   - phase timers to break frame times down by, read after
+                    `Instrumentation.end_tick()`. The number of degradations
+                    shed is reported to it as the `governor_level` gauge.
+    headroom      - fraction of the budget frames must fit in, with shed
+                    work restored, before it's restored
+    smoothing     - weight of each new frame in the smoothed frame time
+    settle_frames - frames to wait after a change before the next one
+    """
+
+    def __init__(
+        self,
+        budget_ms: float,
+        instruments: Instrumentation = None,
+        headroom=0.8,
+        smoothing=0.1,
+        settle_frames=30,
+    ):
+        self.budget_ms = budget_ms
+        self.instruments = instruments or Instrumentation()
+        self.headroom = headroom
+        self.smoothing = smoothing
+        self.settle_frames = settle_frames
+
+        # In shedding order
+        self.degradations: List[Degradation] = []
+        # Indexes of the degradations shed, in the order they were shed
+        self._shed: List[int] = []
+
+        self.phases: Dict[str, Phase] = {}
+        # Smoothed frame time, and time of each phase, in milliseconds
+        self.frame_ms = 0
+        self.phase_ms: Dict[str, float] = {}
+
+        # Frame time saved by shedding each degradation, in milliseconds,
+        # measured once shedding it settled
+        self.saved_ms: Dict[str, float] = {}
+        self._settle = 0
+        # Frame time just before the last shed
+        self._before_shed_ms = None
+
+        self._level_gauge = self.instruments.gauge("governor_level")
+
+    def add_phase(self, name, timers: Iterable[str], share: float):
+        """Measure phase `name` as the time spent in `timers` each frame,
+        against `share` of the frame budget
+        """
+        self.phases[name] = Phase(
+            [self.instruments.timer(timer) for timer in timers],
+            self.budget_ms * share,
+        )
+        self.phase_ms[name] = 0
+
+    def add(
+        self,
+        name,
+        phase: str = None,
+        shed: Callable[[], None] = None,
+        restore: Callable[[], None] = None,
+    ):
+        """Register the next degradation to shed, relieving `phase`.
+        Degradations without a phase are shed whichever phase is over.
+        Degradations without callbacks can be checked for with
+        `is_shed()`.
+        """
+        self.degradations.append(Degradation(name, phase, shed, restore))
+
+    @property
+    def level(self) -> int:
+        """Number of degradations currently shed"""
+        return len(self._shed)
+
+    @property
+    def active(self) -> List[str]:
+        """Names of the degradations currently shed, in the order they
+        were shed
+        """
+        return [self.degradations[i].name for i in self._shed]
+
+    def over_budget(self) -> List[str]:
+        """Names of the phases currently over their share of the budget"""
+        return [
+            name
+            for name, phase in self.phases.items()
+            if self.phase_ms[name] > phase.budget_ms
+        ]
+
+    def is_shed(self, name) -> bool:
+        """Whether degradation `name` is currently shed"""
+        return name in self.active
+
+    def end_frame(self, frame_ns):
+        """Record a frame's time, shedding or restoring work as needed.
+
+        frame_ns - time spent working on the frame, in nanoseconds
+        """
+        alpha = self.smoothing
+        self.frame_ms += alpha * (frame_ns / 1e6 - self.frame_ms)
+        phase_ms = self.phase_ms
+        for name, phase in self.phases.items():
+            ms = sum(timer.last_tick_ns for timer in phase.timers) / 1e6
+            phase_ms[name] += alpha * (ms - phase_ms[name])
+
+        if self._settle:
+            self._settle -= 1
+            if not self._settle and self._before_shed_ms is not None:
+                name = self.degradations[self._shed[-1]].name
+                saved = max(self._before_shed_ms - self.frame_ms, 0)
+                self.saved_ms[name] = saved
+                self._before_shed_ms = None
+            return
+
+        if self.frame_ms > self.budget_ms:
+            index = self._next_to_shed()
+            if index is not None:
+                self._shed_degradation(index)
+        elif self._shed:
+            name = self.degradations[self._shed[-1]].name
+            expected = self.frame_ms + self.saved_ms.get(name, 0)
+            if expected < self.budget_ms * self.headroom:
+                self._restore()
+
+    def _next_to_shed(self):
+        """Index of the first degradation not shed that relieves a phase
+        over budget. If none does, e.g. when the time goes to work outside
+        of any phase, the first not shed. None once everything is shed.
+        """
+        remaining = [
+            i for i in range(len(self.degradations)) if i not in self._shed
+        ]
+        if not remaining:
+            return None
+        over = self.over_budget()
+        for i in remaining:
+            phase = self.degradations[i].phase
+            if phase is None or phase in over:
+                return i
+        return remaining[0]
+
+    def _shed_degradation(self, index):
+        degradation = self.degradations[index]
+        if degradation.shed:
+            degradation.shed()
+        self._shed.append(index)
+        self._level_gauge.set(self.level)
+        self._before_shed_ms = self.frame_ms
+        self._settle = self.settle_frames
+
+    def _restore(self):
+        degradation = self.degradations[self._shed.pop()]
+        if degradation.restore:
+            degradation.restore()
+        self._level_gauge.set(self.level)
+        self._settle = self.settle_frames
+
+    def report(self) -> dict:
+        """Return frame and phase times against their budgets, active
+        degradations and the time each saved, as a json-serializable dict
+        """
+        return {
+            "budget_ms": self.budget_ms,
+            "frame_ms": self.frame_ms,
+            "phases": {
+                name: {
+                    "ms": self.phase_ms[name],
+                    "budget_ms": phase.budget_ms,
+                }
+                for name, phase in self.phases.items()
+            },
+            "active": self.active,
+            "saved_ms": dict(self.saved_ms),
+        }
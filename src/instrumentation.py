@@ -0,0 +1,225 @@
+"""Lightweight, always-on instrumentation for simulation phases.
+
+Components grab their timers and counters once, e.g. in `__init__`, and then
+use them in the hot loop:
+
+    self._step_timer = instruments.timer("vehicle_step")
+    ...
+    with self._step_timer:
+        ...
+
+Timers are meant to wrap whole phases of a tick, not individual vehicles, so
+the cost is a couple of `perf_counter_ns()` calls per phase per tick.
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter_ns
+from typing import Dict
+
+METRIC_PREFIX = "traffic_sim"
+
+
+class PhaseTimer:
+    """Accumulates time spent in a phase, overall and per tick"""
+
+    __slots__ = (
+        "name",
+        "calls",
+        "total_ns",
+        "last_tick_ns",
+        "max_tick_ns",
+        "_tick_ns",
+        "_start",
+    )
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.total_ns = 0
+        self.last_tick_ns = 0
+        self.max_tick_ns = 0
+        self._tick_ns = 0
+        self._start = 0
+
+    def __enter__(self):
+        self._start = perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = perf_counter_ns() - self._start
+        self.calls += 1
+        self.total_ns += elapsed
+        self._tick_ns += elapsed
+
+    def end_tick(self):
+        """Close out time spent in the phase this tick"""
+        self.last_tick_ns = self._tick_ns
+        if self._tick_ns > self.max_tick_ns:
+            self.max_tick_ns = self._tick_ns
+        self._tick_ns = 0
+
+
+class Counter:
+    """Monotonically increasing count of events"""
+
+    __slots__ = ("name", "value")
+
+    def __init__(self, name):
+        self.name = name
+        self.value = 0
+
+    def inc(self, n=1):
+        self.value += n
+
+
+class Gauge:
+    """Current value of a quantity, e.g. a queue length"""
+
+    __slots__ = ("name", "value")
+
+    def __init__(self, name):
+        self.name = name
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+
+class Instrumentation:
+    """Registry of phase timers, counters and gauges for a simulation"""
+
+    def __init__(self):
+        self.ticks = 0
+        self.timers: Dict[str, PhaseTimer] = {}
+        self.counters: Dict[str, Counter] = {}
+        self.gauges: Dict[str, Gauge] = {}
+
+    def timer(self, name) -> PhaseTimer:
+        """Get or create the timer for a phase"""
+        if name not in self.timers:
+            self.timers[name] = PhaseTimer(name)
+        return self.timers[name]
+
+    def counter(self, name) -> Counter:
+        """Get or create a counter"""
+        if name not in self.counters:
+            self.counters[name] = Counter(name)
+        return self.counters[name]
+
+    def gauge(self, name) -> Gauge:
+        """Get or create a gauge"""
+        if name not in self.gauges:
+            self.gauges[name] = Gauge(name)
+        return self.gauges[name]
+
+    def end_tick(self):
+        """Mark the end of a tick. Should be called once per frame by
+        whatever owns the game loop.
+        """
+        self.ticks += 1
+        for timer in self.timers.values():
+            timer.end_tick()
+
+    def snapshot(self) -> dict:
+        """Return all current values as a json-serializable dict"""
+        return {
+            "ticks": self.ticks,
+            "phases": {
+                name: {
+                    "calls": t.calls,
+                    "total_seconds": t.total_ns / 1e9,
+                    "mean_seconds": t.total_ns / t.calls / 1e9
+                    if t.calls
+                    else 0,
+                    "last_tick_seconds": t.last_tick_ns / 1e9,
+                    "max_tick_seconds": t.max_tick_ns / 1e9,
+                }
+                for name, t in self.timers.items()
+            },
+            "counters": {
+                name: c.value for name, c in self.counters.items()
+            },
+            "gauges": {name: g.value for name, g in self.gauges.items()},
+        }
+
+    def to_json(self) -> str:
+        """Export current values as json"""
+        return json.dumps(self.snapshot())
+
+    def to_prometheus(self) -> str:
+        """Export current values in the Prometheus text exposition format"""
+        p = METRIC_PREFIX
+        lines = [
+            f"# HELP {p}_ticks_total Ticks completed.",
+            f"# TYPE {p}_ticks_total counter",
+            f"{p}_ticks_total {self.ticks}",
+        ]
+
+        phase_metrics = [
+            ("phase_seconds_total", "counter", "Time spent in phase."),
+            ("phase_calls_total", "counter", "Times phase was entered."),
+            ("phase_last_tick_seconds", "gauge", "Phase time last tick."),
+            ("phase_max_tick_seconds", "gauge", "Max phase time in a tick."),
+        ]
+        for metric, metric_type, help in phase_metrics:
+            lines.append(f"# HELP {p}_{metric} {help}")
+            lines.append(f"# TYPE {p}_{metric} {metric_type}")
+            for name, t in self.timers.items():
+                value = {
+                    "phase_seconds_total": t.total_ns / 1e9,
+                    "phase_calls_total": t.calls,
+                    "phase_last_tick_seconds": t.last_tick_ns / 1e9,
+                    "phase_max_tick_seconds": t.max_tick_ns / 1e9,
+                }[metric]
+                lines.append(f'{p}_{metric}{{phase="{name}"}} {value}')
+
+        for name, c in self.counters.items():
+            lines.append(f"# TYPE {p}_{name}_total counter")
+            lines.append(f"{p}_{name}_total {c.value}")
+
+        for name, g in self.gauges.items():
+            lines.append(f"# TYPE {p}_{name} gauge")
+            lines.append(f"{p}_{name} {g.value}")
+
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1") -> ThreadingHTTPServer:
+        """Serve metrics over http on a background thread.
+
+        GET /metrics      - Prometheus text exposition
+        GET /metrics.json - json
+
+        returns: the running server. Call `shutdown()` on it to stop serving.
+        """
+        instruments = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body = instruments.to_prometheus().encode()
+                    content_type = "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body = instruments.to_json().encode()
+                    content_type = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Don't spam stderr on every scrape
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        thread = threading.Thread(
+            target=server.serve_forever, name="metrics-server", daemon=True
+        )
+        thread.start()
+        return server
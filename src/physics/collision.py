@@ -1,36 +1,90 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Set, Tuple
-
-from pygame import Rect
+from collections import namedtuple
+from typing import Dict, Iterable, Sequence, Set, Tuple
+
+import numpy as np
+
+from .rect import Rect
+
+# Relative costs of visiting a tile and of testing a candidate object during
+# a collision check, for `CollisionTileGrid.tune()`
+_TILE_COST = 1
+_CANDIDATE_COST = 2
+
+# Keys of fine tiles start here, above the keys of any coarse tile
+_FINE_KEYS = 1 << 40
+
+# Tile layout chosen by `CollisionTileGrid.tune()`. Per-object figures are
+# estimates, from the objects tracked when it was chosen.
+#
+# tile_size            - size of (coarse) tiles
+# fine_size            - size of tiles split tiles are split into, or 0
+# split_tiles          - number of tiles split into fine tiles
+# tiles_per_object     - tiles each object is indexed in, on average
+# candidates_per_check - objects tested by each collision check, on average
+CollisionGridLayout = namedtuple(
+    "CollisionGridLayout",
+    [
+        "tile_size",
+        "fine_size",
+        "split_tiles",
+        "tiles_per_object",
+        "candidates_per_check",
+    ],
+)
 
 
 class Collidable(ABC):
     """A class that can collide with other objects."""
 
+    __slots__ = ()
+
     @abstractmethod
-    def get_collision_rect() -> Rect:
-        """Return collision box for the object as a Rect."""
+    def get_collision_rect(self, radius) -> Rect:
+        """Return collision box for the object as a Rect, for objects of
+        the given radius.
+        """
         raise NotImplementedError
 
 
 class CollisionTracker(ABC):
     """Interface for systems tracking collisions between objects."""
 
+    @abstractmethod
+    def tune(
+        self, sizes: Sequence[int], hierarchy=False
+    ) -> CollisionGridLayout:
+        """Re-index objects with whichever layout, of tile sizes in sizes,
+        makes collision checks of the objects tracked cheapest
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def layout(self) -> CollisionGridLayout:
+        """Return the current layout, with per-object figures measured from
+        the objects tracked
+        """
+        raise NotImplementedError
+
+    @abstractmethod
     def upsert_object(self, obj_id, c_obj: Rect) -> None:
         """Upserts a tracked collision object's location and dimensions"""
         raise NotImplementedError
 
+    @abstractmethod
     def remove_object(self, obj_id) -> None:
         """Removes a collision object from the tracker."""
         raise NotImplementedError
 
+    @abstractmethod
     def has_collision(self, obj_id) -> bool:
         """Returns True if the specified tracked object is colliding with
         another tracked object.
         """
         raise NotImplementedError
 
-    def colliding_objects_ids(self, obj_id) -> Set[int]:
+    @abstractmethod
+    def colliding_object_ids(self, obj_id) -> Set[int]:
         """Returns ids of tracked objects colliding with the specified
         tracked object.
         """
@@ -40,6 +94,19 @@ class CollisionTracker(ABC):
 class CollisionTileGrid(CollisionTracker):
     """A grid of collision objects for efficiently determining collisions
     between the objects.
+
+    The grid is sparse: only occupied tiles are stored, keyed by
+    `tile_key()`, and tiles are dropped once emptied. Memory is proportional
+    to the objects tracked rather than the grid's area.
+
+    Tiles in `split_tiles` are split into `fine_factor` x `fine_factor` fine
+    tiles, which objects in them are indexed by instead. `tune()` picks the
+    tile size, and which tiles to split, from the objects tracked.
+
+    Structure:
+        self.objs = {obj_id: Rect, ..}
+        self.obj2tiles = {obj_id: (tile key, ..), ..}
+        self.tile2objs = {tile key: {obj_id, ..}, ..}
     """
 
     def __init__(self, cgrid_width, cgrid_height, ctile_width, ctile_height):
@@ -49,12 +116,122 @@ class CollisionTileGrid(CollisionTracker):
         self.ctg_th = ctile_height
 
         self.objs: Dict[int, Rect] = {}
-        self.obj2tiles: Dict[int, Set[Tuple[int, int]]] = {}
-        self.tile2objs: Dict[Tuple[int, int], Set[int]] = {}
+        self.obj2tiles: Dict[int, Tuple[int, ...]] = {}
+        self.tile2objs: Dict[int, Set[int]] = {}
+
+        self.split_tiles: Set[int] = set()
+        self.fine_factor = 1
 
-        for r in range(cgrid_height):
-            for c in range(cgrid_width):
-                self.tile2objs[(r, c)] = set()
+    def tile_key(self, r, c) -> int:
+        """Pack a (row, col) tile index into an int key.
+
+        Tiles off the grid share keys with tiles on it. That only adds
+        candidates to collision checks, which compare rects exactly.
+        """
+        return r * self.ctg_gw + c
+
+    def tile_index(self, key) -> Tuple[int, int]:
+        """Unpack a key from `tile_key()` into a (row, col) tile index"""
+        return divmod(key, self.ctg_gw)
+
+    def reindex(
+        self,
+        ctile_width,
+        ctile_height,
+        split_tiles: Iterable[int] = (),
+        fine_factor=1,
+    ) -> None:
+        """Re-index all objects with a new tile size, covering the same
+        area.
+
+        split_tiles - keys, for the new tile size, of tiles to split
+        fine_factor - tiles are split into this many fine tiles per side.
+                      Must divide the tile size.
+        """
+        world_w = self.ctg_gw * self.ctg_tw
+        world_h = self.ctg_gh * self.ctg_th
+        self.ctg_tw = ctile_width
+        self.ctg_th = ctile_height
+        self.ctg_gw = -(-world_w // ctile_width)
+        self.ctg_gh = -(-world_h // ctile_height)
+        self.split_tiles = set(split_tiles)
+        self.fine_factor = fine_factor
+
+        objs = self.objs
+        self.objs, self.obj2tiles, self.tile2objs = {}, {}, {}
+        for obj_id, c_obj in objs.items():
+            self.upsert_object(obj_id, c_obj)
+
+    def tune(
+        self, sizes: Sequence[int], hierarchy=False
+    ) -> CollisionGridLayout:
+        """Re-index objects with the square tile size, of sizes, that makes
+        collision checks of the objects tracked cheapest.
+
+        sizes     - tile sizes to choose from, ascending. Each must be a
+                    multiple of the first.
+        hierarchy - also consider tiles of the largest size, split into
+                    tiles of the smallest size wherever that's cheaper
+        """
+        n = len(self.objs)
+        if not n:
+            return self.layout()
+
+        rects = self.objs.values()
+        x0 = np.array([c_obj.x for c_obj in rects], dtype=np.float64)
+        y0 = np.array([c_obj.y for c_obj in rects], dtype=np.float64)
+        x1 = x0 + np.array([c_obj.w for c_obj in rects], dtype=np.float64)
+        y1 = y0 + np.array([c_obj.h for c_obj in rects], dtype=np.float64)
+
+        best, best_cost = None, None
+        for size in sizes:
+            _, _, counts = _tile_counts(x0, y0, x1, y1, size)
+            pairs = counts * (counts - 1)
+            cost = counts.sum() * _TILE_COST + pairs.sum() * _CANDIDATE_COST
+            if best is None or cost < best_cost:
+                layout = (
+                    size,
+                    0,
+                    0,
+                    float(counts.sum() / n),
+                    float(pairs.sum() / n),
+                )
+                best, best_cost = CollisionGridLayout(*layout), cost
+
+        split = ()
+        if hierarchy and len(sizes) > 1:
+            coarse, fine = sizes[-1], sizes[0]
+            split_rc, layout, cost = _split_layout(
+                x0, y0, x1, y1, coarse, fine
+            )
+            if cost < best_cost:
+                best = layout
+                stride = -(-self.ctg_gw * self.ctg_tw // coarse)
+                split = [r * stride + c for r, c in split_rc]
+
+        size = best.tile_size
+        fine_factor = size // best.fine_size if best.fine_size else 1
+        if (
+            (size, size) != (self.ctg_tw, self.ctg_th)
+            or set(split) != self.split_tiles
+            or fine_factor != self.fine_factor
+        ):
+            self.reindex(size, size, split, fine_factor)
+        return best
+
+    def layout(self) -> CollisionGridLayout:
+        """Return the current tile layout, with per-object figures measured
+        from the objects tracked
+        """
+        n = len(self.objs) or 1
+        tiles = sum(len(keys) for keys in self.obj2tiles.values())
+        pairs = sum(
+            len(objs) * (len(objs) - 1) for objs in self.tile2objs.values()
+        )
+        fine_size = self.ctg_tw // self.fine_factor if self.split_tiles else 0
+        return CollisionGridLayout(
+            self.ctg_tw, fine_size, len(self.split_tiles), tiles / n, pairs / n
+        )
 
     def upsert_object(self, obj_id, c_obj: Rect) -> None:
         """Updates a collision object's location and dimensions within the
@@ -66,24 +243,37 @@ class CollisionTileGrid(CollisionTracker):
         """
         self.objs[obj_id] = c_obj
 
+        new_tiles = self._get_occupied_tiles(c_obj)
         old_tiles = self.obj2tiles.get(obj_id)
-        if old_tiles:
-            for r, c in old_tiles:
-                self.tile2objs[(r, c)].remove(obj_id)
+        if old_tiles == new_tiles:
+            return
 
-        new_tiles = self._get_occupied_tiles(c_obj)
-        for r, c in new_tiles:
-            self.tile2objs[(r, c)].add(obj_id)
+        if old_tiles:
+            self._remove_from_tiles(obj_id, old_tiles)
+
+        tile2objs = self.tile2objs
+        for key in new_tiles:
+            objs = tile2objs.get(key)
+            if objs is None:
+                tile2objs[key] = {obj_id}
+            else:
+                objs.add(obj_id)
         self.obj2tiles[obj_id] = new_tiles
 
     def remove_object(self, obj_id) -> None:
         """Removes existing object from the collision grid."""
-        tiles = self.obj2tiles[obj_id]
-        for r, c in tiles:
-            self.tile2objs[(r, c)].remove(obj_id)
-        del self.obj2tiles[obj_id]
+        self._remove_from_tiles(obj_id, self.obj2tiles.pop(obj_id))
         del self.objs[obj_id]
 
+    def _remove_from_tiles(self, obj_id, tiles):
+        """Removes object from tiles, dropping tiles left empty"""
+        tile2objs = self.tile2objs
+        for key in tiles:
+            objs = tile2objs[key]
+            objs.remove(obj_id)
+            if not objs:
+                del tile2objs[key]
+
     def has_collision(self, obj_id) -> bool:
         """Returns True if object is colliding with another object in the grid.
         """
@@ -110,55 +300,107 @@ class CollisionTileGrid(CollisionTracker):
 
     def _nearby_objects(self, obj_id):
         """Returns ids of objects sharing tiles with object of provided id."""
-        collision_ids = set()
-
+        tile2objs = self.tile2objs
         obj_tiles = self.obj2tiles[obj_id]
-        for r, c in obj_tiles:
-            collision_ids.update(self.tile2objs[(r, c)])
+
+        collision_ids = set(tile2objs[obj_tiles[0]])
+        for key in obj_tiles[1:]:
+            collision_ids.update(tile2objs[key])
 
         collision_ids.remove(obj_id)
 
         return collision_ids
 
-    def _get_corners(self, c_obj: Rect):
-        """Returns corners bounding the collision object.
-
-        NOTE: If this needs to be reused, we could extend pygame.Rect and add
-        this function to the new class.
-        """
-        return [
-            c_obj.topleft,
-            c_obj.topright,
-            c_obj.bottomright,
-            c_obj.bottomleft,
-        ]
-
-    def _get_occupied_tiles(self, c_obj: Rect):
-        """Returns all tiles occupied by an object with the provided location
-        and dimensions"""
-        tiles = set()
-
-        rows = set()
-        cols = set()
-
-        corners = self._get_corners(c_obj)
-
-        for x, y in corners:
-            r, c = self._world_coords_to_tile_index(x, y)
-            rows.add(r)
-            cols.add(c)
-
-        for r in range(min(rows), max(rows) + 1):
-            for c in range(min(cols), max(cols) + 1):
-                tiles.add((r, c))
-
-        return tiles
-
-    def _world_coords_to_tile_index(self, x: float, y: float):
-        """Convert (x, y) coordinate on the world plane to the corresponding
-        (row, col) index on the grid.
-
-        NOTE: If this functionality needs to be reused in this module, consider
-        moving it to a common.py or similar.
-        """
-        return (y // self.ctg_th, x // self.ctg_tw)
+    def _get_occupied_tiles(self, c_obj: Rect) -> Tuple[int, ...]:
+        """Returns keys of all tiles occupied by an object with the provided
+        location and dimensions"""
+        tw, th, gw = self.ctg_tw, self.ctg_th, self.ctg_gw
+        x, y = c_obj.x, c_obj.y
+        r0, c0 = int(y // th), int(x // tw)
+        r1, c1 = int((y + c_obj.h) // th), int((x + c_obj.w) // tw)
+
+        split = self.split_tiles
+        if r0 == r1 and c0 == c1:
+            key = r0 * gw + c0
+            if key not in split:
+                return (key,)
+        elif not split:
+            return tuple(
+                r * gw + c
+                for r in range(r0, r1 + 1)
+                for c in range(c0, c1 + 1)
+            )
+
+        # Index by fine tiles within split tiles
+        k = self.fine_factor
+        ftw, fth, fgw = tw // k, th // k, gw * k
+        fr0, fc0 = int(y // fth), int(x // ftw)
+        fr1, fc1 = int((y + c_obj.h) // fth), int((x + c_obj.w) // ftw)
+        keys = []
+        for r in range(r0, r1 + 1):
+            for c in range(c0, c1 + 1):
+                key = r * gw + c
+                if key not in split:
+                    keys.append(key)
+                    continue
+                for fr in range(max(fr0, r * k), min(fr1, r * k + k - 1) + 1):
+                    for fc in range(
+                        max(fc0, c * k), min(fc1, c * k + k - 1) + 1
+                    ):
+                        keys.append(_FINE_KEYS + fr * fgw + fc)
+        return tuple(keys)
+
+
+def _tile_counts(x0, y0, x1, y1, size):
+    """Count the objects with bounds (x0, y0, x1, y1) in each tile of size
+    they occupy.
+
+    returns: rows, cols and object counts of occupied tiles
+    """
+    r0, c0 = np.floor_divide(y0, size), np.floor_divide(x0, size)
+    r1, c1 = np.floor_divide(y1, size), np.floor_divide(x1, size)
+    rows, cols = [], []
+    for dr in range(int((r1 - r0).max()) + 1):
+        for dc in range(int((c1 - c0).max()) + 1):
+            inside = (r0 + dr <= r1) & (c0 + dc <= c1)
+            rows.append((r0 + dr)[inside])
+            cols.append((c0 + dc)[inside])
+    rows = np.concatenate(rows).astype(np.int64)
+    cols = np.concatenate(cols).astype(np.int64)
+
+    keys = (rows << 32) + cols
+    keys, index, counts = np.unique(
+        keys, return_index=True, return_counts=True
+    )
+    return rows[index], cols[index], counts
+
+
+def _split_layout(x0, y0, x1, y1, coarse, fine):
+    """Choose which tiles of size coarse to split into tiles of size fine.
+
+    returns: ([(r, c), ..] of tiles to split, CollisionGridLayout, cost)
+    """
+    n = len(x0)
+    k = coarse // fine
+    rows, cols, counts = _tile_counts(x0, y0, x1, y1, coarse)
+    coarse_pairs = counts * (counts - 1)
+    coarse_cost = counts * _TILE_COST + coarse_pairs * _CANDIDATE_COST
+
+    # Sum fine tile figures by the coarse tile they're in
+    f_rows, f_cols, f_counts = _tile_counts(x0, y0, x1, y1, fine)
+    keys = (rows << 32) + cols
+    parent = np.searchsorted(
+        keys, (np.floor_divide(f_rows, k) << 32) + np.floor_divide(f_cols, k)
+    )
+    fine_counts = np.bincount(parent, f_counts, len(keys))
+    fine_pairs = np.bincount(parent, f_counts * (f_counts - 1), len(keys))
+    fine_cost = fine_counts * _TILE_COST + fine_pairs * _CANDIDATE_COST
+
+    split = fine_cost < coarse_cost
+    tiles = np.where(split, fine_counts, counts).sum()
+    pairs = np.where(split, fine_pairs, coarse_pairs).sum()
+    layout = CollisionGridLayout(
+        coarse, fine, int(split.sum()), float(tiles / n), float(pairs / n)
+    )
+    split_rc = list(zip(rows[split].tolist(), cols[split].tolist()))
+    return split_rc, layout, np.where(split, fine_cost, coarse_cost).sum()
@@ -5,6 +5,8 @@ import numpy as np
 
 
 class Trajectory(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def move(self, max_move_dist) -> (Tuple[float, float], float):
         """Move the point along the trajectory towards its target by the
@@ -23,6 +25,8 @@ class Trajectory(ABC):
 class LinearTrajectory(Trajectory):
     """Trajectory that moves a point linearly towards a target point."""
 
+    __slots__ = ("_cur_x", "_cur_y", "_end_x", "_end_y")
+
     def __init__(self, start_x, start_y, end_x, end_y):
         self._cur_x, self._cur_y = start_x, start_y
         self._end_x, self._end_y = end_x, end_y
@@ -0,0 +1,86 @@
+class Rect:
+    """A lightweight, axis-aligned rectangle.
+
+    Mirrors the subset of `pygame.Rect` used by the simulation, so collision
+    code doesn't need pygame. Unlike `pygame.Rect`, coordinates are not
+    truncated to ints.
+
+    Can be constructed as either Rect(left, top, width, height) or
+    Rect((left, top), (width, height)).
+    """
+
+    __slots__ = ("x", "y", "w", "h")
+
+    def __init__(self, *args):
+        if len(args) == 2:
+            (self.x, self.y), (self.w, self.h) = args
+        else:
+            self.x, self.y, self.w, self.h = args
+
+    def __repr__(self):
+        return f"Rect({self.x}, {self.y}, {self.w}, {self.h})"
+
+    def __eq__(self, other):
+        if not isinstance(other, Rect):
+            return NotImplemented
+        return (self.x, self.y, self.w, self.h) == (
+            other.x,
+            other.y,
+            other.w,
+            other.h,
+        )
+
+    @property
+    def width(self):
+        return self.w
+
+    @property
+    def height(self):
+        return self.h
+
+    @property
+    def left(self):
+        return self.x
+
+    @property
+    def top(self):
+        return self.y
+
+    @property
+    def right(self):
+        return self.x + self.w
+
+    @property
+    def bottom(self):
+        return self.y + self.h
+
+    @property
+    def topleft(self):
+        return (self.x, self.y)
+
+    @property
+    def topright(self):
+        return (self.x + self.w, self.y)
+
+    @property
+    def bottomright(self):
+        return (self.x + self.w, self.y + self.h)
+
+    @property
+    def bottomleft(self):
+        return (self.x, self.y + self.h)
+
+    def colliderect(self, other: "Rect") -> bool:
+        """Returns True if the rects overlap. Touching edges don't count, and,
+        as with pygame, empty rects never collide.
+        """
+        return (
+            self.w > 0
+            and self.h > 0
+            and other.w > 0
+            and other.h > 0
+            and self.x < other.x + other.w
+            and other.x < self.x + self.w
+            and self.y < other.y + other.h
+            and other.y < self.y + self.h
+        )
@@ -1,7 +1,9 @@
+import random
+
 import pytest
-from pygame import Rect
 
 from physics.collision import CollisionTileGrid
+from physics.rect import Rect
 
 
 def _rects_equal(a: Rect, b: Rect):
@@ -21,22 +23,30 @@ def _assert_objs(ctg_objs, expected_objs):
     assert not missing_items
 
 
-def test__get_corners():
-    ctg = CollisionTileGrid(3, 3, 2, 2)
-    c_obj = Rect((1, 1), (2, 2))
-    corners = ctg._get_corners(c_obj)
-    assert corners == [(1, 1), (3, 1), (3, 3), (1, 3)]
+def _occupied_tiles(ctg, c_obj):
+    return {ctg.tile_index(key) for key in ctg._get_occupied_tiles(c_obj)}
+
+
+def _obj2tiles(ctg):
+    return {
+        obj_id: {ctg.tile_index(key) for key in keys}
+        for obj_id, keys in ctg.obj2tiles.items()
+    }
+
+
+def _tile2objs(ctg):
+    return {ctg.tile_index(key): objs for key, objs in ctg.tile2objs.items()}
 
 
 def test__get_occupied_tiles():
     ctg = CollisionTileGrid(3, 3, 2, 2)
 
     # Obj with dimensions <= tile dimensions
-    tiles = ctg._get_occupied_tiles(Rect((1, 1), (2, 2)))
+    tiles = _occupied_tiles(ctg, Rect((1, 1), (2, 2)))
     assert tiles == {(0, 0), (0, 1), (1, 1), (1, 0)}
 
     # Obj with dimensions > tile dimensions
-    tiles = ctg._get_occupied_tiles(Rect((1, 1), (4, 4)))
+    tiles = _occupied_tiles(ctg, Rect((1, 1), (4, 4)))
     assert tiles == {
         (0, 0),
         (0, 1),
@@ -50,7 +60,7 @@ def test__get_occupied_tiles():
     }
 
     # Rectangular obj
-    tiles = ctg._get_occupied_tiles(Rect((3, 1), (2, 4)))
+    tiles = _occupied_tiles(ctg, Rect((3, 1), (2, 4)))
     assert tiles == {(0, 1), (0, 2), (1, 1), (1, 2), (2, 1), (2, 2)}
 
 
@@ -60,55 +70,40 @@ def test_upsert_object():
     # Add new obj 1
     ctg.upsert_object(1, Rect((1, 1), (2, 2)))
     _assert_objs(ctg.objs, {1: Rect((1, 1), (2, 2))})
-    assert ctg.obj2tiles == {1: {(0, 0), (0, 1), (1, 1), (1, 0)}}
-    assert ctg.tile2objs == {
+    assert _obj2tiles(ctg) == {1: {(0, 0), (0, 1), (1, 1), (1, 0)}}
+    assert _tile2objs(ctg) == {
         (0, 0): {1},
         (0, 1): {1},
-        (0, 2): set(),
         (1, 0): {1},
         (1, 1): {1},
-        (1, 2): set(),
-        (2, 0): set(),
-        (2, 1): set(),
-        (2, 2): set(),
     }
 
     # Add new obj 2
     ctg.upsert_object(2, Rect((2, 2), (1, 1)))
     _assert_objs(ctg.objs, {1: Rect((1, 1), (2, 2)), 2: Rect((2, 2), (1, 1))})
-    assert ctg.obj2tiles == {
+    assert _obj2tiles(ctg) == {
         1: {(0, 0), (0, 1), (1, 1), (1, 0)},
         2: {(1, 1)},
     }
-    assert ctg.tile2objs == {
+    assert _tile2objs(ctg) == {
         (0, 0): {1},
         (0, 1): {1},
-        (0, 2): set(),
         (1, 0): {1},
         (1, 1): {1, 2},
-        (1, 2): set(),
-        (2, 0): set(),
-        (2, 1): set(),
-        (2, 2): set(),
     }
 
     # Move obj 2
     ctg.upsert_object(2, Rect((1, 1), (1, 1)))
     _assert_objs(ctg.objs, {1: Rect((1, 1), (2, 2)), 2: Rect((1, 1), (1, 1))})
-    assert ctg.obj2tiles == {
+    assert _obj2tiles(ctg) == {
         1: {(0, 0), (0, 1), (1, 1), (1, 0)},
         2: {(0, 0), (0, 1), (1, 1), (1, 0)},
     }
-    assert ctg.tile2objs == {
+    assert _tile2objs(ctg) == {
         (0, 0): {1, 2},
         (0, 1): {1, 2},
-        (0, 2): set(),
         (1, 0): {1, 2},
         (1, 1): {1, 2},
-        (1, 2): set(),
-        (2, 0): set(),
-        (2, 1): set(),
-        (2, 2): set(),
     }
 
 
@@ -127,18 +122,8 @@ def test_remove_object():
     ctg.remove_object(2)
 
     _assert_objs(ctg.objs, {})
-    assert ctg.obj2tiles == {}
-    assert ctg.tile2objs == {
-        (0, 0): set(),
-        (0, 1): set(),
-        (0, 2): set(),
-        (1, 0): set(),
-        (1, 1): set(),
-        (1, 2): set(),
-        (2, 0): set(),
-        (2, 1): set(),
-        (2, 2): set(),
-    }
+    assert _obj2tiles(ctg) == {}
+    assert ctg.tile2objs == {}
 
     with pytest.raises(KeyError):
         ctg.remove_object(1)
@@ -202,3 +187,60 @@ def test_colliding_object_ids():
     assert ctg.colliding_object_ids(5) == {3, 4}
     assert ctg.colliding_object_ids(6) == set()
     assert ctg.colliding_object_ids(7) == set()
+
+
+def test_sparse_tiles():
+    ctg = CollisionTileGrid(2000, 2000, 64, 64)
+    assert ctg.tile2objs == {}
+
+    ctg.upsert_object(1, Rect((10, 10), (4, 4)))
+    ctg.upsert_object(1, Rect((100_000, 100_000), (4, 4)))
+    assert _tile2objs(ctg) == {(1562, 1562): {1}}
+
+    # Off-grid tiles alias on-grid tiles, without false collisions
+    ctg.upsert_object(2, Rect((-64, 64), (4, 4)))
+    ctg.upsert_object(3, Rect((1999 * 64, 0), (4, 4)))
+    assert ctg.tile2objs[ctg.tile_key(1, -1)] == {2, 3}
+    assert not ctg.has_collision(2)
+    assert not ctg.has_collision(3)
+
+
+def _collisions(ctg):
+    return {obj_id: ctg.colliding_object_ids(obj_id) for obj_id in ctg.objs}
+
+
+def test_tune():
+    rng = random.Random(0)
+    ctg = CollisionTileGrid(16, 16, 64, 64)
+    # A dense cluster in one corner, sparse objects elsewhere
+    for obj_id in range(200):
+        ctg.upsert_object(
+            obj_id, Rect(rng.uniform(0, 60), rng.uniform(0, 60), 2, 2)
+        )
+    for obj_id in range(200, 300):
+        ctg.upsert_object(
+            obj_id, Rect(rng.uniform(64, 1000), rng.uniform(64, 1000), 2, 2)
+        )
+    expected = _collisions(ctg)
+    before = ctg.layout()
+
+    layout = ctg.tune([2, 4, 8, 16, 32, 64])
+    assert layout.tile_size < 64
+    assert layout.candidates_per_check < before.candidates_per_check
+    assert ctg.layout() == layout
+    assert _collisions(ctg) == expected
+
+    # The dense tile is split, but few others
+    layout = ctg.tune([2, 4, 8, 16, 32, 64], hierarchy=True)
+    assert (layout.tile_size, layout.fine_size) == (64, 2)
+    assert ctg.tile_key(0, 0) in ctg.split_tiles
+    assert len(ctg.split_tiles) == layout.split_tiles < 10
+    assert ctg.layout() == layout
+    assert _collisions(ctg) == expected
+
+    # Objects moving in and out of split tiles
+    ctg.upsert_object(0, Rect((62, 62), (4, 4)))
+    ctg.upsert_object(300, Rect((63, 63), (1, 1)))
+    assert ctg.colliding_object_ids(300) == {0}
+    ctg.remove_object(0)
+    assert not ctg.has_collision(300)
@@ -0,0 +1,73 @@
+"""Usage: replay.py <recording> [--speed=<x>] [--start=<step>]
+
+Plays back a recording made with `record = true` in settings.toml.
+
+Controls:
+  SPACE        Pause / resume
+  LEFT, RIGHT  Seek backwards / forwards one keyframe
+
+Options:
+  --speed=<x>     Playback speed multiplier [default: 1]
+  --start=<step>  Step to begin playback from [default: 0]
+"""
+
+import pygame
+from docopt import docopt
+
+from config import config
+
+import game
+from road import graphics as road_gfx
+from road.recording import TrafficReplay
+
+
+def replay_loop(window, clock, replay, speed):
+    """Replay loop"""
+    road_screen = road_gfx.RoadScreen(config, replay)
+    road_screen.clear(window, road_screen.bg.image)
+
+    paused = False
+    # Recorded time owed to the replay, in seconds
+    behind = 0
+
+    while 1:
+        tick = clock.tick(60) / 1000
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                game.exit()
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key in (pygame.K_LEFT, pygame.K_RIGHT):
+                    offset = replay.keyframe_interval
+                    if event.key == pygame.K_LEFT:
+                        offset = -offset
+                    step = replay.step + offset
+                    replay.seek(min(max(step, 0), replay.n_steps - 1))
+                    behind = 0
+
+        if not paused:
+            behind += tick * speed
+            # Catch up to wall time. No simulation runs here, so this is
+            # only bounded by decoding speed.
+            while behind > 0:
+                elapsed = replay.advance()
+                if elapsed is None:
+                    behind = 0
+                    break
+                behind -= elapsed
+
+        road_screen.update()
+        rects = road_screen.draw(window)
+        pygame.display.update(rects)
+
+
+if __name__ == "__main__":
+    arguments = docopt(__doc__)
+
+    with TrafficReplay(arguments["<recording>"], config) as replay:
+        replay.seek(int(arguments["--start"]))
+        game_window, clock = game.init()
+        replay_loop(game_window, clock, replay, float(arguments["--speed"]))
+    game.exit()
@@ -0,0 +1,219 @@
+"""Update bus: shares a network's update feeds between any number of readers.
+
+Feeds (`TileGrid`, `TravelGraph`, `Traffic`) hand their updates to the
+first caller of `get_updates()`. The bus is that caller. Each step it
+publishes the feeds' updates to its subscriptions, each of which holds the
+updates published since it was last read:
+
+    bus = NetworkBus(network)
+    screen = RoadScreen(config, bus.subscribe())
+    recorder_feeds = bus.subscribe()
+    ...
+    bus.publish()  # RoadNetwork.step() does this
+
+Held updates are coalesced per key, e.g. vehicle id or tile, so a
+subscription holds at most one update per key however long it goes unread:
+
+    ADDED, MOVED, .. MOVED  -> ADDED at the last position
+    MOVED, .. MOVED         -> the last MOVED
+    ADDED, .. REMOVED       -> nothing
+    MOVED, .. REMOVED       -> REMOVED
+    REMOVED, ADDED, .. MOVED -> REMOVED, then ADDED at the last position
+
+Subscriptions only see updates published after they subscribed. Subscribe
+before the network is built, or before its first step, to see all of it.
+"""
+
+from typing import Callable, Dict, Hashable, List, Tuple
+
+from .common import Update, Updateable
+
+_ADDED = Update.ADDED
+_REMOVED = Update.REMOVED
+
+
+def tile_key(params) -> Hashable:
+    """Key of a `TileGrid` update: the tile's (r, c)"""
+    return params[:2]
+
+
+def edge_key(params) -> Hashable:
+    """Key of a `TravelGraph` update: the (u, v) edge"""
+    return params
+
+
+def vehicle_key(params) -> Hashable:
+    """Key of a `Traffic` update: the vehicle id"""
+    return params[0]
+
+
+class Subscription(Updateable):
+    """One reader's view of a feed, holding coalesced updates until read.
+
+    Structure:
+        self.pending = {key: (u_type, params, removed_params), ..}
+        self.attributes = {key: (u_type, params), ..}
+
+    A pending entry is the key's latest update, preceded by a REMOVED with
+    `removed_params` if the key was removed and added back since the last
+    read.
+    """
+
+    def __init__(self, bus: "UpdateBus"):
+        self.bus = bus
+        self.pending: Dict[Hashable, tuple] = {}
+        self.attributes: Dict[Hashable, tuple] = {}
+
+    def get_updates(self) -> List[Tuple[Update, object]]:
+        """Get updates published since the last call, and clear them"""
+        updates = []
+        append = updates.append
+        for u_type, params, removed in self.pending.values():
+            if removed is not None:
+                append((_REMOVED, removed))
+            append((u_type, params))
+        updates.extend(self.attributes.values())
+        self.pending = {}
+        self.attributes = {}
+        return updates
+
+    def close(self):
+        """Stop receiving updates"""
+        self.bus.unsubscribe(self)
+
+    def _merge(self, pending, attributes):
+        """Fold a coalesced batch of updates into those held"""
+        if not self.pending and not self.attributes:
+            self.pending = pending
+            self.attributes = attributes
+            return
+        held, held_attributes = self.pending, self.attributes
+        for key, (u_type, params, removed) in pending.items():
+            if removed is not None:
+                _coalesce(held, held_attributes, key, _REMOVED, removed)
+            _coalesce(held, held_attributes, key, u_type, params)
+        held_attributes.update(attributes)
+
+
+class UpdateBus:
+    """Publishes one feed's updates to its subscriptions.
+
+    feed       - feed to read updates from
+    key        - returns the key updates are coalesced by, from their params
+    attributes - update types that change an attribute of a key, rather
+                 than the key itself, e.g. a vehicle's collision state. The
+                 last one per key is kept, alongside the key's other
+                 updates, and delivered after them.
+    """
+
+    def __init__(
+        self,
+        feed: Updateable,
+        key: Callable[[object], Hashable],
+        attributes: Tuple[Update, ...] = (),
+    ):
+        self.feed = feed
+        self.key = key
+        self.attributes = attributes
+        self.subscriptions: List[Subscription] = []
+
+    def subscribe(self) -> Subscription:
+        """Return a new subscription to the feed's updates"""
+        subscription = Subscription(self)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Stop publishing to subscription"""
+        if subscription in self.subscriptions:
+            self.subscriptions.remove(subscription)
+
+    def publish(self):
+        """Read updates from the feed and hand them to every subscription.
+        Without subscriptions, updates are discarded.
+        """
+        subscriptions = self.subscriptions
+        if not subscriptions:
+            self.feed.discard_updates()
+            return
+
+        key_of, attribute_types = self.key, self.attributes
+        pending, attributes = {}, {}
+        for u_type, params in self.feed.get_updates():
+            key = key_of(params)
+            if u_type in attribute_types:
+                attributes[key] = (u_type, params)
+            else:
+                _coalesce(pending, attributes, key, u_type, params)
+
+        # The last subscription takes the batch itself, the rest copies
+        for subscription in subscriptions[:-1]:
+            subscription._merge(dict(pending), dict(attributes))
+        subscriptions[-1]._merge(pending, attributes)
+
+
+def _coalesce(pending, attributes, key, u_type, params):
+    """Fold an update to key into the pending updates"""
+    entry = pending.get(key)
+    if entry is None:
+        pending[key] = (u_type, params, None)
+        if u_type == _REMOVED:
+            attributes.pop(key, None)
+        return
+
+    last_type, last_params, removed = entry
+    if u_type == _REMOVED:
+        attributes.pop(key, None)
+        if last_type == _ADDED and removed is None:
+            # Added and removed since the last read, so never seen
+            del pending[key]
+        else:
+            pending[key] = (_REMOVED, params, None)
+    elif last_type == _REMOVED:
+        # Removed and added back. Both are delivered.
+        pending[key] = (u_type, params, last_params)
+    elif last_type == _ADDED:
+        # Not seen yet, so still delivered as added, with the latest params
+        pending[key] = (_ADDED, params, removed)
+    else:
+        pending[key] = (u_type, params, removed)
+
+
+class NetworkSubscription:
+    """Exposes a network's `w`, `h` and a subscription to each of its
+    update feeds. Pass it to `RoadScreen` in place of the network.
+    """
+
+    def __init__(self, bus: "NetworkBus"):
+        self.w = bus.network.w
+        self.h = bus.network.h
+        self.grid = bus.grid.subscribe()
+        self.graph = bus.graph.subscribe()
+        self.traffic = bus.traffic.subscribe()
+
+    def close(self):
+        """Stop receiving updates"""
+        for subscription in (self.grid, self.graph, self.traffic):
+            subscription.close()
+
+
+class NetworkBus:
+    """Update buses for a network's grid, graph and traffic feeds"""
+
+    def __init__(self, network):
+        self.network = network
+        self.grid = UpdateBus(network.grid, tile_key)
+        self.graph = UpdateBus(network.graph, edge_key)
+        self.traffic = UpdateBus(
+            network.traffic, vehicle_key, (Update.STATE_CHANGED,)
+        )
+
+    def subscribe(self) -> NetworkSubscription:
+        """Return a new subscription to all of the network's feeds"""
+        return NetworkSubscription(self)
+
+    def publish(self):
+        """Publish updates posted since the last call to all subscriptions"""
+        self.grid.publish()
+        self.graph.publish()
+        self.traffic.publish()
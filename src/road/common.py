@@ -2,6 +2,8 @@ from abc import ABCMeta, abstractmethod
 from enum import IntEnum
 from typing import List, Tuple
 
+import numpy as np
+
 ###################
 # Tile properties #
 ###################
@@ -51,6 +53,22 @@ class TileType(IntEnum):
         """Returns if True if TileType is an intersection"""
         return len(self.segment_directions()) >= 3
 
+    def neighbor_mask(self):
+        """Returns the 4-bit neighbor mask matching the tile's segments"""
+        mask = 0
+        for dir in self.segment_directions():
+            mask |= dir.bit()
+        return mask
+
+
+def _build_mask_tile_types():
+    """Build lookup table of neighbor mask -> TileType for non-empty tiles"""
+    lut = np.zeros(16, dtype=np.uint8)
+    for tile_type in TileType:
+        if tile_type != TileType.EMPTY:
+            lut[tile_type.neighbor_mask()] = tile_type
+    return lut
+
 
 def grid_index_to_world_coords(tile_width, tile_height, r, c, center=False):
     """Convert (row, col) index on the grid to (x, y) coordinate on the world
@@ -114,6 +132,19 @@ class Direction(IntEnum):
         }
         return opposites[self]
 
+    def bit(self):
+        """Returns the bit representing this direction in a neighbor mask"""
+        return 1 << self
+
+
+# Row/col offsets for each direction, indexed by `Direction`
+DIRECTION_OFFSETS = ((-1, 0), (0, 1), (1, 0), (0, -1))
+
+# Neighbor mask (bit i set if a tile exists in `Direction(i)`) -> TileType.
+# Only valid for non-empty tiles, since ALONE and EMPTY both have no
+# neighbors.
+MASK_TILE_TYPES = _build_mask_tile_types()
+
 
 class Update(IntEnum):
     """Update types"""
@@ -132,3 +163,7 @@ class Updateable(metaclass=ABCMeta):
         """Retrieve latest updates. Updates queue MUST be cleared once called.
         """
         raise NotImplementedError
+
+    def discard_updates(self):
+        """Clear the updates queue, e.g. when nothing reads it"""
+        self.get_updates()
@@ -0,0 +1,176 @@
+"""Travel demand for load testing.
+
+Trips are drawn from an origin-destination (OD) matrix of trips per hour
+between zones, square blocks of `ZONE_SIZE` x `ZONE_SIZE` tiles. Trips start
+as a Poisson process, and each trip's origin and destination are uniformly
+random travel nodes in its zones.
+
+All randomness comes from a seeded NumPy generator, so load is reproducible,
+and trips are drawn in batches, so generating them costs next to nothing
+compared to simulating them.
+"""
+
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+from .grid import RoadSegmentNode
+
+# Width and height of a demand zone, in tiles
+ZONE_SIZE = 5
+
+
+class NodeIndex:
+    """Travel nodes grouped by zone, for O(1) random sampling.
+
+    Kept up to date as roads are added and removed, so sampling never walks
+    the graph. Each zone's nodes are kept in a list, and removed by swapping
+    in the last node, so removal costs scale with the zone, not the map.
+
+    Structure:
+        self.zones = [[RoadSegmentNode, ..], ..]  # nodes in each zone
+        self.sizes = array([n_nodes, ..])  # number of nodes in each zone
+    """
+
+    def __init__(self, w, h):
+        self.zone_cols = -(-w // ZONE_SIZE)
+        self.zone_rows = -(-h // ZONE_SIZE)
+        n_zones = self.zone_cols * self.zone_rows
+        self.zones: List[List[RoadSegmentNode]] = [[] for _ in range(n_zones)]
+        self.sizes = np.zeros(n_zones, dtype=np.int64)
+        # Incremented whenever nodes are added or removed
+        self.generation = 0
+
+    def __len__(self):
+        return int(self.sizes.sum())
+
+    def zone_of(self, node: RoadSegmentNode) -> int:
+        """Return the zone a node is in"""
+        r, c = node.tile_index
+        return (r // ZONE_SIZE) * self.zone_cols + c // ZONE_SIZE
+
+    def add(self, nodes: Iterable[RoadSegmentNode]):
+        """Add nodes to the index"""
+        for node in nodes:
+            z = self.zone_of(node)
+            self.zones[z].append(node)
+            self.sizes[z] += 1
+        self.generation += 1
+
+    def remove(self, nodes: Iterable[RoadSegmentNode]):
+        """Remove nodes from the index"""
+        for node in nodes:
+            z = self.zone_of(node)
+            zone = self.zones[z]
+            i = zone.index(node)
+            zone[i] = zone[-1]
+            zone.pop()
+            self.sizes[z] -= 1
+        self.generation += 1
+
+    def sample(
+        self, rng: np.random.Generator, zones: np.ndarray
+    ) -> List[RoadSegmentNode]:
+        """Return a uniformly random node from each of `zones`. Zones must
+        not be empty.
+        """
+        zones = np.asarray(zones)
+        picks = (rng.random(len(zones)) * self.sizes[zones]).astype(np.intp)
+        all_zones = self.zones
+        return [
+            all_zones[z][i] for z, i in zip(zones.tolist(), picks.tolist())
+        ]
+
+    def sample_uniform(
+        self, rng: np.random.Generator, n: int
+    ) -> List[RoadSegmentNode]:
+        """Return n uniformly random nodes from the whole index"""
+        total = len(self)
+        if not total:
+            return []
+        cumulative = np.cumsum(self.sizes)
+        picks = rng.integers(total, size=n)
+        zones = np.searchsorted(cumulative, picks, side="right")
+        # Offset of each pick within its zone
+        picks -= cumulative[zones] - self.sizes[zones]
+        all_zones = self.zones
+        return [
+            all_zones[z][i] for z, i in zip(zones.tolist(), picks.tolist())
+        ]
+
+
+class Demand:
+    """Generates trips from an OD matrix.
+
+    od - (zones, zones) array of trips per hour from each origin zone to
+         each destination zone. Zones are numbered as in `NodeIndex`. Trips
+         to or from zones without roads are dropped.
+    """
+
+    def __init__(self, nodes: NodeIndex, od: np.ndarray, seed=0):
+        n_zones = len(nodes.zones)
+        od = np.asarray(od, dtype=np.float64)
+        if od.shape != (n_zones, n_zones):
+            raise ValueError(
+                f"OD matrix must be {n_zones}x{n_zones}, got {od.shape}"
+            )
+        self.nodes = nodes
+        self.od = od
+        self.rng = np.random.default_rng(seed)
+
+        # Cumulative trips per hour over OD cells with roads at both ends,
+        # as of `NodeIndex.generation`
+        self._cumulative = None
+        self._generation = None
+
+    @classmethod
+    def from_zone_weights(
+        cls,
+        nodes: NodeIndex,
+        trips_per_hour: float,
+        origin_weights: np.ndarray = None,
+        destination_weights: np.ndarray = None,
+        seed=0,
+    ) -> "Demand":
+        """Demand with trips between zones in proportion to the product of
+        their origin and destination weights. Weights default to the number
+        of nodes in each zone, i.e. uniform over all roads.
+        """
+        sizes = nodes.sizes.astype(np.float64)
+        o = sizes if origin_weights is None else origin_weights
+        d = sizes if destination_weights is None else destination_weights
+        od = np.outer(o, d).astype(np.float64)
+        total = od.sum()
+        if total:
+            od *= trips_per_hour / total
+        return cls(nodes, od, seed=seed)
+
+    def _cumulative_od(self) -> np.ndarray:
+        if self._generation != self.nodes.generation:
+            has_nodes = self.nodes.sizes > 0
+            od = self.od * np.outer(has_nodes, has_nodes)
+            self._cumulative = np.cumsum(od.ravel())
+            self._generation = self.nodes.generation
+        return self._cumulative
+
+    def trips(
+        self, duration: float
+    ) -> Tuple[np.ndarray, List[RoadSegmentNode], List[RoadSegmentNode]]:
+        """Draw the trips starting over the next `duration` seconds.
+
+        returns: (start times, origins, destinations), sorted by start time
+        """
+        cumulative = self._cumulative_od()
+        total = cumulative[-1]
+        n = self.rng.poisson(total / 3600 * duration) if total > 0 else 0
+        if not n:
+            return np.empty(0), [], []
+
+        times = np.sort(self.rng.random(n) * duration)
+        cells = np.searchsorted(
+            cumulative, self.rng.random(n) * total, side="right"
+        )
+        n_zones = len(self.nodes.zones)
+        origins = self.nodes.sample(self.rng, cells // n_zones)
+        destinations = self.nodes.sample(self.rng, cells % n_zones)
+        return times, origins, destinations
@@ -0,0 +1,176 @@
+from array import array
+from typing import Dict, Hashable, List, Tuple
+
+
+class NoPathError(Exception):
+    """Raised when no path exists between two nodes."""
+
+
+class DiGraph:
+    """A minimal directed graph.
+
+    Implements the subset of `networkx.DiGraph` the simulation uses, so the
+    core can run without networkx. Nodes can be any hashable object.
+
+    Structure:
+        self.succ = {u: (v, ..), ..}  # successors of each node
+        self.pred = {v: (u, ..), ..}  # predecessors of each node
+
+    Neighbors are stored in tuples rather than sets or dicts. Road nodes have
+    at most a handful of neighbors, so lookups stay cheap and tuples take a
+    fraction of the memory. Edges only change on player actions, so
+    rebuilding a tuple on change is fine. Insertion order also keeps searches
+    deterministic.
+    """
+
+    __slots__ = ("succ", "pred")
+
+    def __init__(self):
+        self.succ: Dict[Hashable, Tuple[Hashable, ...]] = {}
+        self.pred: Dict[Hashable, Tuple[Hashable, ...]] = {}
+
+    @property
+    def nodes(self):
+        """All nodes in the graph"""
+        return self.succ.keys()
+
+    @property
+    def edges(self):
+        """All (u, v) edges in the graph"""
+        return ((u, v) for u, nbrs in self.succ.items() for v in nbrs)
+
+    def number_of_nodes(self):
+        return len(self.succ)
+
+    def number_of_edges(self):
+        return sum(len(nbrs) for nbrs in self.succ.values())
+
+    def add_node(self, node):
+        if node not in self.succ:
+            self.succ[node] = ()
+            self.pred[node] = ()
+
+    def remove_node(self, node):
+        """Remove a node and all edges to and from it"""
+        for v in self.succ.pop(node):
+            self.pred[v] = _without(self.pred[v], node)
+        for u in self.pred.pop(node):
+            self.succ[u] = _without(self.succ[u], node)
+
+    def has_node(self, node):
+        return node in self.succ
+
+    def add_edge(self, u, v):
+        """Add an edge, adding its nodes if they don't exist yet"""
+        self.add_node(u)
+        self.add_node(v)
+        if v not in self.succ[u]:
+            self.succ[u] += (v,)
+            self.pred[v] += (u,)
+
+    def remove_edge(self, u, v):
+        if v not in self.succ[u]:
+            raise KeyError((u, v))
+        self.succ[u] = _without(self.succ[u], v)
+        self.pred[v] = _without(self.pred[v], u)
+
+    def has_edge(self, u, v):
+        return u in self.succ and v in self.succ[u]
+
+    def successors(self, node):
+        return self.succ[node]
+
+    def predecessors(self, node):
+        return self.pred[node]
+
+
+def _without(nbrs: Tuple, node) -> Tuple:
+    return tuple(n for n in nbrs if n != node)
+
+
+def shortest_path(G: DiGraph, source, target) -> List:
+    """Return the shortest unweighted path from source to target as a list of
+    nodes, including both ends.
+
+    Searches breadth-first from both ends at once, expanding whichever
+    frontier is smaller.
+    """
+    if source not in G.succ or target not in G.succ:
+        raise NoPathError(f"{source} or {target} not in graph")
+    if source == target:
+        return [source]
+
+    # Node -> node it was reached from
+    fwd_parents = {source: None}
+    rev_parents = {target: None}
+    fwd_frontier = [source]
+    rev_frontier = [target]
+
+    while fwd_frontier and rev_frontier:
+        if len(fwd_frontier) <= len(rev_frontier):
+            meet, fwd_frontier = _expand(
+                fwd_frontier, G.succ, fwd_parents, rev_parents
+            )
+        else:
+            meet, rev_frontier = _expand(
+                rev_frontier, G.pred, rev_parents, fwd_parents
+            )
+
+        if meet is not None:
+            path = []
+            node = meet
+            while node is not None:
+                path.append(node)
+                node = fwd_parents[node]
+            path.reverse()
+            node = rev_parents[meet]
+            while node is not None:
+                path.append(node)
+                node = rev_parents[node]
+            return path
+
+    raise NoPathError(f"No path from {source} to {target}")
+
+
+def next_hops(G: DiGraph, index: Dict[Hashable, int], target) -> array:
+    """Return the next node of every node on a shortest unweighted path to
+    target, as an array of node indexes. Nodes are numbered by `index`,
+    which must cover every node in G. Nodes without a path, and target
+    itself, map to -1.
+
+    One breadth-first search, backwards from target.
+    """
+    hops = array("i", [-1]) * len(index)
+    if target not in G.pred:
+        return hops
+
+    pred = G.pred
+    seen = {target}
+    frontier = [target]
+    while frontier:
+        next_frontier = []
+        for v in frontier:
+            i = index[v]
+            for u in pred[v]:
+                if u not in seen:
+                    seen.add(u)
+                    hops[index[u]] = i
+                    next_frontier.append(u)
+        frontier = next_frontier
+    return hops
+
+
+def _expand(frontier, adj, parents, other_parents):
+    """Expand one BFS level.
+
+    returns: (node where the searches met or None, next frontier)
+    """
+    next_frontier = []
+    for u in frontier:
+        for v in adj[u]:
+            if v not in parents:
+                parents[v] = u
+                if v in other_parents:
+                    return v, next_frontier
+                next_frontier.append(v)
+    return None, next_frontier
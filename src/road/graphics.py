@@ -1,3 +1,4 @@
+import functools
 import random
 from collections import namedtuple
 from enum import IntEnum
@@ -7,12 +8,12 @@ import pygame
 from pygame import sprite
 
 from .common import (
+    Direction,
     TileType,
     Update,
     grid_index_to_world_coords,
 )
 from .grid import RoadSegmentNode
-from config import config
 
 
 #############
@@ -51,7 +52,8 @@ class RoadScreen(sprite.LayeredDirty):
     """Manages all sprites for rendering a `RoadNetwork`.
 
     RoadScreen fetches updates from a network's components via get_updates()
-    and updates their corresponding sprites accordingly.
+    and updates their corresponding sprites accordingly. Pass it a
+    subscription to the network's bus (see `road.bus`), or a replay.
 
     Sprites are grouped and layered to match the order of `RoadScreenLayers`.
     """
@@ -78,12 +80,28 @@ class RoadScreen(sprite.LayeredDirty):
         ] = {}
         self.vehicles: Dict[int, VehicleSprite] = {}
 
+        self.travel_edges_visible = config.DEBUG.DISPLAY_TRAVEL_EDGES
+
     def update(self):
         """Update network sprites"""
         self._update_grid()
         self._update_graph()
         self._update_traffic()
 
+    def show_travel_edges(self, visible: bool):
+        """Show or hide the travel edge overlay"""
+        self.travel_edges_visible = visible
+        for edge_sprite in self.edges.values():
+            edge_sprite.visible = visible
+
+    def clear_collisions(self):
+        """Draw every vehicle as not collided, e.g. once collision states
+        are no longer updated.
+        """
+        for vehicle_sprite in self.vehicles.values():
+            vehicle_sprite.set_state(False)
+            vehicle_sprite.dirty = 1
+
     def _update_grid(self):
         """Update grid sprites with updates from network"""
         # TODO add way to change bg if tile is being moused over
@@ -99,6 +117,9 @@ class RoadScreen(sprite.LayeredDirty):
             elif u_type == Update.STATE_CHANGED:
                 self.tiles[(r, c)].update(r, c, tile_type)
 
+            elif u_type == Update.REMOVED:
+                self.remove(self.tiles.pop((r, c)))
+
     def _update_graph(self):
         """Update graph sprites with updates from network"""
         updates = self.network.graph.get_updates()
@@ -107,7 +128,7 @@ class RoadScreen(sprite.LayeredDirty):
         for u_type, (u_node, v_node) in updates:
             if u_type == Update.ADDED:
                 sprite = TravelEdgeSprite(u_node, v_node)
-                sprite.visible = self.config.DEBUG.DISPLAY_TRAVEL_EDGES
+                sprite.visible = self.travel_edges_visible
                 self.edges[(u_node, v_node)] = sprite
                 self.add(sprite, layer=RoadScreenLayers.TRAVEL_EDGES)
 
@@ -136,6 +157,10 @@ class RoadScreen(sprite.LayeredDirty):
                 id, collided = params
                 self.vehicles[id].set_state(collided)
 
+            elif u_type == Update.REMOVED:
+                id, x, y = params
+                self.remove(self.vehicles.pop(id))
+
 
 ###########
 # Sprites #
@@ -192,11 +217,12 @@ class TileSprite(sprite.DirtySprite):
         image = pygame.Surface(
             [self.config.TILE_WIDTH, self.config.TILE_HEIGHT]
         )
-        pygame.draw.polygon(image, Color.ROAD, TILE_POLYS[tile_type])
+        polys = tile_polys(self.config)
+        pygame.draw.polygon(image, Color.ROAD, polys[tile_type])
 
         rect = image.get_rect()
         rect.x, rect.y = grid_index_to_world_coords(
-            config.TILE_WIDTH, config.TILE_HEIGHT, r, c
+            self.config.TILE_WIDTH, self.config.TILE_HEIGHT, r, c
         )
 
         return image, rect
@@ -501,35 +527,21 @@ def tile_poly(config, *, up=False, right=False, down=False, left=False):
     return points
 
 
-# NOTE: We pass config directly here just to get this working. In the future,
-# we'll want to rethink how values are passed via config, so it may be worth
-# reworking how we pass config here.
-TILE_POLYS = {
-    # no tile
-    TileType.EMPTY: [],
-    # no neighbors
-    TileType.ALONE: tile_poly(config),
-    # one neighbor
-    TileType.UP: tile_poly(config, up=True),
-    TileType.RIGHT: tile_poly(config, right=True),
-    TileType.DOWN: tile_poly(config, down=True),
-    TileType.LEFT: tile_poly(config, left=True),
-    # two neighbors
-    TileType.UP_RIGHT: tile_poly(config, up=True, right=True),
-    TileType.RIGHT_DOWN: tile_poly(config, right=True, down=True),
-    TileType.DOWN_LEFT: tile_poly(config, down=True, left=True),
-    TileType.UP_LEFT: tile_poly(config, up=True, left=True),
-    TileType.UP_DOWN: tile_poly(config, up=True, down=True),
-    TileType.RIGHT_LEFT: tile_poly(config, right=True, left=True),
-    # three neighbors
-    TileType.UP_RIGHT_DOWN: tile_poly(config, up=True, right=True, down=True),
-    TileType.RIGHT_DOWN_LEFT: tile_poly(
-        config, right=True, down=True, left=True
-    ),
-    TileType.UP_DOWN_LEFT: tile_poly(config, up=True, down=True, left=True),
-    TileType.UP_RIGHT_LEFT: tile_poly(config, up=True, right=True, left=True),
-    # four neighbors
-    TileType.UP_RIGHT_DOWN_LEFT: tile_poly(
-        config, up=True, right=True, down=True, left=True
-    ),
-}
+@functools.lru_cache(maxsize=None)
+def tile_polys(config):
+    """Return road polygons for every `TileType`, built for the provided
+    config. Cached per config.
+    """
+    polys = {TileType.EMPTY: []}
+    for tile_type in TileType:
+        if tile_type == TileType.EMPTY:
+            continue
+        dirs = tile_type.segment_directions()
+        polys[tile_type] = tile_poly(
+            config,
+            up=Direction.UP in dirs,
+            right=Direction.RIGHT in dirs,
+            down=Direction.DOWN in dirs,
+            left=Direction.LEFT in dirs,
+        )
+    return polys
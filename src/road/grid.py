@@ -1,9 +1,12 @@
-from dataclasses import dataclass, field, InitVar
-from typing import Dict, List, Tuple
+import threading
+from dataclasses import dataclass, InitVar
+from typing import Dict, List, Set, Tuple
 
-import networkx as nx
+import numpy as np
 
 from .common import (
+    DIRECTION_OFFSETS,
+    MASK_TILE_TYPES,
     Direction,
     RoadNodeType,
     TileType,
@@ -11,25 +14,59 @@ from .common import (
     Updateable,
     grid_index_to_world_coords,
 )
+from .digraph import DiGraph, next_hops, shortest_path
+from .hierarchy import ContractionHierarchy
+from instrumentation import Instrumentation
 
 
 #############
 # Tile Grid #
 #############
 
+# `TileType` members indexed by value. Cheaper than calling `TileType(value)`.
+_TILE_TYPES = tuple(TileType)
+
+# `MASK_TILE_TYPES` as `TileType` members, for scalar lookups. Scalar reads go
+# through `ndarray.item()` and these tuples since mixing numpy scalars with
+# `IntEnum` members is very slow.
+_MASK_TILE_TYPES = tuple(_TILE_TYPES[t] for t in MASK_TILE_TYPES)
+
+# (Direction, row offset, col offset, bit set on the neighbor in that
+# direction)
+_ADJACENT = tuple(
+    (dir, dr, dc, dir.opposite().bit())
+    for dir, (dr, dc) in zip(Direction, DIRECTION_OFFSETS)
+)
+
 
 class TileGrid(Updateable):
-    """A 2d grid of all road tiles"""
+    """A 2d grid of all road tiles
+
+    Tiles are stored as two uint8 arrays of shape (h, w):
+
+        self.grid  - `TileType` of each tile
+        self.masks - 4-bit neighbor mask of each tile, where bit `dir.bit()`
+                     is set if a non-empty tile exists in direction `dir`
+
+    Masks are maintained for every tile, including empty ones, so placing a
+    tile only touches the placed tile and its 4 neighbors. A non-empty tile's
+    type is always `MASK_TILE_TYPES[mask]`.
+
+    `self.generation` is incremented whenever a tile is added or removed, so
+    observers can cheaply tell whether the road layout has changed.
+    """
 
     def __init__(self, w, h):
         self.w = w
         self.h = h
-        self.grid = [[TileType.EMPTY for c in range(w)] for r in range(h)]
+        self.grid = np.zeros((h, w), dtype=np.uint8)
+        self.masks = np.zeros((h, w), dtype=np.uint8)
+        self.generation = 0
         self.updates = []
 
     def tile_type(self, r, c):
         """Return tile type of tile at index (r, c)"""
-        return TileType(self.grid[r][c])
+        return _TILE_TYPES[self.grid.item(r, c)]
 
     def add_tile(self, r, c, restrict_to_neighbors=True):
         """Add tile to grid
@@ -38,22 +75,38 @@ class TileGrid(Updateable):
                                 existing tile
         returns: tile placed
         """
-        if self.grid[r][c] != TileType.EMPTY:
+        if self.grid.item(r, c) != TileType.EMPTY:
             return False
-        if restrict_to_neighbors and not self.get_neighbors(r, c).keys():
+        if restrict_to_neighbors and not self.masks.item(r, c):
             return False
 
         self.update_tile_type(r, c, added=True)
+        self.generation += 1
 
-        # Update tile types of adjacent tiles
-        if r - 1 >= 0:
-            self.update_tile_type(r - 1, c)
-        if c + 1 < self.w:
-            self.update_tile_type(r, c + 1)
-        if r + 1 < self.h:
-            self.update_tile_type(r + 1, c)
-        if c - 1 >= 0:
-            self.update_tile_type(r, c - 1)
+        # Let adjacent tiles know about their new neighbor and update their
+        # tile types accordingly
+        for _, n_r, n_c, nbr_bit in self._adjacent(r, c):
+            self.masks[n_r, n_c] = self.masks.item(n_r, n_c) | nbr_bit
+            self.update_tile_type(n_r, n_c)
+
+        return True
+
+    def remove_tile(self, r, c):
+        """Remove tile from grid
+
+        returns: tile removed
+        """
+        if self.grid.item(r, c) == TileType.EMPTY:
+            return False
+
+        self.grid[r, c] = TileType.EMPTY
+        self.updates.append((Update.REMOVED, (r, c, TileType.EMPTY)))
+        self.generation += 1
+
+        # Let adjacent tiles know they lost a neighbor
+        for _, n_r, n_c, nbr_bit in self._adjacent(r, c):
+            self.masks[n_r, n_c] = self.masks.item(n_r, n_c) & ~nbr_bit
+            self.update_tile_type(n_r, n_c)
 
         return True
 
@@ -63,11 +116,11 @@ class TileGrid(Updateable):
         added - whether the tile is being added to the grid, i.e. changed from
                 TileType.EMPTY via this operation
         """
-        old_type = self.grid[r][c]
+        old_type = self.grid.item(r, c)
         new_type = self.evaluate_tile_type(r, c, added=added)
 
         if new_type != old_type:
-            self.grid[r][c] = new_type
+            self.grid[r, c] = new_type
             u_type = Update.ADDED if added else Update.STATE_CHANGED
             self.updates.append((u_type, (r, c, new_type)))
 
@@ -78,70 +131,86 @@ class TileGrid(Updateable):
                 from TileType.EMPTY
         """
         # Don't update empty spaces unless we recently added a tile there
-        if not added and self.grid[r][c] == TileType.EMPTY:
+        if not added and self.grid.item(r, c) == TileType.EMPTY:
             return TileType.EMPTY
 
-        nbrs = self.get_neighbors(r, c)
-
-        count = len(nbrs.keys())
-        up = nbrs.get(Direction.UP)
-        right = nbrs.get(Direction.RIGHT)
-        down = nbrs.get(Direction.DOWN)
-        left = nbrs.get(Direction.LEFT)
-
-        if count == 0:
-            return TileType.ALONE
-        elif count == 1:
-            if up:
-                return TileType.UP
-            elif right:
-                return TileType.RIGHT
-            elif down:
-                return TileType.DOWN
-            elif left:
-                return TileType.LEFT
-        elif count == 2:
-            if up and right:
-                return TileType.UP_RIGHT
-            elif right and down:
-                return TileType.RIGHT_DOWN
-            elif down and left:
-                return TileType.DOWN_LEFT
-            elif up and left:
-                return TileType.UP_LEFT
-            elif up and down:
-                return TileType.UP_DOWN
-            elif right and left:
-                return TileType.RIGHT_LEFT
-        elif count == 3:
-            if up and right and down:
-                return TileType.UP_RIGHT_DOWN
-            elif right and down and left:
-                return TileType.RIGHT_DOWN_LEFT
-            elif up and down and left:
-                return TileType.UP_DOWN_LEFT
-            elif up and right and left:
-                return TileType.UP_RIGHT_LEFT
-        elif count == 4:
-            return TileType.UP_RIGHT_DOWN_LEFT
+        return _MASK_TILE_TYPES[self.masks.item(r, c)]
+
+    def reevaluate_region(self, r0, c0, r1, c1):
+        """Recompute neighbor masks and tile types for all tiles in the region
+        [r0, r1) x [c0, c1) in one pass. Posts STATE_CHANGED updates for
+        non-empty tiles whose type changed.
+
+        Useful after bulk edits to `self.grid`, e.g. loading a map.
+        """
+        r0, c0 = max(r0, 0), max(c0, 0)
+        r1, c1 = min(r1, self.h), min(c1, self.w)
+        if r0 >= r1 or c0 >= c1:
+            return
+
+        # Pad the region by one tile in each direction so tiles on its edge
+        # see neighbors outside of it
+        pr0, pc0 = max(r0 - 1, 0), max(c0 - 1, 0)
+        pr1, pc1 = min(r1 + 1, self.h), min(c1 + 1, self.w)
+        top, left = pr0 - r0 + 1, pc0 - c0 + 1
+        occupied = np.zeros((r1 - r0 + 2, c1 - c0 + 2), dtype=np.uint8)
+        occupied[top : top + pr1 - pr0, left : left + pc1 - pc0] = (
+            self.grid[pr0:pr1, pc0:pc1] != TileType.EMPTY
+        )
+
+        masks = (
+            occupied[:-2, 1:-1] * Direction.UP.bit()
+            | occupied[1:-1, 2:] * Direction.RIGHT.bit()
+            | occupied[2:, 1:-1] * Direction.DOWN.bit()
+            | occupied[1:-1, :-2] * Direction.LEFT.bit()
+        ).astype(np.uint8)
+        self.masks[r0:r1, c0:c1] = masks
+
+        old_types = self.grid[r0:r1, c0:c1]
+        new_types = np.where(
+            occupied[1:-1, 1:-1], MASK_TILE_TYPES[masks], TileType.EMPTY
+        ).astype(np.uint8)
+
+        for r, c in np.argwhere(old_types != new_types).tolist():
+            new_type = _TILE_TYPES[new_types.item(r, c)]
+            self.updates.append(
+                (Update.STATE_CHANGED, (r + r0, c + c0, new_type))
+            )
+        self.grid[r0:r1, c0:c1] = new_types
 
     def get_neighbors(self, r, c):
         """Get tile metadata of neighbors adjacent to specified tile index"""
         nbrs: Dict[Direction, Tuple[Tuple[int, int], TileType]] = {}
 
-        if r - 1 >= 0 and self.tile_type(r - 1, c) != TileType.EMPTY:
-            nbrs[Direction.UP] = ((r - 1, c), self.tile_type(r - 1, c))
+        mask = self.masks.item(r, c)
+        if not mask:
+            return nbrs
 
-        if c + 1 < self.w and self.tile_type(r, c + 1) != TileType.EMPTY:
-            nbrs[Direction.RIGHT] = ((r, c + 1), self.tile_type(r, c + 1))
+        for dir, n_r, n_c, _ in self._adjacent(r, c):
+            if mask & (1 << dir):
+                tile_type = _TILE_TYPES[self.grid.item(n_r, n_c)]
+                nbrs[dir] = ((n_r, n_c), tile_type)
 
-        if r + 1 < self.h and self.tile_type(r + 1, c) != TileType.EMPTY:
-            nbrs[Direction.DOWN] = ((r + 1, c), self.tile_type(r + 1, c))
+        return nbrs
 
-        if c - 1 >= 0 and self.tile_type(r, c - 1) != TileType.EMPTY:
-            nbrs[Direction.LEFT] = ((r, c - 1), self.tile_type(r, c - 1))
+    def _adjacent(self, r, c):
+        """Return (Direction, r, c, bit) for each in-bounds tile adjacent to
+        the specified tile index, where bit is the neighbor mask bit pointing
+        back at (r, c).
+        """
+        return [
+            (dir, r + dr, c + dc, bit)
+            for dir, dr, dc, bit in _ADJACENT
+            if 0 <= r + dr < self.h and 0 <= c + dc < self.w
+        ]
 
-        return nbrs
+    def occupied(self):
+        """Return boolean array of all non-empty tiles"""
+        return self.grid != TileType.EMPTY
+
+    def tile_counts(self):
+        """Return array of tile counts, indexed by `TileType`"""
+        return np.bincount(self.grid.ravel(), minlength=len(TileType))
 
     def get_updates(self) -> List[Tuple[Update, Tuple[int, int, TileType]]]:
         """Get updates and clear updates queue"""
@@ -154,6 +223,10 @@ class TileGrid(Updateable):
 # Travel Graph #
 ################
 
+# Node coordinates, by value. Nodes along a row or column share coordinates,
+# so sharing their int objects saves about 400 bytes per tile.
+_COORDS: Dict[int, int] = {}
+
 
 @dataclass(eq=True, frozen=True)  # make hashable
 class RoadSegmentNode:
@@ -163,10 +236,13 @@ class RoadSegmentNode:
     UP_DOWN_LEFT tile has an UP, DOWN, and LEFT segment.
     """
 
+    # `world_coords` is derived from the other fields, so it's a plain slot
+    # rather than a dataclass field and is left out of eq and hash.
+    __slots__ = ("tile_index", "dir", "node_type", "world_coords")
+
     tile_index: Tuple[int, int]  # (r, c)
     dir: Direction
     node_type: RoadNodeType
-    world_coords: Tuple[int, int] = field(init=False)
 
     config: InitVar[object]
 
@@ -205,10 +281,17 @@ class RoadSegmentNode:
             elif self.node_type == RoadNodeType.EXIT:
                 y -= config.ROAD_WIDTH // 2 // 2
 
+        x, y = _COORDS.setdefault(x, x), _COORDS.setdefault(y, y)
         # Hack to get around frozen=True. We don't care that we're mutating
         # an "immutable" object on __init__().
         object.__setattr__(self, "world_coords", (x, y))
 
+    def __hash__(self):
+        # Much cheaper than the generated hash of a tuple of the fields.
+        # Nodes are hashed constantly by graph searches.
+        r, c = self.tile_index
+        return (((r << 16) | c) << 3) | (self.dir << 1) | self.node_type
+
 
 class TravelIntersection:
     """An intersection on the TileGrid comprised of nodes on the TravelGraph
@@ -220,55 +303,61 @@ class TravelIntersection:
 
     Structure:
         self.nodes = {
-            Direction {
-                RoadNodeType.ENTER: RoadSegmentNode,
-                RoadNodeType.EXIT: RoadSegmentNode,
-            },
+            Direction: (ENTER RoadSegmentNode, EXIT RoadSegmentNode),
             ..
         }
     """
 
+    __slots__ = ("tile_index", "nodes")
+
     def __init__(self, config, r, c, tile_type):
-        self.config = config
-        self.r = r
-        self.c = c
+        # Shared by all of the intersection's nodes
+        self.tile_index = (r, c)
         self.nodes = {}
         for dir in tile_type.segment_directions():
-            self.add_segment_nodes(dir)
+            self.add_segment_nodes(dir, config)
+
+    @property
+    def r(self):
+        return self.tile_index[0]
+
+    @property
+    def c(self):
+        return self.tile_index[1]
 
     def segments(self):
         """Return road segments associated with tile"""
         return self.nodes.keys()
 
-    def add_segment_nodes(self, dir: Direction):
+    def add_segment_nodes(self, dir: Direction, config):
         """Add all ENTER and EXIT nodes for a specified tile road segment"""
-        self.nodes[dir] = {
-            RoadNodeType.ENTER: RoadSegmentNode(
-                (self.r, self.c), dir, RoadNodeType.ENTER, config=self.config,
+        self.nodes[dir] = (
+            RoadSegmentNode(
+                self.tile_index, dir, RoadNodeType.ENTER, config=config
             ),
-            RoadNodeType.EXIT: RoadSegmentNode(
-                (self.r, self.c), dir, RoadNodeType.EXIT, config=self.config,
+            RoadSegmentNode(
+                self.tile_index, dir, RoadNodeType.EXIT, config=config
             ),
-        }
+        )
+
+    def remove_segment_nodes(self, dir: Direction):
+        """Remove the ENTER and EXIT nodes for a specified tile road segment
+
+        returns: (ENTER, EXIT) nodes removed
+        """
+        return self.nodes.pop(dir)
 
     def enter_nodes(self):
         """Return all ENTER nodes in the intersection"""
-        return [
-            self.nodes[dir][RoadNodeType.ENTER] for dir in self.nodes.keys()
-        ]
+        return [enter for enter, _ in self.nodes.values()]
 
     def exit_nodes(self):
         """Return all EXIT nodes in the intersection"""
-        return [
-            self.nodes[dir][RoadNodeType.EXIT] for dir in self.nodes.keys()
-        ]
+        return [exit for _, exit in self.nodes.values()]
 
     def get_nodes_for_segment(self, dir):
         """Return (ENTER, EXIT) nodes tuple for segment"""
-        return (
-            self.nodes[dir][RoadNodeType.ENTER],
-            self.nodes[dir][RoadNodeType.EXIT],
-        )
+        return self.nodes[dir]
 
 
 class TravelGraph(Updateable):
@@ -281,12 +370,31 @@ class TravelGraph(Updateable):
     intersections, i.e. no straightaways, like UP_DOWN and RIGHT_LEFT tiles.
     """
 
-    def __init__(self, config):
+    def __init__(self, config, instruments: Instrumentation = None):
         self.config = config
-        self.G = nx.DiGraph()
+        self.G = DiGraph()
         self.intersections: Dict[Tuple[int, int], TravelIntersection] = {}
         self.updates = []
 
+        # Incremented on every edge change
+        self.generation = 0
+
+        # Optional contraction hierarchy for fast queries, as
+        # (graph generation it was built for, hierarchy). See
+        # `build_hierarchy()`.
+        self._hierarchy = None
+        self._hierarchy_thread = None
+
+        # Routes to registered destinations. See `register_destination()`.
+        self.destinations: Dict[RoadSegmentNode, NextHopRoute] = {}
+        # (graph generation, nodes, {node: index, ..}) numbering nodes for
+        # next-hop tables
+        self._numbering = None
+
+        instruments = instruments or Instrumentation()
+        self._path_queries = instruments.counter("path_queries")
+        self._next_hop_builds = instruments.counter("next_hop_builds")
+
     def _add_edge(self, u_node, v_node):
         """Add edge. This should be called instead of adding to the graph
         directly."""
@@ -294,6 +402,7 @@ class TravelGraph(Updateable):
         if not self.G.has_edge(u_node, v_node):
             self.updates.append((Update.ADDED, (u_node, v_node)))
             self.G.add_edge(u_node, v_node)
+            self.generation += 1
 
     def _remove_edge(self, u_node, v_node):
         """Remove edge. This should be called instead of removing from the
@@ -302,6 +411,7 @@ class TravelGraph(Updateable):
         if self.G.has_edge(u_node, v_node):
             self.updates.append((Update.REMOVED, (u_node, v_node)))
             self.G.remove_edge(u_node, v_node)
+            self.generation += 1
 
     def register_tile_intersection(
         self,
@@ -310,10 +420,16 @@ class TravelGraph(Updateable):
         tile_type,
         nbrs: Dict[Direction, Tuple[Tuple[int, int], TileType]],
     ):
-        """Add new intersection to TravelGraph"""
+        """Add new intersection to TravelGraph
+
+        returns: nodes added
+        """
         # Create and intraconnect nodes for new intersection
         insct = TravelIntersection(self.config, r, c, tile_type)
         self._intraconnect_nodes(insct)
+        added = []
+        for nodes in insct.nodes.values():
+            added.extend(nodes)
 
         # Neighbor intersections will have a new segment added to their tile to
         # bridge the connection to the newly placed tile. Add ENTER and EXIT
@@ -322,7 +438,8 @@ class TravelGraph(Updateable):
         for dir, ((n_r, n_c), tile_type) in nbrs.items():
             n_insct = self.intersections[(n_r, n_c)]
             # Add nodes to new segment
-            n_insct.add_segment_nodes(dir.opposite())
+            n_insct.add_segment_nodes(dir.opposite(), self.config)
+            added.extend(n_insct.get_nodes_for_segment(dir.opposite()))
             # Update edges
             self._update_intersection_intraconnected_edges(n_insct)
 
@@ -335,6 +452,56 @@ class TravelGraph(Updateable):
             self._add_edge(n_exit, enter)
 
         self.intersections[(r, c)] = insct
+        return added
+
+    def unregister_tile_intersection(
+        self,
+        r,
+        c,
+        nbrs: Dict[Direction, Tuple[Tuple[int, int], TileType]],
+    ) -> Tuple[Set[RoadSegmentNode], Set[RoadSegmentNode]]:
+        """Remove intersection from TravelGraph, along with the segments of
+        neighbor intersections that connected to it.
+
+        nbrs - neighbors of the removed tile
+        returns: (nodes removed, remaining nodes whose outgoing edges changed)
+        """
+        insct = self.intersections.pop((r, c))
+        removed = set()
+        for nodes in insct.nodes.values():
+            removed.update(nodes)
+
+        # Neighbors lose the segment that led to the removed tile
+        for dir, ((n_r, n_c), _) in nbrs.items():
+            n_insct = self.intersections[(n_r, n_c)]
+            removed.update(n_insct.remove_segment_nodes(dir.opposite()))
+
+        changed = set()
+        for node in removed:
+            changed.update(self.G.pred[node])
+            self._remove_node(node)
+        changed -= removed
+
+        # Reconnect the remaining segments, e.g. adding a U-Turn to
+        # neighbors that became dead-ends
+        for dir, ((n_r, n_c), _) in nbrs.items():
+            n_insct = self.intersections[(n_r, n_c)]
+            self._update_intersection_intraconnected_edges(n_insct)
+            changed.update(n_insct.enter_nodes())
+
+        return removed, changed
+
+    def _remove_node(self, node):
+        """Remove node and its edges, posting an update for each edge, and
+        stop sharing a route to it
+        """
+        for v in self.G.succ[node]:
+            self.updates.append((Update.REMOVED, (node, v)))
+        for u in self.G.pred[node]:
+            self.updates.append((Update.REMOVED, (u, node)))
+        self.G.remove_node(node)
+        self.destinations.pop(node, None)
+        self.generation += 1
 
     def _update_intersection_intraconnected_edges(self, insct):
         """Update existing intersection's edges to match desired configuration
@@ -349,11 +516,7 @@ class TravelGraph(Updateable):
         # and try removing any self-connections.
         for dir in insct.segments():
             enter, exit = insct.get_nodes_for_segment(dir)
-            try:
-                self._remove_edge(enter, exit)
-            except nx.NetworkXError:
-                # No edge between enter and exit
-                pass
+            self._remove_edge(enter, exit)
 
         self._intraconnect_nodes(insct)
 
@@ -383,8 +546,78 @@ class TravelGraph(Updateable):
                     self._add_edge(enter, exit)
 
     def shortest_path(self, source_node, target_node):
-        """Get the shortest path from source node to target node"""
-        return nx.shortest_path(self.G, source=source_node, target=target_node)
+        """Get the shortest path from source node to target node
+
+        Uses the contraction hierarchy if one was built and is up to date.
+        If it's out of date, starts rebuilding it in the background and
+        searches the graph in the meantime.
+        """
+        self._path_queries.inc()
+        if self._hierarchy:
+            generation, hierarchy = self._hierarchy
+            if generation == self.generation:
+                return hierarchy.shortest_path(source_node, target_node)
+            self.build_hierarchy(background=True)
+        return shortest_path(self.G, source_node, target_node)
+
+    def register_destination(self, node: RoadSegmentNode) -> "NextHopRoute":
+        """Keep a next-hop table to node, for vehicles headed there.
+
+        returns: the route to node, shared by every vehicle sent along it
+        """
+        if node not in self.destinations:
+            self.destinations[node] = NextHopRoute(self, node)
+        return self.destinations[node]
+
+    def unregister_destination(self, node: RoadSegmentNode):
+        """Stop sharing a route to node. Vehicles already on it keep it."""
+        self.destinations.pop(node, None)
+
+    def _next_hop_table(self, destination) -> tuple:
+        """Build a next-hop table to destination for the current graph.
+
+        returns: (nodes, {node: index, ..}, next node indexes)
+        """
+        if self._numbering is None or self._numbering[0] != self.generation:
+            nodes = list(self.G.succ)
+            index = {node: i for i, node in enumerate(nodes)}
+            self._numbering = (self.generation, nodes, index)
+        _, nodes, index = self._numbering
+        self._next_hop_builds.inc()
+        return nodes, index, next_hops(self.G, index, destination)
+
+    def build_hierarchy(self, background=False):
+        """Build a contraction hierarchy over the graph for fast shortest
+        path queries. Worth it once roads rarely change. Once built, it's
+        rebuilt in the background after roads change.
+
+        background - build on a background thread, and keep searching the
+                     graph until it's done
+        """
+        if self._hierarchy_thread and self._hierarchy_thread.is_alive():
+            return
+
+        # Taken before the snapshot, so a hierarchy built from a graph
+        # changed mid-copy is already out of date
+        generation = self.generation
+
+        def build():
+            # Neighbors are tuples, so a shallow copy is a consistent
+            # snapshot. Copying a dict is a single step for other threads.
+            succ = dict(self.G.succ)
+            importance = _dissection_importance(list(self.intersections))
+            self._hierarchy = (
+                generation,
+                ContractionHierarchy(succ, importance=importance),
+            )
+
+        if background:
+            self._hierarchy_thread = threading.Thread(
+                target=build, name="hierarchy-builder", daemon=True
+            )
+            self._hierarchy_thread.start()
+        else:
+            build()
 
     def get_updates(
         self,
@@ -393,3 +626,96 @@ class TravelGraph(Updateable):
         updates = self.updates
         self.updates = []
         return updates
+
+
+def _dissection_importance(tiles: List[Tuple[int, int]]):
+    """Return a contraction importance for the nodes on tiles, from a nested
+    dissection of their bounding box.
+
+    The box is split in half along its longer side, recursively, until
+    parts have at most 4 tiles. The nodes on the LEFT (UP) segments of the
+    tiles just past a vertical (horizontal) split separate the halves.
+    Separator nodes rank above everything they split, coarsest separator
+    last, so upward searches only climb through a few separators per
+    level. Each separator node gets its own importance, which fixes their
+    order without witness searches to compare them.
+
+    returns: importance(node), higher for nodes contracted later
+    """
+    separators = []  # [(depth, (r, c, dir)), ..]
+
+    def dissect(r0, c0, r1, c1, depth):
+        if (r1 - r0) * (c1 - c0) <= 4:
+            return
+        if c1 - c0 >= r1 - r0:
+            m = (c0 + c1) // 2
+            separators.extend(
+                (depth, (r, m, Direction.LEFT)) for r in range(r0, r1)
+            )
+            dissect(r0, c0, r1, m, depth + 1)
+            dissect(r0, m, r1, c1, depth + 1)
+        else:
+            m = (r0 + r1) // 2
+            separators.extend(
+                (depth, (m, c, Direction.UP)) for c in range(c0, c1)
+            )
+            dissect(r0, c0, m, c1, depth + 1)
+            dissect(m, c0, r1, c1, depth + 1)
+
+    if tiles:
+        rows, cols = zip(*tiles)
+        dissect(min(rows), min(cols), max(rows) + 1, max(cols) + 1, 0)
+    separators.sort(key=lambda separator: -separator[0])
+    ranks = {key: i for i, (_, key) in enumerate(separators)}
+
+    def importance(node: RoadSegmentNode):
+        r, c = node.tile_index
+        return ranks.get((r, c, node.dir), -1)
+
+    return importance
+
+
+class NextHopRoute:
+    """Route to a destination, looked up one node at a time in a next-hop
+    table over the whole travel graph. The table takes one search to build,
+    and is rebuilt lazily after the graph changes, so routing any number of
+    vehicles to the destination costs the same.
+
+    Get routes from `TravelGraph.register_destination()`, and follow them
+    like a `TravelPath`.
+    """
+
+    __slots__ = ("graph", "destination", "_generation", "_table")
+
+    def __init__(self, graph: TravelGraph, destination: RoadSegmentNode):
+        self.graph = graph
+        self.destination = destination
+        # Graph generation the table was built for, and the table, as
+        # (nodes, {node: index, ..}, next node indexes)
+        self._generation = None
+        self._table = None
+
+    def __repr__(self):
+        return f"NextHopRoute({self.destination})"
+
+    def node_at(self, cursor, node: RoadSegmentNode) -> RoadSegmentNode:
+        """Node to travel to from node, or None at the destination or if
+        it can't be reached. The cursor is ignored.
+        """
+        if self._generation != self.graph.generation:
+            self._table = self.graph._next_hop_table(self.destination)
+            self._generation = self.graph.generation
+        nodes, index, hops = self._table
+        i = index.get(node)
+        if i is None or hops[i] < 0:
+            return None
+        return nodes[hops[i]]
+
+    def remaining(self, cursor, node) -> Tuple[RoadSegmentNode, ...]:
+        """Nodes left to travel to from node"""
+        path = []
+        node = self.node_at(cursor, node)
+        while node is not None:
+            path.append(node)
+            node = self.node_at(cursor, node)
+        return tuple(path)
@@ -0,0 +1,277 @@
+"""Contraction hierarchies for fast shortest path queries on static graphs.
+
+Preprocessing contracts nodes one at a time, from least to most important,
+adding shortcut edges so distances between the remaining nodes are kept.
+Queries then only need to search "upward" from both ends, through
+increasingly important nodes, which touches a tiny fraction of the graph.
+"""
+
+import heapq
+import itertools
+from typing import Callable, Dict, Hashable, List, Tuple
+
+from .digraph import NoPathError
+
+INF = float("inf")
+
+# Witness searches give up after settling this many nodes. Lower is faster
+# to build but may add unnecessary shortcuts.
+WITNESS_SETTLE_LIMIT = 64
+
+
+class ContractionHierarchy:
+    """A contraction hierarchy over a directed graph.
+
+    The graph is read once, from `succ` ({u: (v, ..), ..}, as in
+    `DiGraph.succ`), so the hierarchy does not see later changes to the
+    graph. Nodes are mapped to ints internally.
+
+    Nodes are contracted in order of `importance(node)`, lowest first, then
+    by how many shortcuts contracting them adds. Without `importance`, the
+    order only depends on the shortcuts. On grid-like graphs, ranking the
+    nodes of a nested dissection highest, coarsest separator first, keeps
+    query search spaces much smaller. See `TravelGraph.build_hierarchy()`.
+
+    Structure:
+        self.up_out = [((v, weight), ..), ..]  # edges to higher ranked nodes
+        self.up_in = [((u, weight), ..), ..]  # edges from higher ranked nodes
+        self.middle = {(u, v): m, ..}  # contracted node a shortcut skips
+    """
+
+    def __init__(
+        self,
+        succ: Dict[Hashable, Tuple[Hashable, ...]],
+        weight: Callable[[Hashable, Hashable], float] = None,
+        importance: Callable[[Hashable], int] = None,
+    ):
+        self.nodes: List[Hashable] = list(succ)
+        self.index: Dict[Hashable, int] = {
+            node: i for i, node in enumerate(self.nodes)
+        }
+        self.middle: Dict[Tuple[int, int], int] = {}
+        self.rank: List[int] = []
+        self.up_out: List[Tuple[Tuple[int, float], ...]] = []
+        self.up_in: List[Tuple[Tuple[int, float], ...]] = []
+        self._build(succ, weight, importance)
+
+    def _build(self, succ, weight, importance):
+        n = len(self.nodes)
+        index = self.index
+
+        # Remaining graph, including shortcuts: [{neighbor: weight}, ..]
+        out_adj = [{} for _ in range(n)]
+        in_adj = [{} for _ in range(n)]
+        for u, vs in succ.items():
+            i = index[u]
+            for v in vs:
+                j = index[v]
+                if i != j:
+                    w = weight(u, v) if weight else 1
+                    out_adj[i][j] = w
+                    in_adj[j][i] = w
+
+        # Every edge ever in the remaining graph. Shortcuts only replace
+        # edges they are cheaper than.
+        edges = {
+            (i, j): w for i, adj in enumerate(out_adj) for j, w in adj.items()
+        }
+
+        tier = [importance(node) if importance else 0 for node in self.nodes]
+        deleted_neighbors = [0] * n
+        level = [0] * n
+        rank = [0] * n
+
+        def shortcuts(v):
+            """Shortcuts needed to contract v, as [(u, w, weight), ..]"""
+            needed = []
+            outs = out_adj[v]
+            if not outs:
+                return needed
+            max_out = max(outs.values())
+            for u, w_uv in in_adj[v].items():
+                # Direct edges are witnesses too. Checking them first skips
+                # most searches around densely connected nodes.
+                direct = out_adj[u]
+                targets = {
+                    w: w_uv + w_vw
+                    for w, w_vw in outs.items()
+                    if w != u and direct.get(w, INF) > w_uv + w_vw
+                }
+                if not targets:
+                    continue
+                dist = self._witness_search(
+                    out_adj, u, v, targets, w_uv + max_out
+                )
+                for w, cost in targets.items():
+                    if dist.get(w, INF) > cost:
+                        needed.append((u, w, cost))
+            return needed
+
+        def priority(v):
+            """Return (priority, shortcuts) for contracting v next"""
+            needed = shortcuts(v)
+            # Edge difference, plus terms that spread contraction evenly
+            # over the graph, which keeps the hierarchy shallow
+            p = (
+                2 * len(needed)
+                - len(in_adj[v])
+                - len(out_adj[v])
+                + deleted_neighbors[v]
+                + level[v]
+            )
+            return (tier[v], p), needed
+
+        counter = itertools.count()
+        heap = [(priority(v)[0], next(counter), v) for v in range(n)]
+        heapq.heapify(heap)
+
+        order = 0
+        while heap:
+            _, _, v = heapq.heappop(heap)
+            # Lazy update: requeue if no longer the least important
+            p, needed = priority(v)
+            if heap and p > heap[0][0]:
+                heapq.heappush(heap, (p, next(counter), v))
+                continue
+
+            for u, w, cost in needed:
+                if cost < out_adj[u].get(w, INF):
+                    out_adj[u][w] = cost
+                    in_adj[w][u] = cost
+                    edges[(u, w)] = cost
+                    self.middle[(u, w)] = v
+
+            for u in in_adj[v]:
+                del out_adj[u][v]
+                deleted_neighbors[u] += 1
+                level[u] = max(level[u], level[v] + 1)
+            for w in out_adj[v]:
+                del in_adj[w][v]
+                deleted_neighbors[w] += 1
+                level[w] = max(level[w], level[v] + 1)
+            out_adj[v] = {}
+            in_adj[v] = {}
+
+            rank[v] = order
+            order += 1
+
+        self.rank = rank
+        up_out = [[] for _ in range(n)]
+        up_in = [[] for _ in range(n)]
+        for (u, v), w in edges.items():
+            if rank[v] > rank[u]:
+                up_out[u].append((v, w))
+            else:
+                up_in[v].append((u, w))
+        self.up_out = [tuple(adj) for adj in up_out]
+        self.up_in = [tuple(adj) for adj in up_in]
+
+    @staticmethod
+    def _witness_search(out_adj, source, skip, targets, max_cost):
+        """Dijkstra from source, avoiding `skip`, until all targets are
+        settled, costs exceed max_cost, or the settle limit is hit.
+
+        returns: {node: distance} of reached nodes
+        """
+        dist = {source: 0}
+        heap = [(0, source)]
+        remaining = len(targets)
+        settled = 0
+        while heap and remaining and settled < WITNESS_SETTLE_LIMIT:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            if d > max_cost:
+                break
+            settled += 1
+            if u in targets:
+                remaining -= 1
+            for v, w in out_adj[u].items():
+                if v == skip:
+                    continue
+                nd = d + w
+                if nd < dist.get(v, INF):
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v))
+        return dist
+
+    def shortest_path(self, source, target) -> List:
+        """Return the shortest path from source to target as a list of
+        nodes, including both ends.
+        """
+        try:
+            s, t = self.index[source], self.index[target]
+        except KeyError:
+            raise NoPathError(f"{source} or {target} not in hierarchy")
+        if s == t:
+            return [source]
+
+        up_out, up_in = self.up_out, self.up_in
+        # Distances are kept in lists rather than dicts, which is cheaper
+        # per edge relaxed than dict lookups even with the allocation
+        n = len(self.nodes)
+        fwd_dist, bwd_dist = [INF] * n, [INF] * n
+        fwd_dist[s] = bwd_dist[t] = 0
+        fwd_parent, bwd_parent = {s: None}, {t: None}
+        fwd_heap, bwd_heap = [(0, s)], [(0, t)]
+        best, meet = INF, None
+
+        # Alternate between searches until neither can beat the best
+        # meeting point found
+        while fwd_heap or bwd_heap:
+            for heap, dist, parent, adj, other_dist in (
+                (fwd_heap, fwd_dist, fwd_parent, up_out, bwd_dist),
+                (bwd_heap, bwd_dist, bwd_parent, up_in, fwd_dist),
+            ):
+                if not heap:
+                    continue
+                d, u = heapq.heappop(heap)
+                if d > dist[u]:
+                    continue
+                if d >= best:
+                    heap.clear()
+                    continue
+                if d + other_dist[u] < best:
+                    best, meet = d + other_dist[u], u
+                for v, w in adj[u]:
+                    nd = d + w
+                    if nd < dist[v]:
+                        dist[v] = nd
+                        parent[v] = u
+                        heapq.heappush(heap, (nd, v))
+
+        if meet is None:
+            raise NoPathError(f"No path from {source} to {target}")
+
+        # Hierarchy edges from source to meet, then meet to target
+        up = []
+        node = meet
+        while node is not None:
+            up.append(node)
+            node = fwd_parent[node]
+        up.reverse()
+        node = bwd_parent[meet]
+        while node is not None:
+            up.append(node)
+            node = bwd_parent[node]
+
+        path = [s]
+        for u, v in zip(up, up[1:]):
+            self._unpack(u, v, path)
+        return [self.nodes[i] for i in path]
+
+    def _unpack(self, u, v, path):
+        """Append the original edges a hierarchy edge (u, v) stands for to
+        path, excluding u.
+        """
+        middle = self.middle
+        stack = [(u, v)]
+        while stack:
+            a, b = stack.pop()
+            m = middle.get((a, b))
+            if m is None:
+                path.append(b)
+            else:
+                # Expand (a, m) first
+                stack.append((m, b))
+                stack.append((a, m))
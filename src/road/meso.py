@@ -0,0 +1,195 @@
+"""Mesoscopic traffic, for regions nobody is watching closely.
+
+Vehicles outside the focus region aren't moved every tick. Instead each edge
+is a queue: a vehicle entering an edge is scheduled to leave it once it could
+have driven the edge at full speed, and no sooner than the edge can let
+another vehicle out. Vehicles jump from node to node as their exit times
+come up.
+
+Edge capacities mirror the microscopic model:
+
+    road edges          - one vehicle per vehicle length
+    intersection turns  - one vehicle per `INTERSECTION_CLEAR_TIME`, shared
+                          by all turns through the intersection, after a
+                          `VEHICLE_STOP_WAIT_TIME` stop
+"""
+
+import heapq
+import itertools
+import math
+from typing import Dict, List, Set, Tuple
+
+from .common import RoadNodeType, TileType
+from .grid import RoadSegmentNode
+
+# Whether each `TileType`, by value, is an intersection
+_IS_INTERSECTION = tuple(t.is_intersection() for t in TileType)
+
+
+class MesoscopicTraffic:
+    """Vehicles simulated as queue-based flows along travel graph edges.
+
+    Structure:
+        self.vehicles = {id: Vehicle, ..}
+        # Current edge of each vehicle, to `node`
+        self.edge_times = {id: (entry time, exit time, node), ..}
+        self.next_exit = {edge or tile index: time, ..}  # earliest next exit
+
+    Next exits that have passed are pruned as the map grows, and those of
+    removed roads by `remove_road()`.
+    """
+
+    def __init__(self, config):
+        self.config = config
+
+        # Simulated time, in seconds
+        self.time = 0
+
+        self.vehicles = {}
+        self.edge_times: Dict[int, Tuple[float, float, object]] = {}
+        self.next_exit: Dict[object, float] = {}
+        # Size of `next_exit` that triggers pruning passed exits
+        self._prune_size = 64
+        # Vehicles waiting to be scheduled onto their next edge
+        self._pending: List = []
+
+        # Heap of (exit time, tiebreak, vehicle id). Entries are stale unless
+        # their time matches the vehicle's exit time in `edge_times`.
+        self._exits = []
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self.vehicles)
+
+    def __contains__(self, vehicle_id):
+        return vehicle_id in self.vehicles
+
+    def add(self, vehicle):
+        """Start simulating vehicle mesoscopically, from the node it last
+        reached.
+        """
+        self.vehicles[vehicle._id] = vehicle
+        vehicle._world_coords = vehicle._last_t_node.world_coords
+        vehicle._trajectory = None
+        self._pending.append(vehicle)
+
+    def remove(self, vehicle):
+        """Stop simulating vehicle, placing it part way along its current
+        edge.
+        """
+        del self.vehicles[vehicle._id]
+        times = self.edge_times.pop(vehicle._id, None)
+        if times and vehicle._t_node is not None:
+            entry, exit, _ = times
+            frac = (self.time - entry) / (exit - entry) if exit > entry else 1
+            frac = min(max(frac, 0), 1)
+            ux, uy = vehicle._last_t_node.world_coords
+            vx, vy = vehicle._t_node.world_coords
+            vehicle._world_coords = (
+                ux + (vx - ux) * frac,
+                uy + (vy - uy) * frac,
+            )
+
+    def path_changed(self, vehicle):
+        """Reschedule vehicle after its path was set. Vehicles keep their
+        progress along their current edge if their path still follows it.
+        """
+        times = self.edge_times.get(vehicle._id)
+        if times is None or times[2] is not vehicle._t_node:
+            self.edge_times.pop(vehicle._id, None)
+            self._pending.append(vehicle)
+
+    def remove_road(self, r, c, nodes: Set[RoadSegmentNode]):
+        """Forget next exits of the road at (r, c), after it was removed.
+        Vehicles on it are removed by `Traffic` first.
+
+        nodes - travel nodes removed with the road
+        """
+        next_exit = self.next_exit
+        next_exit.pop((r, c), None)
+        for key in [
+            key
+            for key in next_exit
+            if isinstance(key[0], RoadSegmentNode)
+            and (key[0] in nodes or key[1] in nodes)
+        ]:
+            del next_exit[key]
+
+    def _prune(self):
+        """Drop next exits that have passed. Vehicles are only scheduled
+        from the current time, or from exits later than it.
+        """
+        now = self.time
+        self.next_exit = {
+            key: time for key, time in self.next_exit.items() if time > now
+        }
+        self._prune_size = max(2 * len(self.next_exit), 64)
+
+    def step(self, tick, grid, in_focus) -> Tuple[List, List]:
+        """Advance time, moving vehicles whose exit times came up to the
+        end of their edges.
+
+        in_focus - function of a vehicle, True if its next edge should be
+                   simulated microscopically
+        returns: (vehicles that reached a node, vehicles to promote)
+        """
+        if len(self.next_exit) > self._prune_size:
+            self._prune()
+        self.time += tick
+
+        for v in self._pending:
+            if v._id in self.vehicles and v._id not in self.edge_times:
+                self._schedule(v, grid)
+        self._pending = []
+
+        moved, promote = [], []
+        exits, edge_times = self._exits, self.edge_times
+        while exits and exits[0][0] <= self.time:
+            exit, _, id = heapq.heappop(exits)
+            times = edge_times.get(id)
+            if times is None or times[1] != exit:
+                continue
+            del edge_times[id]
+
+            v = self.vehicles[id]
+            v._world_coords = v._t_node.world_coords
+            v._last_t_node = v._t_node
+            v._advance()
+            v._t_node = v.next_node()
+            moved.append(v)
+            if in_focus(v):
+                promote.append(v)
+            else:
+                self._schedule(v, grid, start=exit)
+        return moved, promote
+
+    def _schedule(self, vehicle, grid, start=None):
+        """Schedule vehicle's exit from the edge to its next node"""
+        # Paths may start at the node the vehicle is already at
+        while vehicle.next_node() is vehicle._last_t_node:
+            vehicle._advance()
+        vehicle._t_node = vehicle.next_node()
+        if vehicle._t_node is None:
+            return
+
+        config = self.config
+        u, v = vehicle._last_t_node, vehicle._t_node
+        start = self.time if start is None else start
+        (ux, uy), (vx, vy) = u.world_coords, v.world_coords
+        free_flow = math.hypot(vx - ux, vy - uy) / vehicle.speed
+
+        if (
+            u.node_type == RoadNodeType.ENTER
+            and _IS_INTERSECTION[grid.grid.item(*u.tile_index)]
+        ):
+            key = u.tile_index
+            free_flow += config.VEHICLE_STOP_WAIT_TIME
+            headway = config.INTERSECTION_CLEAR_TIME
+        else:
+            key = (u, v)
+            headway = 2 * config.VEHICLE_RADIUS / vehicle.speed
+
+        exit = max(start + free_flow, self.next_exit.get(key, 0))
+        self.next_exit[key] = exit + headway
+        self.edge_times[vehicle._id] = (start, exit, v)
+        heapq.heappush(self._exits, (exit, next(self._counter), vehicle._id))
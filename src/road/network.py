@@ -1,32 +1,91 @@
-from .grid import TileGrid, TravelGraph
+from typing import Iterable, Tuple
+
+import numpy as np
+
+from .bus import NetworkBus
+from .demand import NodeIndex
+from .grid import RoadSegmentNode, TileGrid, TravelGraph
+from .routing import CongestionRouter
 from .traffic import Traffic
+from instrumentation import Instrumentation
 from physics.collision import CollisionTileGrid
 
+# Memory budgets, enforced by tests. Sized so 1M vehicles on a fully built
+# 1000x1000 grid fit in under 4GB.
+#
+# Bytes per vehicle, excluding its path
+VEHICLE_BYTES_BUDGET = 640
+# Bytes per road tile, including its travel graph nodes and edges
+TILE_BYTES_BUDGET = 3072
+
+# Simulated seconds between retuning the collision grid to vehicle density
+COLLISION_TUNE_INTERVAL = 10.0
+
 
 class RoadNetwork:
     """Controls all data structures necessary for storing and maintaining a
     road network.
+
+    event_driven        - step vehicles only as they reach nodes. See
+                          `Traffic`.
+    collision_cell_size - collision grid tile size, in px. 0 picks it from
+                          vehicle size, then retunes it to vehicle density
+                          as the network steps.
+    collision_hierarchy - when retuning, also consider splitting dense
+                          collision tiles into smaller ones
     """
 
-    def __init__(self, config, w, h):
+    def __init__(
+        self,
+        config,
+        w,
+        h,
+        instruments: Instrumentation = None,
+        event_driven: bool = False,
+        collision_cell_size: int = 0,
+        collision_hierarchy: bool = False,
+    ):
         self.config = config
+        self.instruments = instruments or Instrumentation()
 
         self.w = w
         self.h = h
 
+        # Collision tile sizes to tune between, from a vehicle's width to a
+        # road tile's
+        vehicle_size = 2 * config.VEHICLE_RADIUS
+        self.collision_sizes = [vehicle_size]
+        while self.collision_sizes[-1] * 2 <= config.TILE_WIDTH:
+            self.collision_sizes.append(self.collision_sizes[-1] * 2)
+        self.collision_hierarchy = collision_hierarchy
+        self._tune_collisions = not collision_cell_size
+        self._next_collision_tune = 0
+        cell_size = collision_cell_size or 2 * vehicle_size
+
         traffic_collision_grid = CollisionTileGrid(
-            config.GRID_WIDTH,
-            config.GRID_HEIGHT,
-            config.TILE_WIDTH,
-            config.TILE_HEIGHT,
+            -(-w * config.TILE_WIDTH // cell_size),
+            -(-h * config.TILE_HEIGHT // cell_size),
+            cell_size,
+            cell_size,
         )
+        self.collision_layout = traffic_collision_grid.layout()
 
         # Network components
         self.grid = TileGrid(w, h)
-        self.graph = TravelGraph(config)
+        self.graph = TravelGraph(config, self.instruments)
         self.traffic = Traffic(
-            config, collision_tracker=traffic_collision_grid
+            config,
+            collision_tracker=traffic_collision_grid,
+            instruments=self.instruments,
+            event_driven=event_driven,
+        )
+        self.router = CongestionRouter(
+            config, self.graph, self.traffic, self.instruments
         )
+        # Travel nodes by zone, for sampling trip origins and destinations
+        self.node_index = NodeIndex(w, h)
+        # Shares the components' updates between readers. See `road.bus`.
+        self.bus = NetworkBus(self)
 
     def add_road(self, r, c, restrict_to_neighbors=True):
         """Add road node to the network
@@ -36,12 +95,85 @@ class RoadNetwork:
         tile_added = self.grid.add_tile(r, c, restrict_to_neighbors)
         if tile_added:
             nbrs = self.grid.get_neighbors(r, c)
-            self.graph.register_tile_intersection(
+            added = self.graph.register_tile_intersection(
                 r, c, self.grid.tile_type(r, c), nbrs
             )
+            self.node_index.add(added)
             return True
         return False
 
+    def remove_road(self, r, c):
+        """Remove road node from the network. Only the tile, its neighbors
+        and vehicles heading through it are updated.
+
+        returns: road removed (bool)
+        """
+        nbrs = self.grid.get_neighbors(r, c)
+        if not self.grid.remove_tile(r, c):
+            return False
+
+        generation = self.graph.generation
+        removed, changed = self.graph.unregister_tile_intersection(r, c, nbrs)
+        self.node_index.remove(removed)
+        detoured = self.traffic.remove_road(r, c, removed)
+        self.router.remove_nodes(removed, changed, detoured, generation)
+        return True
+
+    def send_to_hub(self, vehicle, hub: RoadSegmentNode):
+        """Send vehicle to hub by the fewest nodes, looking up each next node
+        in the travel graph's next-hop table to hub. Unlike `router.route()`
+        this ignores congestion, but costs O(1) per vehicle, however many
+        vehicles are headed to the hub.
+        """
+        self.router.unroute(vehicle)
+        route = self.graph.register_destination(hub)
+        self.traffic.set_vehicle_path(vehicle, route)
+
+    def send_to(self, vehicle, target: RoadSegmentNode):
+        """Send vehicle to target by the fewest nodes, ignoring congestion.
+        Unlike `router.route()` no search is kept for target, so it suits
+        one-off errands to targets few other vehicles head to. Uses the
+        travel graph's contraction hierarchy, if built.
+
+        raises: NoPathError if target can't be reached
+        """
+        path = self.graph.shortest_path(vehicle._last_t_node, target)
+        self.router.unroute(vehicle)
+        self.traffic.set_vehicle_path(vehicle, path)
+
+    def set_focus(self, regions: Iterable[Tuple[int, int, int, int]]):
+        """Simulate vehicles microscopically only in regions, given as tile
+        rectangles (r0, c0, r1, c1), end exclusive. Vehicles elsewhere are
+        simulated as queues along each edge. None simulates every vehicle
+        microscopically.
+        """
+        focus = None
+        if regions is not None:
+            focus = np.zeros((self.h, self.w), dtype=bool)
+            for r0, c0, r1, c1 in regions:
+                focus[r0:r1, c0:c1] = True
+        self.traffic.set_focus(focus)
+
     def step(self, tick):
-        """Step the network by some amount of ticks"""
+        """Step the network by some amount of ticks, then publish updates"""
         self.traffic.step(tick, self.grid)
+        self.router.step(tick)
+        if self._tune_collisions and (
+            self.traffic.time >= self._next_collision_tune
+        ):
+            self.tune_collisions()
+            self._next_collision_tune += COLLISION_TUNE_INTERVAL
+        self.bus.publish()
+
+    def tune_collisions(self):
+        """Retune the collision grid's tile layout to current vehicle
+        density, and report it in gauges
+        """
+        tracker = self.traffic.collision_tracker
+        layout = tracker.tune(self.collision_sizes, self.collision_hierarchy)
+        self.collision_layout = layout
+        gauge = self.instruments.gauge
+        gauge("collision_tile_size").set(layout.tile_size)
+        gauge("collision_split_tiles").set(layout.split_tiles)
+        gauge("collision_candidates").set(layout.candidates_per_check)
+        return layout
@@ -0,0 +1,81 @@
+"""Immutable travel paths, shared between vehicles.
+
+A vehicle follows a `TravelPath` with a cursor, the index of the next node
+it travels to, so advancing along a path is O(1) and never copies it. Paths
+are interned by `PathTable`, so vehicles sent along the same nodes share one
+path, and path memory grows with distinct paths rather than vehicles.
+
+Vehicles can also follow a `NextHopRoute` (see `road.grid`), which looks up
+each next node in a table. Both implement `node_at()`, `remaining()` and
+`destination`.
+"""
+
+import weakref
+from typing import Iterable, Tuple
+
+from .grid import RoadSegmentNode
+
+
+class TravelPath:
+    """An immutable sequence of connected travel nodes"""
+
+    __slots__ = ("nodes", "__weakref__")
+
+    def __init__(self, nodes: Tuple[RoadSegmentNode, ...]):
+        self.nodes = nodes
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __getitem__(self, i):
+        return self.nodes[i]
+
+    def __repr__(self):
+        return f"TravelPath({len(self.nodes)} nodes)"
+
+    @property
+    def destination(self) -> RoadSegmentNode:
+        """Last node, or None if empty"""
+        return self.nodes[-1] if self.nodes else None
+
+    def node_at(self, cursor, node: RoadSegmentNode) -> RoadSegmentNode:
+        """Node to travel to from node, cursor nodes along, or None past
+        the end
+        """
+        nodes = self.nodes
+        return nodes[cursor] if cursor < len(nodes) else None
+
+    def remaining(self, cursor, node) -> Tuple[RoadSegmentNode, ...]:
+        """Nodes left to travel to from node, cursor nodes along"""
+        return self.nodes[cursor:]
+
+
+# Path of vehicles with nowhere to go
+EMPTY_PATH = TravelPath(())
+
+
+class PathTable:
+    """Interns travel paths, so equal paths are one shared object.
+
+    Paths are held weakly, and dropped once no vehicle follows them.
+    """
+
+    def __init__(self):
+        # Keyed by each path's own `nodes`, so keys cost no extra memory
+        self._paths = weakref.WeakValueDictionary()
+
+    def __len__(self):
+        return len(self._paths)
+
+    def intern(self, nodes: Iterable[RoadSegmentNode]) -> TravelPath:
+        """Return the shared path through nodes"""
+        if isinstance(nodes, TravelPath):
+            nodes = nodes.nodes
+        nodes = tuple(nodes)
+        if not nodes:
+            return EMPTY_PATH
+        path = self._paths.get(nodes)
+        if path is None:
+            path = TravelPath(nodes)
+            self._paths[path.nodes] = path
+        return path
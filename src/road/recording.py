@@ -0,0 +1,569 @@
+"""Recording and replay of traffic runs.
+
+A recording is a single file made up of a header followed by a sequence of
+chunks:
+
+    MAGIC
+    u32 metadata length, metadata (json)
+    chunk*
+
+    chunk = u32 first step, u32 step count, u64 payload length, payload
+
+Each payload is a compressed `.npz` archive of column arrays covering
+`keyframe_interval` steps. The first step of every chunk is a keyframe holding
+the full state of every vehicle and the road layout. Following steps only hold
+rows for vehicles that were added, moved or changed waiting state, plus the
+ids of removed vehicles. Seeking to any step therefore decodes exactly one
+chunk.
+"""
+
+import io
+import json
+import queue
+import struct
+import threading
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .common import Update, Updateable
+from .grid import TileGrid, TravelGraph
+from .traffic import VEHICLE_STATE_DTYPE
+
+MAGIC = b"TRAFFICREC1\n"
+
+_CHUNK_HEADER = struct.Struct("<IIQ")
+_METADATA_LEN = struct.Struct("<I")
+
+
+############
+# Recorder #
+############
+
+
+class TrafficRecorder:
+    """Streams vehicle state of a `RoadNetwork` to a recording file.
+
+    `capture()` should be called once after every network step. It only
+    gathers vehicle state into an array; delta encoding, compression and disk
+    writes happen on a background thread so stepping doesn't wait on disk.
+
+    max_queued - chunks waiting for the writer before `capture()` blocks
+                 until it catches up, bounding memory when disk is slower
+                 than the simulation. Counted by the `recorder_stalls`
+                 counter.
+    """
+
+    def __init__(self, path, network, keyframe_interval=120, max_queued=4):
+        self.network = network
+        self.keyframe_interval = keyframe_interval
+
+        self._file = open(path, "wb")
+        metadata = {
+            "w": network.w,
+            "h": network.h,
+            "keyframe_interval": keyframe_interval,
+        }
+        encoded = json.dumps(metadata).encode()
+        self._file.write(MAGIC)
+        self._file.write(_METADATA_LEN.pack(len(encoded)))
+        self._file.write(encoded)
+
+        self._step = 0
+        self._chunk: List[Tuple[float, np.ndarray, np.ndarray]] = []
+        self._grid_generation = None
+        self._occupied = None
+
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._stalls = network.instruments.counter("recorder_stalls")
+        self._error = None
+        self._writer = threading.Thread(
+            target=self._write_chunks, name="traffic-recorder", daemon=True
+        )
+        self._writer.start()
+
+    def capture(self, tick):
+        """Capture the network's current state as the next recorded step"""
+        if self._error:
+            raise self._error
+
+        # Road layout rarely changes, so only copy it when the grid reports
+        # a change
+        grid = self.network.grid
+        if grid.generation != self._grid_generation:
+            self._grid_generation = grid.generation
+            self._occupied = grid.occupied()
+
+        self._chunk.append(
+            (tick, self.network.traffic.snapshot(), self._occupied)
+        )
+        self._step += 1
+
+        if len(self._chunk) == self.keyframe_interval:
+            self._flush()
+
+    def close(self):
+        """Write any buffered steps and wait for the file to be written"""
+        if self._file.closed:
+            return
+        if self._chunk:
+            self._flush()
+        self._queue.put(None)
+        self._writer.join()
+        self._file.close()
+        if self._error:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _flush(self):
+        """Hand the current chunk off to the writer thread"""
+        first_step = self._step - len(self._chunk)
+        item = (first_step, self._chunk)
+        self._chunk = []
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._stalls.inc()
+            self._queue.put(item)
+
+    def _write_chunks(self):
+        """Writer thread loop"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._error:
+                continue
+            try:
+                first_step, steps = item
+                payload = _encode_chunk(steps)
+                self._file.write(
+                    _CHUNK_HEADER.pack(first_step, len(steps), len(payload))
+                )
+                self._file.write(payload)
+            except Exception as e:
+                self._error = e
+
+
+def _encode_chunk(steps) -> bytes:
+    """Delta encode and compress a chunk of captured steps"""
+    ticks = np.empty(len(steps), dtype=np.float32)
+    step_rows = np.zeros(len(steps) + 1, dtype=np.int64)
+    step_removed = np.zeros(len(steps) + 1, dtype=np.int64)
+    rows = []
+    removed = []
+
+    tile_steps, tile_indexes, tile_added = [], [], []
+
+    prev = None
+    prev_occupied = None
+    for i, (tick, state, occupied) in enumerate(steps):
+        ticks[i] = tick
+        state = np.sort(state, order="id")
+
+        # Keyframe
+        if prev is None:
+            changed = state
+            gone = np.empty(0, dtype=np.int32)
+            first_occupied = occupied
+        else:
+            changed, gone = _state_delta(prev, state)
+            if occupied is not prev_occupied:
+                diff = np.flatnonzero(occupied != prev_occupied)
+                tile_steps.append(np.full(len(diff), i, dtype=np.int32))
+                tile_indexes.append(diff.astype(np.int32))
+                tile_added.append(occupied.ravel()[diff])
+
+        rows.append(changed)
+        removed.append(gone)
+        step_rows[i + 1] = step_rows[i] + len(changed)
+        step_removed[i + 1] = step_removed[i] + len(gone)
+        prev = state
+        prev_occupied = occupied
+
+    rows = np.concatenate(rows)
+    columns = {
+        "ticks": ticks,
+        "step_rows": step_rows,
+        "step_removed": step_removed,
+        "ids": rows["id"],
+        "xs": rows["x"],
+        "ys": rows["y"],
+        "waiting": rows["waiting"],
+        "removed": np.concatenate(removed),
+        "occupied_shape": np.array(first_occupied.shape, dtype=np.int32),
+        "occupied": np.packbits(first_occupied),
+        "tile_steps": _concat(tile_steps, np.int32),
+        "tile_indexes": _concat(tile_indexes, np.int32),
+        "tile_added": _concat(tile_added, bool),
+    }
+
+    buf = io.BytesIO()
+    np.savez_compressed(buf, **columns)
+    return buf.getvalue()
+
+
+def _state_delta(prev, state):
+    """Return (rows of `state` that differ from `prev`, ids removed since
+    `prev`). Both arrays must be sorted by id.
+    """
+    if np.array_equal(prev["id"], state["id"]):
+        changed = (
+            (prev["x"] != state["x"])
+            | (prev["y"] != state["y"])
+            | (prev["waiting"] != state["waiting"])
+        )
+        return state[changed], np.empty(0, dtype=np.int32)
+
+    existed = np.isin(state["id"], prev["id"], assume_unique=True)
+    idx = np.searchsorted(prev["id"], state["id"][existed])
+    old = prev[idx]
+    new = state[existed]
+    changed = np.ones(len(state), dtype=bool)
+    changed[existed] = (
+        (old["x"] != new["x"])
+        | (old["y"] != new["y"])
+        | (old["waiting"] != new["waiting"])
+    )
+    gone = np.setdiff1d(prev["id"], state["id"], assume_unique=True)
+    return state[changed], gone.astype(np.int32)
+
+
+def _concat(arrays, dtype):
+    if not arrays:
+        return np.empty(0, dtype=dtype)
+    return np.concatenate(arrays).astype(dtype)
+
+
+##########
+# Replay #
+##########
+
+
+class TrafficReplay:
+    """Plays back a recording without stepping a simulation.
+
+    Exposes the same `w`, `h`, `grid`, `graph` and `traffic` attributes
+    `RoadScreen` reads from a `RoadNetwork`, so a recording can be rendered
+    by handing a `TrafficReplay` to `RoadScreen` in place of the network.
+    """
+
+    def __init__(self, path, config):
+        self.config = config
+
+        self._file = open(path, "rb")
+        if self._file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a traffic recording")
+        (metadata_len,) = _METADATA_LEN.unpack(
+            self._file.read(_METADATA_LEN.size)
+        )
+        metadata = json.loads(self._file.read(metadata_len))
+
+        self.w = metadata["w"]
+        self.h = metadata["h"]
+        self.keyframe_interval = metadata["keyframe_interval"]
+
+        # Index chunk locations by reading their headers
+        self._chunk_offsets = []
+        self.n_steps = 0
+        while True:
+            header = self._file.read(_CHUNK_HEADER.size)
+            if len(header) < _CHUNK_HEADER.size:
+                break
+            first_step, n_steps, payload_len = _CHUNK_HEADER.unpack(header)
+            self._chunk_offsets.append(self._file.tell())
+            self._file.seek(payload_len, io.SEEK_CUR)
+            self.n_steps = first_step + n_steps
+
+        self._chunk_index = None
+        self._chunk = None
+
+        self.step = -1
+        self.grid = _ReplayGrid(self.w, self.h)
+        self.graph = _ReplayGraph(config)
+        self.traffic = ReplayTraffic()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def advance(self, n=1):
+        """Advance playback `n` steps.
+
+        returns: sum of recorded ticks advanced over, or None if the end of the
+                 recording has been reached
+        """
+        if self.step + 1 >= self.n_steps:
+            return None
+
+        elapsed = 0
+        for _ in range(n):
+            if self.step + 1 >= self.n_steps:
+                break
+            step = self.step + 1
+            chunk = self._load_chunk(step // self.keyframe_interval)
+            i = step % self.keyframe_interval
+            if i == 0:
+                self._apply_keyframe(chunk)
+            else:
+                self._apply_delta(chunk, i)
+            elapsed += float(chunk["ticks"][i])
+            self.step = step
+
+        return elapsed
+
+    def seek(self, step):
+        """Jump to the specified step"""
+        if not 0 <= step < self.n_steps:
+            raise IndexError(f"step {step} outside of recording")
+
+        chunk = self._load_chunk(step // self.keyframe_interval)
+        self._apply_keyframe(chunk)
+        for i in range(1, step % self.keyframe_interval + 1):
+            self._apply_delta(chunk, i)
+        self.step = step
+
+    def _load_chunk(self, index) -> Dict[str, np.ndarray]:
+        """Load and decompress the chunk at the provided index"""
+        if index != self._chunk_index:
+            self._file.seek(self._chunk_offsets[index] - _CHUNK_HEADER.size)
+            _, _, payload_len = _CHUNK_HEADER.unpack(
+                self._file.read(_CHUNK_HEADER.size)
+            )
+            payload = self._file.read(payload_len)
+            with np.load(io.BytesIO(payload)) as npz:
+                self._chunk = {k: npz[k] for k in npz.files}
+            self._chunk_index = index
+        return self._chunk
+
+    def _apply_keyframe(self, chunk):
+        shape = tuple(chunk["occupied_shape"])
+        occupied = np.unpackbits(chunk["occupied"], count=np.prod(shape))
+        self._set_occupied(occupied.reshape(shape).astype(bool))
+
+        start, end = chunk["step_rows"][0:2]
+        self.traffic.set_state(
+            chunk["ids"][start:end],
+            chunk["xs"][start:end],
+            chunk["ys"][start:end],
+            chunk["waiting"][start:end],
+        )
+
+    def _apply_delta(self, chunk, i):
+        tiles = chunk["tile_steps"] == i
+        if tiles.any():
+            occupied = self.grid.tiles.occupied()
+            occupied.ravel()[chunk["tile_indexes"][tiles]] = chunk[
+                "tile_added"
+            ][tiles]
+            self._set_occupied(occupied)
+
+        start, end = chunk["step_rows"][i : i + 2]
+        r_start, r_end = chunk["step_removed"][i : i + 2]
+        self.traffic.apply_delta(
+            chunk["ids"][start:end],
+            chunk["xs"][start:end],
+            chunk["ys"][start:end],
+            chunk["waiting"][start:end],
+            chunk["removed"][r_start:r_end],
+        )
+
+    def _set_occupied(self, occupied):
+        """Bring the replayed road layout in line with the occupied tiles"""
+        current = self.grid.tiles.occupied()
+        if np.array_equal(current, occupied):
+            return
+
+        added = occupied & ~current
+        if (current & ~occupied).any():
+            # Roads can't be removed incrementally; rebuild the layout and let
+            # the feeds post the differences
+            tiles, graph = _build_layout(self.config, self.w, self.h, occupied)
+            self.grid.replace(tiles)
+            self.graph.replace(graph)
+            return
+
+        _add_tiles(self.grid.tiles, self.graph.graph, added)
+
+
+def _build_layout(config, w, h, occupied):
+    """Build a TileGrid and TravelGraph for the provided occupied tiles"""
+    tiles = TileGrid(w, h)
+    graph = TravelGraph(config)
+    _add_tiles(tiles, graph, occupied)
+    tiles.get_updates()
+    graph.get_updates()
+    return tiles, graph
+
+
+def _add_tiles(tiles, graph, added):
+    """Add roads to the grid and graph for every tile set in `added`"""
+    for r, c in np.argwhere(added).tolist():
+        tiles.add_tile(r, c, restrict_to_neighbors=False)
+        graph.register_tile_intersection(
+            r, c, tiles.tile_type(r, c), tiles.get_neighbors(r, c)
+        )
+
+
+class _ReplayGrid(Updateable):
+    """Tile feed for a replay. Diffs the tile layout when it's rebuilt."""
+
+    def __init__(self, w, h):
+        self.tiles = TileGrid(w, h)
+        self.updates = []
+
+    def replace(self, tiles):
+        old, new = self.tiles.grid, tiles.grid
+        for r, c in np.argwhere(old != new).tolist():
+            if not new[r, c]:
+                self.updates.append(
+                    (Update.REMOVED, (r, c, tiles.tile_type(r, c)))
+                )
+            elif not old[r, c]:
+                self.updates.append(
+                    (Update.ADDED, (r, c, tiles.tile_type(r, c)))
+                )
+            else:
+                self.updates.append(
+                    (Update.STATE_CHANGED, (r, c, tiles.tile_type(r, c)))
+                )
+        self.tiles = tiles
+
+    def get_updates(self):
+        """Get updates and clear updates queue"""
+        updates = self.updates + self.tiles.get_updates()
+        self.updates = []
+        return updates
+
+
+class _ReplayGraph(Updateable):
+    """Travel edge feed for a replay. Diffs edges when it's rebuilt."""
+
+    def __init__(self, config):
+        self.graph = TravelGraph(config)
+        self.updates = []
+
+    def replace(self, graph):
+        old, new = set(self.graph.G.edges), set(graph.G.edges)
+        for edge in old - new:
+            self.updates.append((Update.REMOVED, edge))
+        for edge in new - old:
+            self.updates.append((Update.ADDED, edge))
+        self.graph = graph
+
+    def get_updates(self):
+        """Get updates and clear updates queue"""
+        updates = self.updates + self.graph.get_updates()
+        self.updates = []
+        return updates
+
+
+class ReplayTraffic(Updateable):
+    """Vehicle feed for a replay.
+
+    Vehicle state is kept as arrays sorted by vehicle id. Like `Traffic`, it
+    posts vehicle moves, and reports waiting state through `snapshot()`.
+    """
+
+    def __init__(self):
+        self.ids = np.empty(0, dtype=np.int32)
+        self.xs = np.empty(0, dtype=np.float32)
+        self.ys = np.empty(0, dtype=np.float32)
+        self.waiting = np.empty(0, dtype=bool)
+        self.updates = []
+
+    def set_state(self, ids, xs, ys, waiting):
+        """Replace all vehicle state, posting the differences"""
+        self._post_removed(~np.isin(self.ids, ids, assume_unique=True))
+        existed = np.isin(ids, self.ids, assume_unique=True)
+        self._post(ids, xs, ys, existed)
+
+        self.ids, self.xs, self.ys = ids.copy(), xs.copy(), ys.copy()
+        self.waiting = waiting.copy()
+
+    def apply_delta(self, ids, xs, ys, waiting, removed):
+        """Apply changed rows and removed ids to the vehicle state"""
+        if len(removed):
+            gone = np.isin(self.ids, removed, assume_unique=True)
+            self._post_removed(gone)
+            keep = ~gone
+            self.ids, self.xs, self.ys = (
+                self.ids[keep],
+                self.xs[keep],
+                self.ys[keep],
+            )
+            self.waiting = self.waiting[keep]
+
+        if not len(ids):
+            return
+
+        if len(self.ids):
+            idx = np.searchsorted(self.ids, ids)
+            idx = np.minimum(idx, len(self.ids) - 1)
+            existed = self.ids[idx] == ids
+        else:
+            idx = np.zeros(len(ids), dtype=np.int64)
+            existed = np.zeros(len(ids), dtype=bool)
+        self._post(ids, xs, ys, existed)
+
+        self.xs[idx[existed]] = xs[existed]
+        self.ys[idx[existed]] = ys[existed]
+        self.waiting[idx[existed]] = waiting[existed]
+
+        new = ~existed
+        if new.any():
+            self.ids = np.concatenate([self.ids, ids[new]])
+            self.xs = np.concatenate([self.xs, xs[new]])
+            self.ys = np.concatenate([self.ys, ys[new]])
+            self.waiting = np.concatenate([self.waiting, waiting[new]])
+            order = np.argsort(self.ids, kind="stable")
+            self.ids, self.xs, self.ys = (
+                self.ids[order],
+                self.xs[order],
+                self.ys[order],
+            )
+            self.waiting = self.waiting[order]
+
+    def snapshot(self) -> np.ndarray:
+        """Return id, location and waiting state of every vehicle as an array
+        of `VEHICLE_STATE_DTYPE`, as recorded from `Traffic.snapshot()`.
+        """
+        state = np.empty(len(self.ids), dtype=VEHICLE_STATE_DTYPE)
+        state["id"] = self.ids
+        state["x"] = self.xs
+        state["y"] = self.ys
+        state["waiting"] = self.waiting
+        return state
+
+    def _post(self, ids, xs, ys, existed):
+        """Post ADDED or MOVED updates for the provided rows"""
+        for id, x, y, old in zip(
+            ids.tolist(), xs.tolist(), ys.tolist(), existed.tolist()
+        ):
+            u_type = Update.MOVED if old else Update.ADDED
+            self.updates.append((u_type, (id, x, y)))
+
+    def _post_removed(self, gone):
+        """Post REMOVED updates for the vehicles selected by `gone`"""
+        for id, x, y in zip(
+            self.ids[gone].tolist(),
+            self.xs[gone].tolist(),
+            self.ys[gone].tolist(),
+        ):
+            self.updates.append((Update.REMOVED, (id, x, y)))
+
+    def get_updates(self) -> List[Tuple[Update, Tuple[int, float, float]]]:
+        """Get updates and clear updates queue"""
+        updates = self.updates
+        self.updates = []
+        return updates
@@ -0,0 +1,584 @@
+"""Congestion-aware routing.
+
+Edge costs are travel times, in seconds, plus penalties for live congestion:
+vehicles currently on the edge, and vehicles queued at the intersection the
+edge leaves from. `Traffic` keeps those counts up to date as vehicles move.
+
+Vehicles heading to the same target share an `IncrementalRoute`, a D* Lite
+search from the target back to the vehicles. When edge costs change, the
+route is repaired by updating only the affected nodes, rather than searching
+again from scratch. Repairs are spread across steps so every vehicle is
+revisited once per `REROUTE_INTERVAL` without spikes in step time. A route
+is dropped as soon as the last vehicle heading to its target arrives.
+"""
+
+import heapq
+import itertools
+import math
+from collections import Counter, deque
+from time import perf_counter_ns
+from typing import Dict, List, Set
+
+from .common import RoadNodeType
+from .digraph import DiGraph, NoPathError
+from .grid import RoadSegmentNode, TravelGraph
+from .traffic import Traffic, Vehicle
+from instrumentation import Instrumentation
+
+INF = math.inf
+
+
+class IncrementalRoute:
+    """Cheapest path from a moving start node to a fixed target, repaired
+    incrementally with D* Lite as edge costs change.
+
+    The search runs backwards from the target, so settled costs are
+    cost-to-go and stay valid as the start moves, whether along the path or
+    to another vehicle heading to the same target.
+
+    g   - settled cost-to-go of a node
+    rhs - one-step lookahead cost-to-go, min(cost(n, s) + g(s)) over
+          successors s. A node is consistent when g == rhs.
+    km  - accumulated heuristic offset from start moves, so queued keys
+          don't need to be recomputed when the start moves
+    """
+
+    __slots__ = (
+        "G",
+        "target",
+        "start",
+        "edge_cost",
+        "heuristic",
+        "g",
+        "rhs",
+        "km",
+        "seen",
+        "vehicles",
+        "_heap",
+        "_queued",
+        "_counter",
+    )
+
+    def __init__(self, G: DiGraph, start, target, edge_cost, heuristic):
+        self.G = G
+        self.start = start
+        self.target = target
+        self.edge_cost = edge_cost
+        self.heuristic = heuristic
+
+        # Nodes missing from g and rhs have a cost of INF
+        self.g: Dict[RoadSegmentNode, float] = {}
+        self.rhs: Dict[RoadSegmentNode, float] = {target: 0}
+        self.km = 0
+
+        # Router bookkeeping: last change batch applied to this route, and
+        # number of vehicles routed by it
+        self.seen = 0
+        self.vehicles = 0
+
+        # Heap of (key, tiebreak, node). Entries are stale unless their key
+        # matches `_queued[node]`. Compacted once mostly stale.
+        self._heap = []
+        self._queued: Dict[RoadSegmentNode, tuple] = {}
+        self._counter = itertools.count()
+        self._push(target, self._key(target))
+
+    def _key(self, node):
+        cost = min(self.g.get(node, INF), self.rhs.get(node, INF))
+        return (cost + self.heuristic(self.start, node) + self.km, cost)
+
+    def _push(self, node, key):
+        self._queued[node] = key
+        heap = self._heap
+        heapq.heappush(heap, (key, next(self._counter), node))
+        if len(heap) > 2 * len(self._queued) + 16:
+            self._compact()
+
+    def _compact(self):
+        """Rebuild the heap from queued nodes, dropping stale entries"""
+        counter = self._counter
+        self._heap = [
+            (key, next(counter), node) for node, key in self._queued.items()
+        ]
+        heapq.heapify(self._heap)
+
+    def _top(self):
+        """(key, node) of the next node to settle, dropping stale entries"""
+        heap = self._heap
+        while heap:
+            key, _, node = heap[0]
+            if self._queued.get(node) == key:
+                return key, node
+            heapq.heappop(heap)
+        return (INF, INF), None
+
+    def touches(self, node) -> bool:
+        """Whether the search has reached node"""
+        return node in self.rhs or node in self.g
+
+    def update_node(self, node):
+        """Recompute a node's lookahead cost, e.g. after the cost of one of
+        its outgoing edges changed.
+        """
+        if node != self.target:
+            rhs = INF
+            g = self.g
+            edge_cost = self.edge_cost
+            for s in self.G.succ.get(node, ()):
+                cost = edge_cost(node, s) + g.get(s, INF)
+                if cost < rhs:
+                    rhs = cost
+            if rhs == INF:
+                self.rhs.pop(node, None)
+            else:
+                self.rhs[node] = rhs
+        self._requeue(node)
+
+    def _requeue(self, node):
+        """Queue node if it's inconsistent, otherwise remove it from the
+        queue.
+        """
+        if self.g.get(node, INF) != self.rhs.get(node, INF):
+            self._push(node, self._key(node))
+        else:
+            self._queued.pop(node, None)
+
+    def move_start(self, start):
+        """Move the start, e.g. as the vehicle travels along its path"""
+        if start != self.start:
+            self.km += self.heuristic(self.start, start)
+            self.start = start
+
+    def compute(self):
+        """Settle nodes until the start's cost-to-go is final"""
+        g, rhs, preds = self.g, self.rhs, self.G.pred
+        start, target, edge_cost = self.start, self.target, self.edge_cost
+        while True:
+            top_key, node = self._top()
+            start_g = g.get(start, INF)
+            start_rhs = rhs.get(start, INF)
+            if start_g == start_rhs and top_key >= self._key(start):
+                return
+            if node is None:
+                return
+
+            new_key = self._key(node)
+            if top_key < new_key:
+                # Key is out of date from start moves. Requeue it.
+                self._push(node, new_key)
+                continue
+
+            heapq.heappop(self._heap)
+            del self._queued[node]
+
+            node_rhs = rhs.get(node, INF)
+            if g.get(node, INF) > node_rhs:
+                # Cost went down. Settle it. Predecessors can only get
+                # cheaper, by way of this node.
+                g[node] = node_rhs
+                for p in preds.get(node, ()):
+                    if p == target:
+                        continue
+                    cost = edge_cost(p, node) + node_rhs
+                    if cost < rhs.get(p, INF):
+                        rhs[p] = cost
+                        self._requeue(p)
+            else:
+                # Cost went up. Reopen the node and its predecessors to find
+                # their new costs.
+                g.pop(node, None)
+                self.update_node(node)
+                for p in preds.get(node, ()):
+                    self.update_node(p)
+
+    def path(self) -> List[RoadSegmentNode]:
+        """Cheapest path from the start to the target, including both ends"""
+        self.compute()
+        if self.g.get(self.start, INF) == INF:
+            raise NoPathError(f"No path from {self.start} to {self.target}")
+
+        g = self.g
+        edge_cost = self.edge_cost
+        node = self.start
+        path = [node]
+        # Following settled costs downhill can't loop, but guard anyway
+        for _ in range(len(self.G.succ)):
+            if node == self.target:
+                return path
+            best = INF
+            for s in self.G.succ[node]:
+                cost = edge_cost(node, s) + g.get(s, INF)
+                if cost < best:
+                    best, next_node = cost, s
+            node = next_node
+            path.append(node)
+        raise NoPathError(f"Route from {self.start} to {self.target} loops")
+
+
+class CongestionRouter:
+    """Routes vehicles by live travel times and repairs their routes as
+    congestion changes.
+
+    Route vehicles with `route()`. Routed vehicles are tracked until they
+    reach their destination. Vehicles heading to the same target share one
+    `IncrementalRoute`, so route memory grows with targets rather than
+    vehicles.
+    """
+
+    def __init__(
+        self,
+        config,
+        graph: TravelGraph,
+        traffic: Traffic,
+        instruments: Instrumentation = None,
+    ):
+        self.config = config
+        self.graph = graph
+        self.traffic = traffic
+
+        # vehicle id: (vehicle, route)
+        self.routes: Dict[int, tuple] = {}
+        # target: route shared by every vehicle heading to it
+        self.targets: Dict[RoadSegmentNode, IncrementalRoute] = {}
+        # Vehicle ids, in the order they're due for a repair, and the set of
+        # them. Ids of vehicles no longer routed are skipped when due.
+        self._due = deque()
+        self._due_ids: Set[int] = set()
+        # Fractional number of repairs carried over between steps
+        self._repair_credit = 0
+        # Milliseconds per step spent repairing routes. Starts at
+        # `REROUTE_BUDGET`, and may be lowered while frames run long.
+        self.budget = config.REROUTE_BUDGET
+
+        # Batches of nodes whose outgoing edge costs changed, as
+        # (batch number, nodes). Routes apply batches newer than their
+        # `seen` batch.
+        self._changes = deque()
+        self._batch = 0
+        # batch: number of routes that last saw it
+        self._seen = Counter()
+
+        self._graph_generation = graph.generation
+        # Edge costs as seen by routes. Only republished when the live cost
+        # drifts by `REROUTE_THRESHOLD` or more, so routes aren't repaired
+        # every time a vehicle moves. Cleared once no routes are left.
+        self._costs: Dict[tuple, float] = {}
+
+        # Congestion penalties
+        self.vehicle_cost = config.CONGESTION_VEHICLE_COST
+        self.queued_vehicle_cost = (
+            config.VEHICLE_STOP_WAIT_TIME + config.INTERSECTION_CLEAR_TIME
+        )
+
+        instruments = instruments or Instrumentation()
+        self._reroute_timer = instruments.timer("reroute")
+        self._repaired = instruments.counter("routes_repaired")
+        self._rerouted = instruments.counter("vehicles_rerouted")
+        self._routes_gauge = instruments.gauge("routed_vehicles")
+        self._targets_gauge = instruments.gauge("routed_targets")
+
+    def edge_cost(self, u: RoadSegmentNode, v: RoadSegmentNode) -> float:
+        """Published cost of traveling edge (u, v), in seconds"""
+        cost = self._costs.get((u, v))
+        if cost is None:
+            cost = self._costs[(u, v)] = self.live_edge_cost(u, v)
+        return cost
+
+    def live_edge_cost(self, u: RoadSegmentNode, v: RoadSegmentNode):
+        """Current cost of traveling edge (u, v), in seconds"""
+        cost = self.heuristic(u, v)
+        occupancy = self.traffic.edge_occupancy.get((u, v))
+        if occupancy:
+            cost += occupancy * self.vehicle_cost
+        if u.node_type == RoadNodeType.ENTER:
+            cost += self.traffic.queued_at(u) * self.queued_vehicle_cost
+        return cost
+
+    def heuristic(self, u: RoadSegmentNode, v: RoadSegmentNode) -> float:
+        """Free-flow travel time in a straight line from u to v. Never more
+        than the cost of any path from u to v.
+        """
+        (ux, uy), (vx, vy) = u.world_coords, v.world_coords
+        # Vehicles travel one tile width per second
+        return math.hypot(vx - ux, vy - uy) / self.config.TILE_WIDTH
+
+    def _check_graph(self):
+        """Restart all routes if roads changed.
+
+        Road changes are rare player actions, so routes are searched again
+        rather than repaired.
+        """
+        if self.graph.generation != self._graph_generation:
+            self._graph_generation = self.graph.generation
+            self._costs.clear()
+            for route in self.targets.values():
+                self._forget(route)
+            self.targets = {}
+            routes, self.routes = self.routes, {}
+            for v, route in routes.values():
+                if v.has_path():
+                    self._attach(
+                        v, self._shared_route(v.next_node(), route.target)
+                    )
+            self._trim_changes()
+
+    def remove_nodes(
+        self,
+        removed: Set[RoadSegmentNode],
+        changed: Set[RoadSegmentNode],
+        detoured: List[Vehicle],
+        generation: int,
+    ):
+        """Update routes after nodes were removed from the graph.
+
+        Detoured vehicles are rerouted to their targets, or stop routing if
+        their target is gone. Other routes are repaired as they come due,
+        like after congestion changes.
+
+        removed    - nodes removed from the graph
+        changed    - remaining nodes whose outgoing edges changed
+        detoured   - vehicles whose paths were cut short by the removal
+        generation - graph generation before the removal
+        """
+        for id, (v, route) in list(self.routes.items()):
+            if id not in self.traffic.vehicles or route.target in removed:
+                self._detach(id)
+
+        if generation != self._graph_generation:
+            # Routes were already out of date
+            self._check_graph()
+        else:
+            self._graph_generation = self.graph.generation
+            for node in changed | removed:
+                for x in removed:
+                    self._costs.pop((node, x), None)
+                    self._costs.pop((x, node), None)
+            # Routes may still hold costs of removed nodes, but no remaining
+            # node leads to them. Re-adding roads restarts all routes.
+            self._batch += 1
+            self._changes.append((self._batch, changed))
+
+        # Detoured vehicles are repaired first. Until then they drive as far
+        # as they can.
+        first = [v._id for v in detoured if v._id in self.routes]
+        if first:
+            first_set = set(first)
+            self._due = deque(
+                first + [id for id in self._due if id not in first_set]
+            )
+            self._due_ids |= first_set
+        self._trim_changes()
+
+    def _new_route(self, start, target) -> IncrementalRoute:
+        return IncrementalRoute(
+            self.graph.G, start, target, self.edge_cost, self.heuristic
+        )
+
+    def _shared_route(self, start, target) -> IncrementalRoute:
+        """Route to target, from start. Vehicles heading to target share
+        it, so it's brought up to date with changes it hasn't seen first.
+        """
+        route = self.targets.get(target)
+        if route is None:
+            route = self._new_route(start, target)
+            route.seen = self._batch
+        else:
+            self._catch_up(route)
+            route.move_start(start)
+        return route
+
+    def _attach(self, vehicle: Vehicle, route: IncrementalRoute):
+        """Track vehicle as routed by route"""
+        if not route.vehicles:
+            self.targets[route.target] = route
+            self._remember(route)
+        route.vehicles += 1
+        self.routes[vehicle._id] = (vehicle, route)
+
+    def _detach(self, id):
+        """Stop tracking vehicle id as routed"""
+        _, route = self.routes.pop(id)
+        self._release(route)
+
+    def _release(self, route: IncrementalRoute):
+        """Drop a vehicle's use of route, and the route once unused"""
+        route.vehicles -= 1
+        if not route.vehicles:
+            del self.targets[route.target]
+            self._forget(route)
+            if not self.targets:
+                self._costs.clear()
+
+    def _catch_up(self, route: IncrementalRoute):
+        """Apply change batches route hasn't seen yet"""
+        if route.seen == self._batch:
+            return
+        changed = set()
+        for batch, nodes in self._changes:
+            if batch > route.seen:
+                changed |= nodes
+        for node in changed:
+            # Nodes the search hasn't reached yet will see current costs
+            # when it does
+            if route.touches(node):
+                route.update_node(node)
+        self._forget(route)
+        self._remember(route)
+
+    def _remember(self, route):
+        """Track that route has seen all changes so far"""
+        route.seen = self._batch
+        self._seen[route.seen] += 1
+
+    def _forget(self, route):
+        self._seen[route.seen] -= 1
+        if not self._seen[route.seen]:
+            del self._seen[route.seen]
+
+    def _trim_changes(self):
+        """Drop change batches every route has seen"""
+        min_seen = min(self._seen, default=self._batch)
+        while self._changes and self._changes[0][0] <= min_seen:
+            self._changes.popleft()
+
+    def shortest_path(self, source, target) -> List[RoadSegmentNode]:
+        """Cheapest path from source to target by current travel times"""
+        self._check_graph()
+        return self._shared_route(source, target).path()
+
+    def route(self, vehicle: Vehicle, target: RoadSegmentNode):
+        """Send vehicle to target along the cheapest path, and keep it on
+        the cheapest path as congestion changes.
+        """
+        self._check_graph()
+        route = self._shared_route(vehicle._last_t_node, target)
+        self.traffic.set_vehicle_path(vehicle, route.path())
+
+        previous = self.routes.get(vehicle._id)
+        self._attach(vehicle, route)
+        if previous:
+            self._release(previous[1])
+        if vehicle._id not in self._due_ids:
+            self._due.append(vehicle._id)
+            self._due_ids.add(vehicle._id)
+
+    def unroute(self, vehicle: Vehicle):
+        """Stop keeping vehicle on the cheapest path. Its path is kept."""
+        if vehicle._id in self.routes:
+            self._detach(vehicle._id)
+
+    def step(self, tick):
+        """Repair a share of routes, so each is repaired once every
+        `REROUTE_INTERVAL` seconds, within `self.budget` milliseconds.
+
+        Repairs over budget are carried over to the next step.
+        """
+        self._drop_arrived()
+        interval = self.config.REROUTE_INTERVAL
+        if not interval:
+            return
+
+        with self._reroute_timer:
+            self._check_graph()
+            self._collect_changes()
+
+            due = len(self._due)
+            self._repair_credit = min(
+                self._repair_credit + due * min(tick / interval, 1), due
+            )
+            n = int(self._repair_credit)
+            deadline = perf_counter_ns() + self.budget * 1e6
+            self._repair_credit -= self._repair(n, deadline)
+
+    def reroute(self):
+        """Repair every route now"""
+        self._drop_arrived()
+        with self._reroute_timer:
+            self._check_graph()
+            self._collect_changes()
+            self._repair(len(self._due))
+
+    def _drop_arrived(self):
+        """Stop tracking vehicles that reached their targets"""
+        routes = self.routes
+        for id in self.traffic.get_arrivals():
+            entry = routes.get(id)
+            if entry and entry[0]._last_t_node == entry[1].target:
+                self._detach(id)
+        self._routes_gauge.set(len(routes))
+        self._targets_gauge.set(len(self.targets))
+
+    def _collect_changes(self):
+        """Republish costs that drifted, and batch up nodes whose outgoing
+        edge costs changed.
+        """
+        changed = set()
+        costs = self._costs
+        succ = self.graph.G.succ
+        threshold = self.config.REROUTE_THRESHOLD
+        for u in self.traffic.get_congestion_changes():
+            for v in succ.get(u, ()):
+                published = costs.get((u, v))
+                # Costs no route has read yet will be current when read
+                if published is None:
+                    continue
+                live = self.live_edge_cost(u, v)
+                if live != published and abs(live - published) >= threshold:
+                    costs[(u, v)] = live
+                    changed.add(u)
+
+        if changed:
+            self._batch += 1
+            self._changes.append((self._batch, changed))
+
+    def _repair(self, n, deadline=None) -> int:
+        """Repair the next n routes that are due, stopping early at the
+        deadline, if any.
+
+        returns: number of routes visited
+        """
+        due, due_ids = self._due, self._due_ids
+        visited = repaired = rerouted = 0
+        for _ in range(min(n, len(due))):
+            if deadline and perf_counter_ns() > deadline:
+                break
+            visited += 1
+            id = due.popleft()
+            if id not in self.routes:
+                # Removed, or no longer routed
+                due_ids.discard(id)
+                continue
+            v, route = self.routes[id]
+            if id not in self.traffic.vehicles or (
+                not v.has_path() and v._last_t_node == route.target
+            ):
+                # Removed, or arrived
+                self._detach(id)
+                due_ids.discard(id)
+                continue
+
+            # Keep heading to the current target node. The vehicle may be
+            # part way down the edge to it.
+            self._catch_up(route)
+            route.move_start(v.next_node() or v._last_t_node)
+            try:
+                path = route.path()
+            except NoPathError:
+                # Target was cut off. Stop routing the vehicle.
+                self._detach(id)
+                due_ids.discard(id)
+                continue
+            repaired += 1
+            # Reroute if the path changed, or was cut short by removed roads
+            if tuple(path) != v.path:
+                self.traffic.set_vehicle_path(v, path)
+                rerouted += 1
+            due.append(id)
+
+        self._trim_changes()
+
+        self._repaired.inc(repaired)
+        self._rerouted.inc(rerouted)
+        self._routes_gauge.set(len(self.routes))
+        self._targets_gauge.set(len(self.targets))
+        return visited
@@ -0,0 +1,145 @@
+"""Running statistics of intersection queues.
+
+Statistics are updated in O(1) per queue event and held in fixed memory, so
+they can be kept for hour long runs and read at any time, without storing
+events.
+"""
+
+import bisect
+from typing import Dict, List
+
+import numpy as np
+
+from .common import Direction
+
+# Upper edges of the wait time histogram bins, in seconds. A last bin counts
+# longer waits.
+WAIT_TIME_BIN_EDGES = (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+N_WAIT_TIME_BINS = len(WAIT_TIME_BIN_EDGES) + 1
+
+_N_DIRECTIONS = len(Direction)
+
+# Per-intersection statistics returned by `Traffic.intersection_stats()`.
+# Direction fields are indexed by `Direction`.
+INTERSECTION_STATS_DTYPE = np.dtype(
+    [
+        ("r", np.int32),
+        ("c", np.int32),
+        ("released", np.int64, (_N_DIRECTIONS,)),
+        ("mean_queue", np.float64, (_N_DIRECTIONS,)),
+        ("max_queue", np.int32, (_N_DIRECTIONS,)),
+        ("mean_wait", np.float64),
+        ("max_wait", np.float64),
+        ("wait_histogram", np.int64, (N_WAIT_TIME_BINS,)),
+    ]
+)
+
+
+class IntersectionStats:
+    """Throughput, queue lengths and wait times of an intersection's
+    direction queues, since `start`.
+
+    Structure:
+        self.released = [n_vehicles, ..]  # released from each direction
+        self.queue_lengths = [n_vehicles, ..]  # currently in each direction
+        self.max_queue = [n_vehicles, ..]
+        self.wait_histogram = [n_vehicles, ..]  # by `WAIT_TIME_BIN_EDGES`
+    """
+
+    __slots__ = (
+        "start",
+        "released",
+        "queue_lengths",
+        "max_queue",
+        "wait_total",
+        "max_wait",
+        "wait_histogram",
+        "_queue_area",
+        "_last_change",
+        "_enqueued",
+    )
+
+    def __init__(self, time):
+        self.start = time
+
+        self.released = [0] * _N_DIRECTIONS
+        self.queue_lengths = [0] * _N_DIRECTIONS
+        self.max_queue = [0] * _N_DIRECTIONS
+
+        # Waits of released vehicles, in seconds
+        self.wait_total = 0
+        self.max_wait = 0
+        self.wait_histogram = [0] * N_WAIT_TIME_BINS
+
+        # Queue length integrated over time, up to each direction's last
+        # change
+        self._queue_area = [0] * _N_DIRECTIONS
+        self._last_change = [time] * _N_DIRECTIONS
+
+        # Queued vehicles: {id: enqueue time, ..}
+        self._enqueued: Dict[int, float] = {}
+
+    def enqueued(self, vehicle_id, drctn: Direction, time):
+        """Record a vehicle joining a direction queue"""
+        self._enqueued[vehicle_id] = time
+        self._queue_changed(drctn, time, 1)
+
+    def released_vehicle(self, vehicle_id, drctn: Direction, time):
+        """Record a vehicle released from a direction queue"""
+        self._queue_changed(drctn, time, -1)
+        self.released[drctn] += 1
+
+        wait = time - self._enqueued.pop(vehicle_id)
+        self.wait_total += wait
+        if wait > self.max_wait:
+            self.max_wait = wait
+        self.wait_histogram[bisect.bisect_left(WAIT_TIME_BIN_EDGES, wait)] += 1
+
+    def left(self, vehicle_id, drctn: Direction, time):
+        """Record a vehicle leaving a direction queue without being
+        released, e.g. because it was removed.
+        """
+        self._queue_changed(drctn, time, -1)
+        del self._enqueued[vehicle_id]
+
+    def _queue_changed(self, drctn, time, change):
+        length = self.queue_lengths[drctn]
+        self._queue_area[drctn] += length * (time - self._last_change[drctn])
+        self._last_change[drctn] = time
+
+        length += change
+        self.queue_lengths[drctn] = length
+        if length > self.max_queue[drctn]:
+            self.max_queue[drctn] = length
+
+    def mean_queue(self, time) -> List[float]:
+        """Time-averaged length of each direction queue, up to time"""
+        elapsed = time - self.start
+        if elapsed <= 0:
+            return [float(n) for n in self.queue_lengths]
+        return [
+            (area + n * (time - last)) / elapsed
+            for area, n, last in zip(
+                self._queue_area, self.queue_lengths, self._last_change
+            )
+        ]
+
+    def mean_wait(self) -> float:
+        """Mean wait of released vehicles, in seconds"""
+        waits = sum(self.released)
+        return self.wait_total / waits if waits else 0
+
+    def wait_percentile(self, q) -> float:
+        """Upper edge of the histogram bin holding the q-th percentile wait,
+        in seconds. Waits past the last edge are reported as `max_wait`.
+        """
+        waits = sum(self.wait_histogram)
+        if not waits:
+            return 0
+        rank = q / 100 * waits
+        seen = 0
+        for edge, n in zip(WAIT_TIME_BIN_EDGES, self.wait_histogram):
+            seen += n
+            if seen >= rank:
+                return min(edge, self.max_wait)
+        return self.max_wait
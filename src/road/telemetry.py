@@ -0,0 +1,313 @@
+"""Live telemetry: streams a simulation's update feeds to local clients.
+
+Clients connect over TCP or a Unix socket and receive a stream of messages,
+one per frame, each prefixed with its u32 length:
+
+    u8 kind (FRAME or SNAPSHOT), u32 step, f32 tick,
+    u32 tile rows, u32 edge rows, u32 vehicle rows, u32 state rows,
+    tile rows     - TILE_DTYPE
+    edge rows     - EDGE_DTYPE
+    vehicle rows  - VEHICLE_DTYPE
+    state rows    - STATE_DTYPE
+
+FRAME messages hold the updates published by a network's `NetworkBus` over
+one frame, coalesced per key. SNAPSHOT messages hold the full state, as
+ADDED rows, and replace whatever the client had. Every client starts with a
+snapshot, and one is broadcast every `snapshot_interval` frames.
+
+Clients that fall `max_pending` frames behind have their queued frames
+dropped and are sent a fresh snapshot once they catch up, so a slow client
+never makes the server buffer without bound.
+
+Encoding, snapshots and socket writes all happen on the server's thread. The
+simulation thread only reads the server's subscription each frame, and hands
+over the update lists.
+"""
+
+import asyncio
+import struct
+import threading
+from collections import deque, namedtuple
+from typing import Dict, Tuple
+
+import numpy as np
+
+from .bus import NetworkBus, NetworkSubscription
+from .common import Update
+
+# Message kinds
+FRAME = 0
+SNAPSHOT = 1
+
+MESSAGE_LENGTH = struct.Struct("<I")
+_HEADER = struct.Struct("<BIfIIII")
+
+TILE_DTYPE = np.dtype(
+    [("update", "u1"), ("r", "<u2"), ("c", "<u2"), ("tile_type", "u1")]
+)
+_NODE_FIELDS = [("r", "<u2"), ("c", "<u2"), ("dir", "u1"), ("type", "u1")]
+EDGE_DTYPE = np.dtype(
+    [("update", "u1")]
+    + [(f"u_{name}", t) for name, t in _NODE_FIELDS]
+    + [(f"v_{name}", t) for name, t in _NODE_FIELDS]
+)
+VEHICLE_DTYPE = np.dtype(
+    [("update", "u1"), ("id", "<i4"), ("x", "<f4"), ("y", "<f4")]
+)
+# Collision state of vehicles, from STATE_CHANGED updates
+STATE_DTYPE = np.dtype([("id", "<i4"), ("collided", "u1")])
+
+TelemetryMessage = namedtuple(
+    "TelemetryMessage",
+    ["kind", "step", "tick", "tiles", "edges", "vehicles", "states"],
+)
+
+
+class TelemetryServer:
+    """Streams update feeds to local subscribers on a background thread.
+
+    Subscribe to a network's bus with `subscribe()`, then call `end_frame()`
+    once per frame, after the network stepped. Subscribe before the network
+    is built, or first stepped, so no updates are missed.
+
+    port - TCP port to listen on, 0 for any free port
+    path - Unix socket path to listen on, instead of TCP
+    """
+
+    def __init__(
+        self,
+        port=0,
+        path=None,
+        host="127.0.0.1",
+        snapshot_interval=120,
+        max_pending=8,
+    ):
+        self.snapshot_interval = snapshot_interval
+        self.max_pending = max_pending
+
+        self._feeds: NetworkSubscription = None
+        self._step = 0
+
+        # (step, tick) of the last published frame
+        self._last = (0, 0)
+
+        # State as of the last published frame, for snapshots. Only used on
+        # the server thread.
+        self._tiles: Dict[Tuple[int, int], int] = {}  # (r, c): tile type
+        self._edges: Dict[tuple, None] = {}  # edge row, less update type
+        self._vehicles: Dict[int, Tuple[float, float]] = {}  # id: (x, y)
+        self._clients = set()
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="telemetry-server", daemon=True
+        )
+        self._thread.start()
+        self._server = asyncio.run_coroutine_threadsafe(
+            self._start(host, port, path), self._loop
+        ).result()
+        # Address clients connect to: (host, port) or the socket path
+        self.address = self._server.sockets[0].getsockname()
+
+    async def _start(self, host, port, path):
+        if path is not None:
+            return await asyncio.start_unix_server(self._serve_client, path)
+        return await asyncio.start_server(self._serve_client, host, port)
+
+    def subscribe(self, bus: NetworkBus):
+        """Stream the updates published by bus"""
+        if self._feeds is not None:
+            self._feeds.close()
+        self._feeds = bus.subscribe()
+
+    def end_frame(self, tick):
+        """Stream the updates published since the last call"""
+        feeds = self._feeds
+        frame = [[], [], []]
+        if feeds is not None:
+            frame = [
+                feeds.grid.get_updates(),
+                feeds.graph.get_updates(),
+                feeds.traffic.get_updates(),
+            ]
+        self._loop.call_soon_threadsafe(self._publish, self._step, tick, frame)
+        self._step += 1
+
+    def close(self):
+        """Disconnect all clients and stop the server"""
+        if not self._loop.is_running():
+            return
+        if self._feeds is not None:
+            self._feeds.close()
+        asyncio.run_coroutine_threadsafe(self._stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    async def _stop(self):
+        self._server.close()
+        tasks = [client.task for client in self._clients]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._server.wait_closed()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    ###############
+    # Server side #
+    ###############
+
+    def _publish(self, step, tick, frame):
+        """Mirror and broadcast a frame"""
+        tiles, edges, vehicles, states = self._encode_frame(*frame)
+        if step % self.snapshot_interval == 0:
+            message = self._encode_snapshot(step, tick)
+        else:
+            message = _encode(
+                FRAME, step, tick, tiles, edges, vehicles, states
+            )
+
+        for client in self._clients:
+            if client.needs_snapshot:
+                continue
+            if len(client.pending) >= self.max_pending:
+                # Too far behind. Skip to a snapshot once caught up.
+                client.pending.clear()
+                client.needs_snapshot = True
+            else:
+                client.pending.append(message)
+            client.wakeup.set()
+        self._last = (step, tick)
+
+    def _encode_frame(self, tile_updates, edge_updates, vehicle_updates):
+        """Encode a frame's updates as row arrays, applying them to the
+        mirrored state.
+        """
+        tile_rows = []
+        for u_type, (r, c, tile_type) in tile_updates:
+            tile_rows.append((u_type, r, c, tile_type))
+            if u_type == Update.REMOVED:
+                self._tiles.pop((r, c), None)
+            else:
+                self._tiles[(r, c)] = tile_type
+
+        edge_rows = []
+        for u_type, (u, v) in edge_updates:
+            key = (*u.tile_index, u.dir, u.node_type)
+            key += (*v.tile_index, v.dir, v.node_type)
+            edge_rows.append((u_type, *key))
+            if u_type == Update.REMOVED:
+                self._edges.pop(key, None)
+            else:
+                self._edges[key] = None
+
+        vehicle_rows, state_rows = [], []
+        mirrored = self._vehicles
+        for u_type, params in vehicle_updates:
+            if u_type == Update.STATE_CHANGED:
+                state_rows.append(params)
+                continue
+            id, x, y = params
+            vehicle_rows.append((u_type, id, x, y))
+            if u_type == Update.REMOVED:
+                mirrored.pop(id, None)
+            else:
+                mirrored[id] = (x, y)
+
+        return (
+            np.array(tile_rows, dtype=TILE_DTYPE),
+            np.array(edge_rows, dtype=EDGE_DTYPE),
+            np.array(vehicle_rows, dtype=VEHICLE_DTYPE),
+            np.array(state_rows, dtype=STATE_DTYPE),
+        )
+
+    def _encode_snapshot(self, step, tick) -> bytes:
+        """Encode the mirrored state"""
+        added = Update.ADDED
+        tiles = np.array(
+            [(added, r, c, t) for (r, c), t in self._tiles.items()],
+            dtype=TILE_DTYPE,
+        )
+        edges = np.array(
+            [(added, *key) for key in self._edges], dtype=EDGE_DTYPE
+        )
+        vehicles = np.array(
+            [(added, id, x, y) for id, (x, y) in self._vehicles.items()],
+            dtype=VEHICLE_DTYPE,
+        )
+        states = np.empty(0, dtype=STATE_DTYPE)
+        return _encode(SNAPSHOT, step, tick, tiles, edges, vehicles, states)
+
+    async def _serve_client(self, reader, writer):
+        client = _Client(writer)
+        self._clients.add(client)
+        try:
+            while True:
+                await client.wakeup.wait()
+                client.wakeup.clear()
+                while client.needs_snapshot or client.pending:
+                    if client.needs_snapshot:
+                        client.needs_snapshot = False
+                        client.pending.clear()
+                        message = self._encode_snapshot(*self._last)
+                    else:
+                        message = client.pending.popleft()
+                    writer.write(message)
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._clients.discard(client)
+            writer.close()
+
+
+class _Client:
+    """A subscriber's queue of encoded messages"""
+
+    __slots__ = ("writer", "task", "pending", "needs_snapshot", "wakeup")
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.task = asyncio.current_task()
+        self.pending = deque()
+        # New clients start from a snapshot
+        self.needs_snapshot = True
+        self.wakeup = asyncio.Event()
+        self.wakeup.set()
+
+
+def _encode(kind, step, tick, tiles, edges, vehicles, states) -> bytes:
+    """Encode a length prefixed message"""
+    header = _HEADER.pack(
+        kind, step, tick, len(tiles), len(edges), len(vehicles), len(states)
+    )
+    body = b"".join(
+        (
+            header,
+            tiles.tobytes(),
+            edges.tobytes(),
+            vehicles.tobytes(),
+            states.tobytes(),
+        )
+    )
+    return MESSAGE_LENGTH.pack(len(body)) + body
+
+
+def decode_message(payload: bytes) -> TelemetryMessage:
+    """Decode a message, less its length prefix"""
+    kind, step, tick, *counts = _HEADER.unpack_from(payload)
+    offset = _HEADER.size
+    arrays = []
+    for dtype, count in zip(
+        (TILE_DTYPE, EDGE_DTYPE, VEHICLE_DTYPE, STATE_DTYPE), counts
+    ):
+        arrays.append(
+            np.frombuffer(payload, dtype=dtype, count=count, offset=offset)
+        )
+        offset += dtype.itemsize * count
+    return TelemetryMessage(kind, step, tick, *arrays)
@@ -0,0 +1,121 @@
+from road.bus import UpdateBus, vehicle_key
+from road.common import Update, Updateable
+from road.network import RoadNetwork
+from test_helpers import config
+
+
+class _Feed(Updateable):
+    def __init__(self):
+        self.updates = []
+
+    def get_updates(self):
+        updates = self.updates
+        self.updates = []
+        return updates
+
+
+def _mocked_config():
+    return config.mock_config(
+        tile_width=4,
+        tile_height=4,
+        road_width=2,
+        vehicle_radius=1,
+        vehicle_stop_wait_time=0.1,
+        intersection_clear_time=0.1,
+        reroute_interval=0,
+    )
+
+
+def test_coalescing():
+    feed = _Feed()
+    bus = UpdateBus(feed, vehicle_key, (Update.STATE_CHANGED,))
+    eager, lazy = bus.subscribe(), bus.subscribe()
+
+    feed.updates = [
+        (Update.ADDED, (0, 0, 0)),
+        (Update.ADDED, (1, 0, 0)),
+        (Update.ADDED, (2, 0, 0)),
+        (Update.STATE_CHANGED, (0, True)),
+    ]
+    bus.publish()
+    assert eager.get_updates() == [
+        (Update.ADDED, (0, 0, 0)),
+        (Update.ADDED, (1, 0, 0)),
+        (Update.ADDED, (2, 0, 0)),
+        (Update.STATE_CHANGED, (0, True)),
+    ]
+
+    for step in range(1, 100):
+        feed.updates = [
+            (Update.MOVED, (0, step, 0)),
+            (Update.MOVED, (1, step, 0)),
+            (Update.STATE_CHANGED, (0, step % 2 == 0)),
+        ]
+        bus.publish()
+    feed.updates = [
+        (Update.REMOVED, (1, 99, 0)),
+        (Update.REMOVED, (2, 0, 0)),
+        (Update.ADDED, (2, 5, 5)),
+        (Update.ADDED, (3, 0, 0)),
+        (Update.MOVED, (3, 1, 1)),
+        (Update.ADDED, (4, 0, 0)),
+        (Update.STATE_CHANGED, (4, True)),
+        (Update.REMOVED, (4, 0, 0)),
+    ]
+    bus.publish()
+
+    # The lazy reader never saw vehicles 1 and 2 before they were removed
+    assert len(lazy.pending) == 3
+    assert lazy.get_updates() == [
+        (Update.ADDED, (0, 99, 0)),
+        (Update.ADDED, (2, 5, 5)),
+        (Update.ADDED, (3, 1, 1)),
+        (Update.STATE_CHANGED, (0, False)),
+    ]
+    assert eager.get_updates() == [
+        (Update.MOVED, (0, 99, 0)),
+        (Update.REMOVED, (1, 99, 0)),
+        (Update.REMOVED, (2, 0, 0)),
+        (Update.ADDED, (2, 5, 5)),
+        (Update.ADDED, (3, 1, 1)),
+        (Update.STATE_CHANGED, (0, False)),
+    ]
+    assert eager.get_updates() == lazy.get_updates() == []
+
+    eager.close()
+    feed.updates = [(Update.MOVED, (0, 100, 0))]
+    bus.publish()
+    assert eager.get_updates() == []
+    assert lazy.get_updates() == [(Update.MOVED, (0, 100, 0))]
+
+
+def test_network_bus():
+    network = RoadNetwork(_mocked_config(), 4, 4)
+    screen = network.bus.subscribe()
+    for r in range(4):
+        for c in range(4):
+            network.add_road(r, c, restrict_to_neighbors=False)
+    nodes = list(network.graph.G.nodes)
+    vehicles = [network.traffic.add_vehicle(n) for n in nodes[:10]]
+    for v, target in zip(vehicles, reversed(nodes)):
+        network.router.route(v, target)
+
+    late = None
+    for step in range(60):
+        network.step(1 / 60)
+        if step == 0:
+            late = network.bus.subscribe()
+        screen.traffic.get_updates()
+
+    # Held updates stay bounded by vehicles, however long they go unread
+    assert len(late.traffic.pending) <= len(vehicles)
+    # Published updates are taken from the feeds, even without readers
+    screen.close()
+    late.close()
+    network.remove_road(3, 3)
+    network.step(1 / 60)
+    assert network.grid.updates == []
+    assert network.traffic.updates == []
+
+    assert len(screen.grid.get_updates()) == 16
+    assert {u for u, _ in screen.graph.get_updates()} == {Update.ADDED}
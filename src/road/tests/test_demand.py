@@ -0,0 +1,89 @@
+import numpy as np
+
+from road.demand import ZONE_SIZE, Demand, NodeIndex
+from road.network import RoadNetwork
+from test_helpers import config
+
+N = 2 * ZONE_SIZE
+
+
+def _mocked_config():
+    return config.mock_config(
+        tile_width=4,
+        tile_height=4,
+        road_width=2,
+        vehicle_radius=1,
+        vehicle_stop_wait_time=0.1,
+        intersection_clear_time=0.1,
+        reroute_interval=0,
+    )
+
+
+def _build_network():
+    network = RoadNetwork(_mocked_config(), N, N)
+    for r in range(N):
+        for c in range(N):
+            network.add_road(r, c, restrict_to_neighbors=False)
+    return network
+
+
+def _indexed_nodes(index: NodeIndex):
+    return {node for zone in index.zones for node in zone}
+
+
+def test_node_index_tracks_graph():
+    network = _build_network()
+    index = network.node_index
+    assert len(index) == network.graph.G.number_of_nodes()
+    assert _indexed_nodes(index) == set(network.graph.G.nodes)
+    for z, zone in enumerate(index.zones):
+        assert all(index.zone_of(node) == z for node in zone)
+
+    network.remove_road(1, 1)
+    network.remove_road(0, 0)
+    network.add_road(1, 1)
+    assert len(index) == network.graph.G.number_of_nodes()
+    assert _indexed_nodes(index) == set(network.graph.G.nodes)
+
+    nodes = index.sample_uniform(np.random.default_rng(0), 1000)
+    assert set(nodes) <= set(network.graph.G.nodes)
+
+
+def test_demand_follows_od_matrix():
+    network = _build_network()
+    index = network.node_index
+    n_zones = len(index.zones)
+
+    # All trips go from zone 0 to zone 3
+    od = np.zeros((n_zones, n_zones))
+    od[0, 3] = 36_000
+    demand = Demand(index, od, seed=1)
+    times, origins, destinations = demand.trips(60)
+
+    # 10 trips per second, give or take
+    assert 500 < len(times) < 700
+    assert (np.diff(times) >= 0).all() and times[-1] < 60
+    assert {index.zone_of(node) for node in origins} == {0}
+    assert {index.zone_of(node) for node in destinations} == {3}
+
+    # Seeded, so repeatable
+    again = Demand(index, od, seed=1).trips(60)
+    assert (again[0] == times).all() and again[1] == origins
+
+    # No trips to zones without roads
+    for r in range(ZONE_SIZE, N):
+        for c in range(ZONE_SIZE, N):
+            network.remove_road(r, c)
+    assert not demand.trips(60)[1]
+
+
+def test_demand_from_zone_weights():
+    network = _build_network()
+    weights = np.array([1, 0, 0, 1])
+    demand = Demand.from_zone_weights(
+        network.node_index, 36_000, weights, weights, seed=0
+    )
+    assert demand.od.sum() == 36_000
+    _, origins, _ = demand.trips(60)
+    zones = {network.node_index.zone_of(node) for node in origins}
+    assert zones == {0, 3}
@@ -0,0 +1,50 @@
+import subprocess
+import sys
+
+import pytest
+
+from road.digraph import DiGraph, NoPathError, next_hops, shortest_path
+
+
+def test_shortest_path():
+    G = DiGraph()
+    for u, v in [(0, 1), (1, 2), (2, 3), (0, 4), (4, 3), (3, 5)]:
+        G.add_edge(u, v)
+
+    assert shortest_path(G, 0, 0) == [0]
+    assert shortest_path(G, 0, 5) == [0, 4, 3, 5]
+    assert shortest_path(G, 1, 5) == [1, 2, 3, 5]
+
+    # Edges are directed
+    with pytest.raises(NoPathError):
+        shortest_path(G, 5, 0)
+
+    G.remove_node(4)
+    assert not G.has_edge(0, 4)
+    assert shortest_path(G, 0, 5) == [0, 1, 2, 3, 5]
+
+
+def test_next_hops():
+    G = DiGraph()
+    for u, v in [(0, 1), (1, 2), (2, 3), (0, 4), (4, 3), (3, 5), (6, 0)]:
+        G.add_edge(u, v)
+    index = {node: node for node in G.nodes}
+
+    hops = next_hops(G, index, 5)
+    # Following next hops gives shortest paths
+    assert [hops[node] for node in range(7)] == [4, 2, 3, 5, 3, -1, 0]
+    # Unreachable
+    assert list(next_hops(G, index, 6)) == [-1] * 7
+    assert list(next_hops(G, index, 7)) == [-1] * 7
+
+
+def test_core_imports_headless():
+    code = (
+        "import sys, road.network, physics.collision; "
+        "print(sorted({'pygame', 'dynaconf', 'networkx', 'config'} "
+        "& set(sys.modules)))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True
+    )
+    assert out.stdout.strip() == "[]", out.stderr
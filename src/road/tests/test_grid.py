@@ -0,0 +1,109 @@
+import numpy as np
+
+from road.common import Direction, TileType, Update
+from road.grid import TileGrid
+
+
+def test_add_tile():
+    grid = TileGrid(3, 3)
+
+    # Tiles must be placed next to an existing tile unless unrestricted
+    assert not grid.add_tile(1, 1)
+    assert grid.add_tile(1, 1, restrict_to_neighbors=False)
+    assert not grid.add_tile(1, 1, restrict_to_neighbors=False)
+    assert grid.tile_type(1, 1) == TileType.ALONE
+
+    assert grid.add_tile(0, 1)
+    assert grid.add_tile(1, 2)
+    assert grid.add_tile(1, 0)
+    assert grid.tile_type(0, 1) == TileType.DOWN
+    assert grid.tile_type(1, 2) == TileType.LEFT
+    assert grid.tile_type(1, 0) == TileType.RIGHT
+    assert grid.tile_type(1, 1) == TileType.UP_RIGHT_LEFT
+
+    assert grid.add_tile(2, 1)
+    assert grid.tile_type(1, 1) == TileType.UP_RIGHT_DOWN_LEFT
+
+    # Masks are tracked for empty tiles too
+    assert grid.masks[0, 0] == Direction.RIGHT.bit() | Direction.DOWN.bit()
+    assert grid.tile_type(0, 0) == TileType.EMPTY
+
+
+def test_add_tile_updates():
+    grid = TileGrid(3, 3)
+    grid.add_tile(1, 1, restrict_to_neighbors=False)
+    grid.add_tile(1, 2)
+
+    assert grid.get_updates() == [
+        (Update.ADDED, (1, 1, TileType.ALONE)),
+        (Update.ADDED, (1, 2, TileType.LEFT)),
+        (Update.STATE_CHANGED, (1, 1, TileType.RIGHT)),
+    ]
+    assert grid.get_updates() == []
+
+
+def test_remove_tile():
+    grid = TileGrid(3, 3)
+    grid.add_tile(1, 1, restrict_to_neighbors=False)
+    grid.add_tile(1, 2)
+    grid.add_tile(0, 1)
+    grid.get_updates()
+
+    assert not grid.remove_tile(2, 2)
+    assert grid.remove_tile(1, 2)
+    assert grid.tile_type(1, 2) == TileType.EMPTY
+    assert grid.tile_type(1, 1) == TileType.UP
+    assert grid.masks[1, 1] == Direction.UP.bit()
+    assert grid.get_updates() == [
+        (Update.REMOVED, (1, 2, TileType.EMPTY)),
+        (Update.STATE_CHANGED, (1, 1, TileType.UP)),
+    ]
+
+    # Removing and re-adding a tile restores the grid
+    assert grid.add_tile(1, 2)
+    assert grid.tile_type(1, 1) == TileType.UP_RIGHT
+
+
+def test_get_neighbors():
+    grid = TileGrid(3, 3)
+    grid.add_tile(1, 1, restrict_to_neighbors=False)
+    grid.add_tile(0, 1)
+    grid.add_tile(1, 0)
+
+    assert grid.get_neighbors(1, 1) == {
+        Direction.UP: ((0, 1), TileType.DOWN),
+        Direction.LEFT: ((1, 0), TileType.RIGHT),
+    }
+    assert grid.get_neighbors(2, 2) == {}
+
+
+def test_reevaluate_region():
+    grid = TileGrid(4, 4)
+    grid.add_tile(0, 0, restrict_to_neighbors=False)
+    for r in range(4):
+        for c in range(4):
+            grid.add_tile(r, c)
+    expected_grid = grid.grid.copy()
+    expected_masks = grid.masks.copy()
+    grid.get_updates()
+
+    # Corrupt a region and repair it in a single pass
+    grid.grid[1:3, 1:3] = TileType.ALONE
+    grid.masks[1:3, 1:3] = 0
+    grid.reevaluate_region(1, 1, 3, 3)
+
+    assert np.array_equal(grid.grid, expected_grid)
+    assert np.array_equal(grid.masks, expected_masks)
+    assert len(grid.get_updates()) == 4
+
+
+def test_tile_counts():
+    grid = TileGrid(3, 3)
+    grid.add_tile(1, 1, restrict_to_neighbors=False)
+    grid.add_tile(1, 2)
+
+    counts = grid.tile_counts()
+    assert counts[TileType.EMPTY] == 7
+    assert counts[TileType.RIGHT] == 1
+    assert counts[TileType.LEFT] == 1
+    assert grid.occupied().sum() == 2
@@ -0,0 +1,109 @@
+import random
+
+import pytest
+
+from road.digraph import DiGraph, NoPathError, shortest_path
+from road.grid import TravelGraph
+from road.hierarchy import ContractionHierarchy
+from road.network import RoadNetwork
+from test_helpers import config
+
+
+def _mocked_config():
+    return config.mock_config(
+        tile_width=4,
+        tile_height=4,
+        road_width=2,
+        vehicle_radius=1,
+        vehicle_stop_wait_time=0.1,
+        intersection_clear_time=0.1,
+        reroute_interval=0,
+    )
+
+
+def _assert_shortest(G, path, expected):
+    assert path[0] == expected[0] and path[-1] == expected[-1]
+    assert len(path) == len(expected)
+    for u, v in zip(path, path[1:]):
+        assert G.has_edge(u, v)
+
+
+def test_hierarchy_matches_bfs():
+    rng = random.Random(0)
+    G = DiGraph()
+    for _ in range(400):
+        G.add_edge(rng.randrange(100), rng.randrange(100))
+
+    ch = ContractionHierarchy(G.succ)
+    nodes = list(G.nodes)
+    for _ in range(300):
+        s, t = rng.choice(nodes), rng.choice(nodes)
+        try:
+            expected = shortest_path(G, s, t)
+        except NoPathError:
+            with pytest.raises(NoPathError):
+                ch.shortest_path(s, t)
+            continue
+        _assert_shortest(G, ch.shortest_path(s, t), expected)
+
+
+def test_travel_graph_hierarchy():
+    network = RoadNetwork(_mocked_config(), 5, 5)
+    network.add_road(0, 0, restrict_to_neighbors=False)
+    for r in range(4):
+        for c in range(4):
+            network.add_road(r, c)
+
+    graph: TravelGraph = network.graph
+    graph.build_hierarchy()
+    source = graph.intersections[(0, 0)].enter_nodes()[0]
+    target = graph.intersections[(3, 3)].exit_nodes()[0]
+    expected = shortest_path(graph.G, source, target)
+    _assert_shortest(graph.G, graph.shortest_path(source, target), expected)
+
+    # Edits make the hierarchy stale, so it's rebuilt in the background
+    network.add_road(3, 4)
+    target = graph.intersections[(3, 4)].exit_nodes()[0]
+    expected = shortest_path(graph.G, source, target)
+    _assert_shortest(graph.G, graph.shortest_path(source, target), expected)
+    graph._hierarchy_thread.join()
+    assert graph._hierarchy[0] == graph.generation
+    _assert_shortest(graph.G, graph.shortest_path(source, target), expected)
+
+
+def _upward_reach(ch, node):
+    """Number of nodes reachable from node along upward edges"""
+    seen = {ch.index[node]}
+    stack = list(seen)
+    while stack:
+        for v, _ in ch.up_out[stack.pop()]:
+            if v not in seen:
+                seen.add(v)
+                stack.append(v)
+    return len(seen)
+
+
+def test_dissection_order():
+    n = 12
+    network = RoadNetwork(_mocked_config(), n, n)
+    network.add_road(0, 0, restrict_to_neighbors=False)
+    for r in range(n):
+        for c in range(n):
+            network.add_road(r, c)
+
+    graph: TravelGraph = network.graph
+    graph.build_hierarchy()
+    dissected = graph._hierarchy[1]
+    plain = ContractionHierarchy(graph.G.succ)
+
+    rng = random.Random(0)
+    nodes = list(graph.G.nodes)
+    for _ in range(100):
+        s, t = rng.choice(nodes), rng.choice(nodes)
+        expected = shortest_path(graph.G, s, t)
+        _assert_shortest(graph.G, dissected.shortest_path(s, t), expected)
+
+    # Upward searches stay much smaller than with the default order
+    sample = rng.sample(nodes, 100)
+    reach = sum(_upward_reach(dissected, node) for node in sample)
+    assert reach < 0.75 * sum(_upward_reach(plain, node) for node in sample)
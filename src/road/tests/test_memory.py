@@ -0,0 +1,79 @@
+import gc
+import tracemalloc
+
+from road.network import (
+    TILE_BYTES_BUDGET,
+    VEHICLE_BYTES_BUDGET,
+    RoadNetwork,
+)
+from road.traffic import Intersection
+from test_helpers import config
+
+N = 25
+
+
+def _mocked_config():
+    return config.mock_config(
+        tile_width=64,
+        tile_height=64,
+        road_width=32,
+        vehicle_radius=4,
+        vehicle_stop_wait_time=0.5,
+        reroute_interval=0,
+        intersection_clear_time=0.35,
+    )
+
+
+def _traced_bytes(fn):
+    """Return bytes still allocated after calling fn"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = fn()
+        gc.collect()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, size
+
+
+def _build_network():
+    network = RoadNetwork(_mocked_config(), N, N)
+    network.add_road(0, 0, restrict_to_neighbors=False)
+    for r in range(N):
+        for c in range(N):
+            network.add_road(r, c)
+    network.grid.get_updates()
+    network.graph.get_updates()
+    return network
+
+
+def test_no_instance_dicts():
+    network = _build_network()
+    insct = network.graph.intersections[(1, 1)]
+    node = insct.enter_nodes()[0]
+    vehicle = network.traffic.add_vehicle(node)
+    vehicle.set_path([insct.exit_nodes()[0]])
+    for obj in (node, insct, vehicle, vehicle._trajectory, Intersection()):
+        assert not hasattr(obj, "__dict__"), type(obj)
+
+
+def test_tile_budget():
+    network, size = _traced_bytes(_build_network)
+    assert network.grid.occupied().all()
+    assert size / (N * N) <= TILE_BYTES_BUDGET
+
+
+def test_vehicle_budget():
+    network = _build_network()
+    nodes = list(network.graph.G.nodes)
+    n_vehicles = len(nodes)
+
+    def add_vehicles():
+        for i in range(n_vehicles):
+            network.traffic.add_vehicle(nodes[i % len(nodes)])
+        network.step(1 / 60)
+        network.traffic.updates.clear()
+
+    _, size = _traced_bytes(add_vehicles)
+    assert size / n_vehicles <= VEHICLE_BYTES_BUDGET
@@ -0,0 +1,148 @@
+import random
+
+from road.common import Direction
+from road.network import RoadNetwork
+from test_helpers import config
+
+N = 5
+TICK = 1 / 60
+
+
+def _mocked_config():
+    return config.mock_config(
+        tile_width=4,
+        tile_height=4,
+        road_width=2,
+        vehicle_radius=1,
+        vehicle_stop_wait_time=0.1,
+        intersection_clear_time=0.1,
+        reroute_interval=0,
+    )
+
+
+def _build_network(focus=None):
+    network = RoadNetwork(_mocked_config(), N, N)
+    for r in range(N):
+        for c in range(N):
+            network.add_road(r, c, restrict_to_neighbors=False)
+    network.set_focus(focus)
+    return network
+
+
+def _trip(network):
+    """Send a vehicle along the top row of the grid"""
+    inscts = network.graph.intersections
+    v = network.traffic.add_vehicle(inscts[(0, 0)].nodes[Direction.RIGHT][1])
+    network.router.route(v, inscts[(0, N - 1)].nodes[Direction.LEFT][0])
+    return v
+
+
+def _steps_to_arrive(network, v, limit=6000):
+    for step in range(limit):
+        if not v.path:
+            return step
+        network.step(TICK)
+    raise AssertionError("vehicle never arrived")
+
+
+def test_meso_vehicle_arrives():
+    micro = _build_network()
+    micro_steps = _steps_to_arrive(micro, _trip(micro))
+
+    network = _build_network(focus=[])
+    traffic = network.traffic
+    v = _trip(network)
+    target = v.path[-1]
+    assert v._id in traffic.meso
+    assert v._id not in traffic.micro
+    assert v._id not in traffic.collision_tracker.objs
+
+    # Takes about as long as driving microscopically
+    steps = _steps_to_arrive(network, v)
+    assert v._last_t_node is target
+    assert v._world_coords == target.world_coords
+    assert abs(steps - micro_steps) <= 0.1 * micro_steps
+
+    traffic.remove_vehicle(v)
+    assert not traffic.meso.vehicles and not traffic.meso.edge_times
+
+
+def test_meso_edge_capacity():
+    network = _build_network(focus=[])
+    meso = network.traffic.meso
+    a, b = _trip(network), _trip(network)
+    network.step(TICK)
+
+    # Vehicles on the same edge leave one vehicle length apart
+    exit_a = meso.edge_times[a._id][1]
+    exit_b = meso.edge_times[b._id][1]
+    assert exit_b - exit_a >= 2 * 1 / a.speed - 1e-9
+
+    # And each still arrives
+    _steps_to_arrive(network, a)
+    _steps_to_arrive(network, b)
+
+
+def test_promote_in_focus():
+    # Only the destination's tile is in focus
+    network = _build_network(focus=[(0, N - 1, 1, N)])
+    traffic = network.traffic
+    v = _trip(network)
+    assert v._id in traffic.meso
+
+    for _ in range(6000):
+        network.step(TICK)
+        if v._id in traffic.micro:
+            break
+    assert v._id not in traffic.meso
+    assert v._id in traffic.collision_tracker.objs
+    assert v._t_node.tile_index == (0, N - 1)
+    _steps_to_arrive(network, v)
+
+    # Dropping the focus promotes everyone
+    other = _trip(network)
+    assert other._id in traffic.meso
+    network.set_focus(None)
+    assert not traffic.meso.vehicles
+    assert traffic.micro is traffic.vehicles
+    assert other._trajectory is not None
+    _steps_to_arrive(network, other)
+
+
+def _edge_exits(meso, tile_index):
+    """Next exits of edges from or to tile_index"""
+    return [
+        key
+        for key in meso.next_exit
+        if not isinstance(key[0], int)
+        and tile_index in (key[0].tile_index, key[1].tile_index)
+    ]
+
+
+def test_next_exit_pruned():
+    network = _build_network(focus=[])
+    meso = network.traffic.meso
+    _steps_to_arrive(network, _trip(network))
+    assert (0, 2) in meso.next_exit and _edge_exits(meso, (0, 2))
+
+    # Removed roads are forgotten
+    network.remove_road(0, 2)
+    assert (0, 2) not in meso.next_exit and not _edge_exits(meso, (0, 2))
+
+    # Passed exits are dropped as the map grows
+    rng = random.Random(0)
+    nodes = list(network.graph.G.nodes)
+    vehicles = [network.traffic.add_vehicle(n) for n in nodes[::10]]
+    for _ in range(3000):
+        for v in vehicles:
+            if not v.has_path():
+                network.router.route(v, rng.choice(nodes))
+        network.step(TICK)
+        assert len(meso.next_exit) <= meso._prune_size + len(vehicles)
+    for v in vehicles:
+        network.traffic.remove_vehicle(v)
+    last = max(meso.next_exit.values())
+    while meso.time <= last:
+        network.step(TICK)
+    meso._prune()
+    assert not meso.next_exit
@@ -0,0 +1,289 @@
+from road.common import Direction, Update
+from road.grid import NextHopRoute
+from road.network import RoadNetwork
+from test_helpers import config
+
+N = 4
+
+
+def _mocked_config():
+    return config.mock_config(
+        tile_width=4,
+        tile_height=4,
+        road_width=2,
+        vehicle_radius=1,
+        vehicle_stop_wait_time=0.1,
+        intersection_clear_time=0.1,
+        reroute_interval=0.5,
+        congestion_vehicle_cost=1,
+        reroute_threshold=0,
+        reroute_budget=2,
+    )
+
+
+def _build_network(skip=(), event_driven=False):
+    network = RoadNetwork(_mocked_config(), N, N, event_driven=event_driven)
+    for r in range(N):
+        for c in range(N):
+            if (r, c) not in skip:
+                network.add_road(r, c, restrict_to_neighbors=False)
+    return network
+
+
+def test_remove_road_graph():
+    network = _build_network()
+    edges = set(network.graph.G.edges)
+    network.graph.get_updates()
+
+    assert network.remove_road(0, 0)
+    assert not network.remove_road(0, 0)
+    expected = _build_network(skip={(0, 0)})
+    assert (network.grid.grid == expected.grid.grid).all()
+    assert set(network.graph.G.nodes) == set(expected.graph.G.nodes)
+    assert set(network.graph.G.edges) == set(expected.graph.G.edges)
+
+    # Renderer is told about every edge that went away
+    removed = {edge for _, edge in network.graph.get_updates()}
+    assert removed == edges - set(expected.graph.G.edges)
+
+    # Neighbors left as dead-ends get a U-Turn
+    assert network.remove_road(0, 1)
+    expected = _build_network(skip={(0, 0), (0, 1)})
+    assert set(network.graph.G.edges) == set(expected.graph.G.edges)
+
+    # Adding the roads back restores the graph
+    network.add_road(0, 1)
+    network.add_road(0, 0)
+    assert set(network.graph.G.edges) == edges
+
+
+def test_remove_road_traffic():
+    network = _build_network()
+    traffic, router = network.traffic, network.router
+    inscts = network.graph.intersections
+
+    # On the removed tile
+    doomed = traffic.add_vehicle(inscts[(1, 1)].enter_nodes()[0])
+    # Routed straight through the removed tile
+    through = traffic.add_vehicle(inscts[(1, 0)].nodes[Direction.UP][0])
+    target = inscts[(1, 2)].nodes[Direction.RIGHT][1]
+    router.route(through, target)
+    assert any(n.tile_index == (1, 1) for n in through.path)
+    # Nowhere near it
+    bystander = traffic.add_vehicle(inscts[(3, 2)].enter_nodes()[0])
+    router.route(bystander, inscts[(3, 3)].exit_nodes()[0])
+    bystander_path = bystander.path
+
+    network.remove_road(1, 1)
+
+    assert doomed._id not in traffic.vehicles
+    assert doomed._id not in router.routes
+    assert bystander.path == bystander_path
+    # Cut short before the removed tile, then rerouted
+    assert all(n.tile_index != (1, 1) for n in through.path)
+    router.reroute()
+    assert bystander.path == bystander_path
+    assert through.path[-1] == target
+    for u, v in zip(through.path, through.path[1:]):
+        assert network.graph.G.has_edge(u, v)
+
+    # Network keeps running
+    for _ in range(120):
+        network.step(1 / 60)
+
+
+def test_event_driven_traffic():
+    trips = []
+    for event_driven in (False, True):
+        network = _build_network(event_driven=event_driven)
+        inscts = network.graph.intersections
+        v = network.traffic.add_vehicle(
+            inscts[(0, 0)].nodes[Direction.RIGHT][1]
+        )
+        network.router.route(v, inscts[(3, 3)].nodes[Direction.LEFT][0])
+        trips.append((network, v, list(v.path)))
+
+    (ticked, ticked_v, path), (network, v, event_path) = trips
+    assert event_path == path
+    traffic = network.traffic
+
+    waited = rerouted = False
+    for _ in range(600):
+        if not v.path:
+            break
+        ticked.step(1 / 60)
+        network.step(1 / 60)
+        waited = waited or v._waiting_at_insct
+
+        # Positions are interpolated along the current edge
+        x, y = traffic.snapshot()[0][["x", "y"]]
+        (ux, uy), (tx, ty) = v._last_t_node.world_coords, (
+            v._t_node.world_coords if v._t_node else (x, y)
+        )
+        assert min(ux, tx) - 1e-4 <= x <= max(ux, tx) + 1e-4
+        assert min(uy, ty) - 1e-4 <= y <= max(uy, ty) + 1e-4
+
+        # Only vehicles reaching nodes are stepped
+        assert len(traffic._legs) <= 1
+
+        # Resetting the path mid-edge keeps the predicted arrival
+        if v._id in traffic._legs and not rerouted:
+            arrival = traffic._legs[v._id][1]
+            traffic.set_vehicle_path(v, list(v.path))
+            assert abs(traffic._legs[v._id][1] - arrival) < 1e-9
+            rerouted = True
+
+    assert waited and rerouted
+    assert v._last_t_node is event_path[-1]
+    assert v._world_coords == event_path[-1].world_coords
+    # Arrives about when a vehicle stepped every tick does
+    while ticked_v.path:
+        ticked.step(1 / 60)
+    assert abs(ticked.traffic.time - traffic.time) <= 0.1 * ticked.traffic.time
+
+
+def test_sleeping_vehicles():
+    network = _build_network()
+    traffic = network.traffic
+    inscts = network.graph.intersections
+
+    idle = traffic.add_vehicle(inscts[(2, 2)].enter_nodes()[0])
+    v = traffic.add_vehicle(inscts[(0, 0)].nodes[Direction.RIGHT][1])
+    assert not traffic.awake
+    network.router.route(v, inscts[(0, 3)].nodes[Direction.LEFT][0])
+    assert v._id in traffic.awake
+
+    waited = False
+    for _ in range(600):
+        if not v.path:
+            break
+        network.step(1 / 60)
+        # Queued vehicles sleep until released
+        if v.path:
+            assert (v._id in traffic.awake) is not v._waiting_at_insct
+        waited = waited or v._waiting_at_insct
+        moved = {
+            id
+            for update, (id, *_) in traffic.get_updates()
+            if update == Update.MOVED
+        }
+        assert idle._id not in moved
+    assert waited
+    # Counts the one arrival, not the idle vehicles after every step
+    for _ in range(10):
+        network.step(1 / 60)
+    assert network.instruments.counter("vehicles_arrived").value == 1
+
+    # Arrived vehicles sleep where they stopped
+    assert not traffic.awake
+    updates = traffic.get_updates()
+    assert all(update != Update.MOVED for update, _ in updates)
+    assert traffic.collision_tracker.objs[v._id] == v.get_collision_rect(
+        traffic.vehicle_radius
+    )
+
+
+def test_isolated_vehicle_ids():
+    a, b = _build_network(), _build_network()
+    node = next(iter(a.graph.G.nodes))
+    assert [a.traffic.add_vehicle(node)._id for _ in range(3)] == [0, 1, 2]
+    node = next(iter(b.graph.G.nodes))
+    assert b.traffic.add_vehicle(node)._id == 0
+
+
+def test_shared_paths():
+    network = _build_network()
+    traffic = network.traffic
+    inscts = network.graph.intersections
+    start = inscts[(0, 0)].nodes[Direction.RIGHT][1]
+    target = inscts[(3, 3)].nodes[Direction.LEFT][0]
+    a, b = traffic.add_vehicle(start), traffic.add_vehicle(start)
+    network.router.route(a, target)
+    network.router.route(b, target)
+
+    # One path, with a cursor each
+    assert a._route is b._route
+    assert len(traffic.paths) == 1
+    network.step(1 / 60)
+    while a._last_t_node is start:
+        network.step(1 / 60)
+    assert a._route is b._route and a._cursor > 0
+    assert a.path == a._route.nodes[a._cursor :]
+
+    # Paths are dropped once nobody follows them
+    traffic.remove_vehicle(a)
+    traffic.remove_vehicle(b)
+    assert len(traffic.paths) == 0
+
+
+def test_send_to():
+    network = _build_network()
+    traffic, graph = network.traffic, network.graph
+    inscts = graph.intersections
+    start = inscts[(0, 0)].nodes[Direction.RIGHT][1]
+    target = inscts[(3, 3)].nodes[Direction.LEFT][0]
+    v = traffic.add_vehicle(start)
+    network.router.route(v, target)
+    network.send_to(v, target)
+
+    # Shortest path, with no search kept for the target
+    assert list(v.path) == graph.shortest_path(start, target)
+    assert not network.router.routes and not network.router.targets
+
+    for _ in range(600):
+        if not v.has_path():
+            break
+        network.step(1 / 60)
+    assert v._last_t_node is target
+
+
+def test_send_to_hub():
+    network = _build_network()
+    traffic, graph = network.traffic, network.graph
+    inscts = graph.intersections
+    hub = inscts[(3, 3)].nodes[Direction.LEFT][0]
+    vehicles = [traffic.add_vehicle(n) for n in list(graph.G.nodes)[:30]]
+    for v in vehicles:
+        network.send_to_hub(v, hub)
+
+    # One shared route, with one table built for all vehicles
+    assert {id(v._route) for v in vehicles} == {id(graph.destinations[hub])}
+    assert network.instruments.counter("next_hop_builds").value == 1
+    v = vehicles[0]
+    assert len(v.path) == len(graph.shortest_path(v._last_t_node, hub)) - 1
+
+    # Tables are rebuilt after roads change, avoiding removed roads
+    network.remove_road(2, 2)
+    assert all(n.tile_index != (2, 2) for n in v.path)
+    assert network.instruments.counter("next_hop_builds").value == 2
+
+    for _ in range(3000):
+        if not any(v.has_path() for v in vehicles):
+            break
+        network.step(1 / 60)
+    assert all(
+        v._last_t_node == hub for v in vehicles if v._id in traffic.vehicles
+    )
+
+
+def test_remove_hub():
+    network = _build_network()
+    traffic, graph = network.traffic, network.graph
+    hub = graph.intersections[(3, 3)].nodes[Direction.LEFT][0]
+    vehicles = [traffic.add_vehicle(n) for n in list(graph.G.nodes)[:30]]
+    for v in vehicles:
+        network.send_to_hub(v, hub)
+    network.step(1 / 60)
+
+    # The route to the hub is dropped with it, and vehicles headed there
+    # stop at their next node
+    network.remove_road(3, 3)
+    assert hub not in graph.destinations
+    remaining = [v for v in vehicles if v._id in traffic.vehicles]
+    assert remaining
+    for v in remaining:
+        assert not isinstance(v._route, NextHopRoute)
+        assert len(v.path) <= 1
+    for _ in range(600):
+        network.step(1 / 60)
+    assert not any(v.has_path() for v in remaining)
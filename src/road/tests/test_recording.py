@@ -0,0 +1,149 @@
+import time
+
+import numpy as np
+
+from road import recording
+from road.common import Direction, Update
+from road.network import RoadNetwork
+from road.recording import TrafficRecorder, TrafficReplay
+from test_helpers import config
+
+
+def _mocked_config():
+    return config.mock_config(
+        grid_width=6,
+        grid_height=6,
+        tile_width=4,
+        tile_height=4,
+        road_width=2,
+        vehicle_radius=1,
+        vehicle_stop_wait_time=0.1,
+        reroute_interval=0,
+        intersection_clear_time=0.1,
+        congestion_vehicle_cost=1,
+        reroute_threshold=0,
+        reroute_budget=2,
+    )
+
+
+def _record(path, mocked_config, n_steps, keyframe_interval=4, **options):
+    network = RoadNetwork(mocked_config, 6, 6)
+    network.add_road(0, 0, restrict_to_neighbors=False)
+    for c in range(1, 6):
+        network.add_road(0, c)
+
+    nodes = list(network.graph.G.nodes)
+    vehicles = [network.traffic.add_vehicle(nodes[i]) for i in range(3)]
+    for v in vehicles:
+        v.set_path(network.graph.shortest_path(v._last_t_node, nodes[-1]))
+
+    snapshots = []
+    with TrafficRecorder(
+        path, network, keyframe_interval=keyframe_interval, **options
+    ) as recorder:
+        for step in range(n_steps):
+            # Change the road layout and traffic mid-recording
+            if step == 5:
+                network.add_road(1, 5)
+                network.traffic.add_vehicle(nodes[0])
+            network.step(0.1)
+            recorder.capture(0.1)
+            snapshots.append(network.traffic.snapshot())
+
+    return network, snapshots
+
+
+def _assert_state(replay, snapshot):
+    assert np.array_equal(replay.traffic.ids, snapshot["id"])
+    assert np.array_equal(replay.traffic.xs, snapshot["x"])
+    assert np.array_equal(replay.traffic.ys, snapshot["y"])
+    assert np.array_equal(replay.traffic.waiting, snapshot["waiting"])
+    assert np.array_equal(replay.traffic.snapshot(), snapshot)
+
+
+def test_replay(tmp_path):
+    mocked_config = _mocked_config()
+    path = tmp_path / "run.trec"
+    network, snapshots = _record(path, mocked_config, 10)
+
+    with TrafficReplay(path, mocked_config) as replay:
+        assert replay.n_steps == 10
+
+        for snapshot in snapshots:
+            assert replay.advance() == np.float32(0.1)
+            _assert_state(replay, snapshot)
+        assert replay.advance() is None
+
+        assert np.array_equal(replay.grid.tiles.grid, network.grid.grid)
+        assert set(replay.graph.graph.G.edges) == set(network.graph.G.edges)
+
+
+def test_slow_disk(tmp_path, monkeypatch):
+    encode_chunk = recording._encode_chunk
+
+    def slow_encode_chunk(steps):
+        time.sleep(0.02)
+        return encode_chunk(steps)
+
+    monkeypatch.setattr(recording, "_encode_chunk", slow_encode_chunk)
+    mocked_config = _mocked_config()
+    path = tmp_path / "run.trec"
+    network, snapshots = _record(
+        path, mocked_config, 10, keyframe_interval=1, max_queued=1
+    )
+
+    # Capturing waited for the writer rather than queueing every step, and
+    # nothing was lost
+    assert network.instruments.counter("recorder_stalls").value > 0
+    with TrafficReplay(path, mocked_config) as replay:
+        assert replay.n_steps == 10
+        for snapshot in snapshots:
+            replay.advance()
+            _assert_state(replay, snapshot)
+
+
+def test_replay_seek(tmp_path):
+    mocked_config = _mocked_config()
+    path = tmp_path / "run.trec"
+    _, snapshots = _record(path, mocked_config, 10)
+
+    with TrafficReplay(path, mocked_config) as replay:
+        replay.seek(9)
+        _assert_state(replay, snapshots[9])
+        replay.traffic.get_updates()
+
+        # Seeking backwards posts removal of vehicles added later on
+        replay.seek(2)
+        _assert_state(replay, snapshots[2])
+        updates = replay.traffic.get_updates()
+        assert [u for u in updates if u[0] == Update.REMOVED] == [
+            (Update.REMOVED, (3, *snapshots[9][3][["x", "y"]].tolist()))
+        ]
+        assert replay.grid.tiles.tile_type(1, 5) == 0
+
+
+def test_replay_waiting(tmp_path):
+    mocked_config = _mocked_config()
+    path = tmp_path / "run.trec"
+    network = RoadNetwork(mocked_config, 4, 4)
+    network.add_road(0, 0, restrict_to_neighbors=False)
+    for r in range(4):
+        for c in range(4):
+            network.add_road(r, c)
+    inscts = network.graph.intersections
+    v = network.traffic.add_vehicle(inscts[(0, 0)].nodes[Direction.RIGHT][1])
+    network.router.route(v, inscts[(0, 3)].nodes[Direction.LEFT][0])
+
+    snapshots = []
+    with TrafficRecorder(path, network, keyframe_interval=4) as recorder:
+        for _ in range(60):
+            network.step(1 / 60)
+            recorder.capture(1 / 60)
+            snapshots.append(network.traffic.snapshot())
+    assert any(snapshot["waiting"].any() for snapshot in snapshots)
+
+    # Replays report vehicles queued at intersections as the live run did
+    with TrafficReplay(path, mocked_config) as replay:
+        for snapshot in snapshots:
+            replay.advance()
+            assert np.array_equal(replay.traffic.snapshot(), snapshot)
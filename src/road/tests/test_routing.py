@@ -0,0 +1,172 @@
+import heapq
+import math
+import random
+
+from road.digraph import DiGraph
+from road.network import RoadNetwork
+from road.routing import IncrementalRoute
+from test_helpers import config
+
+
+def _mocked_config():
+    return config.mock_config(
+        tile_width=4,
+        tile_height=4,
+        road_width=2,
+        vehicle_radius=1,
+        vehicle_stop_wait_time=0.1,
+        intersection_clear_time=0.1,
+        reroute_interval=0.5,
+        congestion_vehicle_cost=1,
+        reroute_threshold=0,
+        reroute_budget=2,
+    )
+
+
+def _no_h(u, v):
+    return 0
+
+
+def _dijkstra(G, target, costs):
+    """Reference cost-to-go to target"""
+    dist = {target: 0}
+    heap = [(0, 0, target)]
+    counter = 1
+    while heap:
+        d, _, v = heapq.heappop(heap)
+        if d > dist[v]:
+            continue
+        for u in G.pred[v]:
+            nd = d + costs[(u, v)]
+            if nd < dist.get(u, math.inf):
+                dist[u] = nd
+                heapq.heappush(heap, (nd, counter, u))
+                counter += 1
+    return dist
+
+
+def test_incremental_route_repair():
+    rng = random.Random(0)
+    G = DiGraph()
+    costs = {}
+    for _ in range(300):
+        u, v = rng.randrange(60), rng.randrange(60)
+        if u != v:
+            G.add_edge(u, v)
+            costs[(u, v)] = rng.uniform(1, 10)
+
+    expected = _dijkstra(G, 0, costs)
+    starts = [n for n in expected if n != 0][:10]
+    routes = [
+        IncrementalRoute(G, start, 0, lambda u, v: costs[(u, v)], _no_h)
+        for start in starts
+    ]
+
+    for _ in range(20):
+        expected = _dijkstra(G, 0, costs)
+        for route in routes:
+            path = route.path()
+            assert path[0] == route.start and path[-1] == 0
+            cost = sum(costs[e] for e in zip(path, path[1:]))
+            assert math.isclose(cost, expected[route.start])
+
+            # Move along the path
+            if len(path) > 2:
+                route.move_start(path[1])
+
+        # Change some costs and repair
+        for edge in rng.sample(sorted(costs), 15):
+            costs[edge] = rng.uniform(1, 10)
+            for route in routes:
+                route.update_node(edge[0])
+
+
+def test_reroute_around_congestion():
+    network = RoadNetwork(_mocked_config(), 4, 4)
+    network.add_road(0, 0, restrict_to_neighbors=False)
+    for r in range(4):
+        for c in range(4):
+            network.add_road(r, c)
+
+    traffic, router = network.traffic, network.router
+    inscts = network.graph.intersections
+    source = inscts[(0, 0)].enter_nodes()[0]
+    target = inscts[(3, 3)].exit_nodes()[0]
+
+    vehicle = traffic.add_vehicle(source)
+    router.route(vehicle, target)
+    first_path = list(vehicle.path)
+    assert first_path[-1] == target
+    assert (source, first_path[0]) in traffic.edge_occupancy
+
+    # Jam the first turn on the vehicle's path that has alternatives
+    G = network.graph.G
+    k = next(
+        i for i in range(1, len(first_path)) if len(G.succ[first_path[i]]) > 1
+    )
+    jammed = (first_path[k], first_path[k + 1])
+    for _ in range(20):
+        v = traffic.add_vehicle(jammed[0])
+        traffic.set_vehicle_path(v, [jammed[1]])
+
+    router.reroute()
+    assert vehicle.path[0] == first_path[0]
+    assert vehicle.path[-1] == target
+    assert jammed not in set(zip(vehicle.path, vehicle.path[1:]))
+
+
+def test_route_memory():
+    rng = random.Random(0)
+    G = DiGraph()
+    costs = {}
+    for _ in range(300):
+        u, v = rng.randrange(60), rng.randrange(60)
+        if u != v:
+            G.add_edge(u, v)
+            costs[(u, v)] = rng.uniform(1, 10)
+    start = next(n for n in _dijkstra(G, 0, costs) if n != 0)
+    route = IncrementalRoute(G, start, 0, lambda u, v: costs[(u, v)], _no_h)
+    for _ in range(500):
+        for edge in rng.sample(sorted(costs), 15):
+            costs[edge] = rng.uniform(1, 10)
+            route.update_node(edge[0])
+        route.path()
+        # Stale heap entries are compacted away
+        assert len(route._heap) <= 2 * len(G.succ) + 16
+
+    network = RoadNetwork(_mocked_config(), 4, 4)
+    for r in range(4):
+        for c in range(4):
+            network.add_road(r, c, restrict_to_neighbors=False)
+    traffic, router = network.traffic, network.router
+    inscts = network.graph.intersections
+    nodes = list(network.graph.G.nodes)
+    targets = [
+        inscts[(0, 0)].exit_nodes()[0],
+        inscts[(3, 3)].exit_nodes()[0],
+    ]
+
+    vehicles = [traffic.add_vehicle(rng.choice(nodes)) for _ in range(30)]
+    for i, v in enumerate(vehicles):
+        router.route(v, targets[i % 2])
+    # Vehicles heading to the same target share its route
+    assert len(router.targets) == 2
+
+    arrivals = 0
+    for _ in range(1200):
+        network.step(1 / 60)
+        for v in vehicles:
+            if not v.has_path():
+                # Dropped as soon as the vehicle arrived
+                assert v._id not in router.routes
+                arrivals += 1
+                router.route(v, targets[v._last_t_node is targets[0]])
+        assert len(router._due) <= len(vehicles)
+    assert arrivals > len(vehicles)
+
+    for v in vehicles:
+        traffic.remove_vehicle(v)
+    network.step(1 / 60)
+    router.reroute()
+    assert not router.routes and not router.targets
+    assert not router._costs and not router._seen
@@ -0,0 +1,69 @@
+from road.common import Direction
+from road.network import RoadNetwork
+from road.stats import IntersectionStats
+from test_helpers import config
+
+
+def test_intersection_stats():
+    stats = IntersectionStats(time=0)
+    stats.enqueued(0, Direction.UP, 0)
+    stats.enqueued(1, Direction.UP, 1)
+    stats.enqueued(2, Direction.LEFT, 1)
+    stats.released_vehicle(0, Direction.UP, 2)
+    stats.left(2, Direction.LEFT, 3)
+    stats.released_vehicle(1, Direction.UP, 4)
+
+    assert stats.released == [2, 0, 0, 0]
+    assert stats.max_queue == [2, 0, 0, 1]
+    assert stats.queue_lengths == [0, 0, 0, 0]
+    # UP held 1 vehicle for 1s, 2 for 1s and 1 for 2s
+    assert stats.mean_queue(8) == [0.625, 0, 0, 0.25]
+    assert stats.mean_wait() == 2.5
+    assert stats.max_wait == 3
+    assert sum(stats.wait_histogram) == 2
+    assert stats.wait_percentile(50) == 2
+    assert stats.wait_percentile(100) == 3
+
+
+def test_traffic_intersection_stats():
+    network = RoadNetwork(
+        config.mock_config(
+            tile_width=4,
+            tile_height=4,
+            road_width=2,
+            vehicle_radius=1,
+            vehicle_stop_wait_time=0.1,
+            intersection_clear_time=0.1,
+            reroute_interval=0,
+        ),
+        4,
+        4,
+    )
+    for r in range(4):
+        for c in range(4):
+            network.add_road(r, c, restrict_to_neighbors=False)
+    nodes = list(network.graph.G.nodes)
+    vehicles = [network.traffic.add_vehicle(n) for n in nodes[:20]]
+    for v, target in zip(vehicles, reversed(nodes)):
+        network.router.route(v, target)
+
+    traffic = network.traffic
+    for step in range(300):
+        network.step(1 / 60)
+        if step == 100:
+            traffic.remove_vehicle(vehicles[0])
+        # Running queue lengths follow the intersections' queues
+        for tile_index, insct in traffic.inscts.items():
+            lengths = [len(queue) for queue in insct.queues]
+            assert traffic.insct_stats[tile_index].queue_lengths == lengths
+
+    stats = traffic.intersection_stats()
+    assert len(stats) == len(traffic.insct_stats)
+    assert stats["released"].sum() > 0
+    assert (stats["max_queue"] >= stats["mean_queue"]).all()
+    assert (
+        stats["wait_histogram"].sum(axis=1) == stats["released"].sum(axis=1)
+    ).all()
+    # Nobody leaves before their stop
+    released = stats["released"].sum(axis=1) > 0
+    assert (stats["mean_wait"][released] >= 0.1 - 1e-9).all()
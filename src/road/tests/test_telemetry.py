@@ -0,0 +1,156 @@
+import socket
+from types import SimpleNamespace
+
+import numpy as np
+
+from road.bus import NetworkBus
+from road.common import Update, Updateable
+from road.network import RoadNetwork
+from road.telemetry import (
+    FRAME,
+    MESSAGE_LENGTH,
+    SNAPSHOT,
+    TelemetryServer,
+    decode_message,
+)
+from test_helpers import config
+
+
+def _mocked_config():
+    return config.mock_config(
+        tile_width=4,
+        tile_height=4,
+        road_width=2,
+        vehicle_radius=1,
+        vehicle_stop_wait_time=0.1,
+        intersection_clear_time=0.1,
+        reroute_interval=0,
+    )
+
+
+def _read(sock):
+    (length,) = MESSAGE_LENGTH.unpack(sock.recv(4, socket.MSG_WAITALL))
+    return decode_message(sock.recv(length, socket.MSG_WAITALL))
+
+
+class _Client:
+    """Rebuilds state from a telemetry stream"""
+
+    def __init__(self, address):
+        if isinstance(address, str):
+            self.sock = socket.socket(socket.AF_UNIX)
+            self.sock.connect(address)
+        else:
+            self.sock = socket.create_connection(address)
+        self.tiles, self.edges, self.vehicles = set(), set(), {}
+        self.kinds = []
+
+    def read(self):
+        msg = _read(self.sock)
+        self.kinds.append(msg.kind)
+        if msg.kind == SNAPSHOT:
+            self.tiles, self.edges, self.vehicles = set(), set(), {}
+        for row in msg.tiles.tolist():
+            if row[0] == Update.REMOVED:
+                self.tiles.discard(row[1:3])
+            else:
+                self.tiles.add(row[1:3])
+        for row in msg.edges.tolist():
+            if row[0] == Update.REMOVED:
+                self.edges.discard(row[1:])
+            else:
+                self.edges.add(row[1:])
+        for u_type, id, x, y in msg.vehicles.tolist():
+            if u_type == Update.REMOVED:
+                del self.vehicles[id]
+            else:
+                self.vehicles[id] = (x, y)
+        return msg
+
+    def close(self):
+        self.sock.close()
+
+
+def test_stream(tmp_path):
+    network = RoadNetwork(_mocked_config(), 4, 4)
+    with TelemetryServer(path=str(tmp_path / "telemetry.sock")) as server:
+        server.subscribe(network.bus)
+        client = _Client(server.address)
+        assert client.read().kind == SNAPSHOT
+
+        for r in range(4):
+            for c in range(4):
+                network.add_road(r, c, restrict_to_neighbors=False)
+        nodes = list(network.graph.G.nodes)
+        vehicles = [network.traffic.add_vehicle(n) for n in nodes[:20]]
+        for v, target in zip(vehicles, reversed(nodes)):
+            network.router.route(v, target)
+        network.remove_road(0, 0)
+
+        for step in range(30):
+            network.step(1 / 60)
+            server.end_frame(1 / 60)
+            msg = client.read()
+            assert msg.step == step
+
+        assert client.kinds[1] == SNAPSHOT
+        assert set(client.kinds[2:]) == {FRAME}
+        assert client.tiles == {
+            tuple(i) for i in np.argwhere(network.grid.occupied()).tolist()
+        }
+        assert len(client.edges) == len(list(network.graph.G.edges))
+        state = network.traffic.snapshot()
+        assert client.vehicles == {
+            id: (x, y) for id, x, y, _ in state.tolist()
+        }
+
+        # Late joiners start from the current state
+        late = _Client(server.address)
+        assert late.read().kind == SNAPSHOT
+        assert late.vehicles == client.vehicles
+        assert late.edges == client.edges
+        client.close()
+        late.close()
+
+
+class _Feed(Updateable):
+    def __init__(self):
+        self.updates = []
+
+    def get_updates(self):
+        updates = self.updates
+        self.updates = []
+        return updates
+
+
+def test_slow_client():
+    traffic = _Feed()
+    network = SimpleNamespace(w=1, h=1, grid=_Feed(), graph=_Feed())
+    network.traffic = traffic
+    bus = NetworkBus(network)
+
+    with TelemetryServer(snapshot_interval=10_000, max_pending=2) as server:
+        server.subscribe(bus)
+        client = _Client(server.address)
+        client.read()
+
+        # Publish far more than socket buffers hold, without reading
+        n_steps, n_vehicles = 200, 5000
+        for step in range(n_steps):
+            u_type = Update.MOVED if step else Update.ADDED
+            traffic.updates = [
+                (u_type, (id, step, id)) for id in range(n_vehicles)
+            ]
+            bus.publish()
+            server.end_frame(1 / 60)
+
+        while client.read().step != n_steps - 1:
+            pass
+
+        # Dropped frames were replaced by a snapshot, ending up in sync
+        assert len(client.kinds) < n_steps
+        assert SNAPSHOT in client.kinds[1:]
+        assert client.vehicles == {
+            id: (n_steps - 1, id) for id in range(n_vehicles)
+        }
+        client.close()
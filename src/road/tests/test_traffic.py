@@ -40,61 +40,63 @@ def test_intersection():
     )
 
     vehicles = [Vehicle(mocked_config, id, dummy_node) for id in range(10)]
+    wait_time = mocked_config.VEHICLE_STOP_WAIT_TIME
+    clear_time = mocked_config.INTERSECTION_CLEAR_TIME
 
     ##################
     # Basic Rotation #
     ##################
 
-    intersct = Intersection(mocked_config)
+    intersct = Intersection()
 
-    intersct.enqueue(vehicles[0], Direction.UP)
-    intersct.enqueue(vehicles[1], Direction.RIGHT)
-    intersct.enqueue(vehicles[2], Direction.DOWN)
-    intersct.enqueue(vehicles[3], Direction.LEFT)
-    intersct.enqueue(vehicles[4], Direction.UP)
+    intersct.enqueue(vehicles[0], Direction.UP, wait_time)
+    intersct.enqueue(vehicles[1], Direction.RIGHT, wait_time)
+    intersct.enqueue(vehicles[2], Direction.DOWN, wait_time)
+    intersct.enqueue(vehicles[3], Direction.LEFT, wait_time)
+    intersct.enqueue(vehicles[4], Direction.UP, wait_time)
 
     # Step start
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 2, 1, 1, 1)
 
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 2, 1, 1, 1)
 
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 2, 1, 1, 1)
 
     # Elapsed: vehicle_stop_wait_time
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 1, 1, 1, 1)
     assert intersct._last_dequeue_dir == Direction.UP
     assert intersct._clear_timer == mocked_config.INTERSECTION_CLEAR_TIME
 
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 1, 1, 1, 1)
 
     # Elapsed: intersection_clear_time
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 1, 0, 1, 1)
 
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 1, 0, 1, 1)
 
     # Elapsed: intersection_clear_time
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 1, 0, 0, 1)
 
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 1, 0, 0, 1)
 
     # Elapsed: intersection_clear_time
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 1, 0, 0, 0)
 
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 1, 0, 0, 0)
 
     # Elapsed: intersection_clear_time
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 0, 0, 0, 0)
 
     _assert_intersct_wait_timers(intersct, 0, 0, 0, 0)
@@ -105,84 +107,84 @@ def test_intersection():
     # Complex Rotation #
     ####################
 
-    intersct = Intersection(mocked_config)
+    intersct = Intersection()
 
-    intersct.enqueue(vehicles[0], Direction.DOWN)
+    intersct.enqueue(vehicles[0], Direction.DOWN, wait_time)
 
     # Step start
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 0, 0, 1, 0)
 
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 0, 0, 1, 0)
 
-    intersct.enqueue(vehicles[1], Direction.LEFT)
+    intersct.enqueue(vehicles[1], Direction.LEFT, wait_time)
 
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 0, 0, 1, 1)
 
-    intersct.enqueue(vehicles[2], Direction.UP)
-    intersct.enqueue(vehicles[3], Direction.RIGHT)
+    intersct.enqueue(vehicles[2], Direction.UP, wait_time)
+    intersct.enqueue(vehicles[3], Direction.RIGHT, wait_time)
 
     # Elapsed: vehicle_stop_wait_time
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 1, 1, 0, 1)
 
-    intersct.enqueue(vehicles[4], Direction.UP)
+    intersct.enqueue(vehicles[4], Direction.UP, wait_time)
 
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 2, 1, 0, 1)
 
-    intersct.enqueue(vehicles[5], Direction.DOWN)
-    intersct.enqueue(vehicles[6], Direction.LEFT)
+    intersct.enqueue(vehicles[5], Direction.DOWN, wait_time)
+    intersct.enqueue(vehicles[6], Direction.LEFT, wait_time)
 
     # Elapsed: intersection_clear_time
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 2, 1, 1, 1)
 
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 2, 1, 1, 1)
 
     # Elapsed: intersection_clear_time
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 1, 1, 1, 1)
 
-    intersct.enqueue(vehicles[7], Direction.DOWN)
+    intersct.enqueue(vehicles[7], Direction.DOWN, wait_time)
 
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 1, 1, 2, 1)
 
     # Elapsed: intersection_clear_time
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 1, 0, 2, 1)
 
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 1, 0, 2, 1)
 
     # Elapsed: intersection_clear_time
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 1, 0, 1, 1)
 
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 1, 0, 1, 1)
 
     # Elapsed: intersection_clear_time
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 1, 0, 1, 0)
 
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 1, 0, 1, 0)
 
     # Elapsed: intersection_clear_time
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 0, 0, 1, 0)
 
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 0, 0, 1, 0)
 
     # Elapsed: intersection_clear_time
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 0, 0, 0, 0)
 
-    intersct.step(0.5, vehicles)
+    intersct.step(0.5, vehicles, wait_time, clear_time)
     _assert_intersct_queue_lengths(intersct, 0, 0, 0, 0)
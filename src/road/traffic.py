@@ -1,7 +1,10 @@
+import heapq
+import itertools
+import math
 from collections import deque
-from typing import Dict, List, Tuple
+from typing import Dict, List, Sequence, Set, Tuple
 
-from pygame import Rect
+import numpy as np
 
 from .common import (
     Direction,
@@ -10,49 +13,481 @@ from .common import (
     Updateable,
     world_coords_to_grid_index,
 )
-from .grid import RoadSegmentNode
+from .grid import NextHopRoute, RoadSegmentNode
+from .meso import MesoscopicTraffic
+from .paths import EMPTY_PATH, PathTable, TravelPath
+from .stats import INTERSECTION_STATS_DTYPE, IntersectionStats
+from instrumentation import Instrumentation
 from physics import pathing
 from physics.collision import Collidable, CollisionTracker
+from physics.rect import Rect
+
+
+# Per-vehicle state returned by `Traffic.snapshot()`
+VEHICLE_STATE_DTYPE = np.dtype(
+    [("id", np.int32), ("x", np.float32), ("y", np.float32), ("waiting", "?")]
+)
 
 
 class Traffic(Updateable):
-    """A class for managing all vehicle traffic"""
+    """A class for managing all vehicle traffic
 
-    # Counter to track next vehicle id
-    vehicle_ids = -1
+    event_driven - instead of moving every vehicle every step, predict when
+                   each vehicle reaches its next node and only step vehicles
+                   as they arrive. Positions are interpolated when read.
+    """
 
-    def __init__(self, config, collision_tracker: CollisionTracker):
+    def __init__(
+        self,
+        config,
+        collision_tracker: CollisionTracker,
+        instruments: Instrumentation = None,
+        event_driven: bool = False,
+    ):
         self.config = config
+        # Passed to vehicles, rather than each holding the config
+        self.vehicle_radius = config.VEHICLE_RADIUS
 
-        self.vehicles = []
+        self.vehicles: Dict[int, Vehicle] = {}  # id: vehicle
         self.updates = []
+        # Travel paths of all vehicles, shared between vehicles
+        self.paths = PathTable()
+        # Whether updates include the collision state of vehicles
+        self.display_collisions = config.DEBUG.DISPLAY_VEHICLE_COLLISIONS
+        # Counter to track next vehicle id
+        self.vehicle_ids = -1
+
+        # Simulated time, in seconds
+        self.time = 0
+
+        # Event driven stepping
+        self.event_driven = event_driven
+        # Edge each moving vehicle is traveling, left from (x, y)
+        # {id: (start time, arrival time, x, y), ..}
+        self._legs: Dict[int, Tuple[float, float, float, float]] = {}
+        # Heap of (arrival time, tiebreak, vehicle id). Entries are stale
+        # unless their time matches the vehicle's arrival time in `_legs`.
+        self._arrivals = []
+        self._arrival_counter = itertools.count()
+
+        # Level of detail
+        # Tiles where vehicles are simulated microscopically, as a bool array
+        # of the grid's shape, or None for everywhere
+        self.focus: np.ndarray = None
+        # Vehicles simulated microscopically. The rest are in `self.meso`.
+        # Without a focus this is `self.vehicles` itself, to save memory.
+        self.micro: Dict[int, Vehicle] = self.vehicles  # id: vehicle
+        self.meso = MesoscopicTraffic(config)
+
+        # Microscopic vehicles that are moving. Vehicles waiting at
+        # intersections or without a path sleep, skipped by stepping,
+        # collision tracking and updates, until released or given a path.
+        self.awake: Dict[int, Vehicle] = {}  # id: vehicle
 
         self.collision_tracker = collision_tracker
 
         self.inscts: Dict(Tuple(int, int), Intersection) = {}  # (r, c): insct
+        # Running statistics of every intersection vehicles queued at. Kept
+        # after their roads are removed.
+        self.insct_stats: Dict[Tuple[int, int], IntersectionStats] = {}
+
+        # Live congestion, for routing
+        # Number of vehicles traveling each edge
+        self.edge_occupancy: Dict[
+            Tuple[RoadSegmentNode, RoadSegmentNode], int
+        ] = {}
+        # Nodes whose outgoing edges' congestion changed since last read
+        self.congestion_changes: Set[RoadSegmentNode] = set()
+        # Ids of vehicles that stopped at the end of their path since last
+        # read
+        self.arrivals: Set[int] = set()
+
+        # Instrumentation
+        instruments = instruments or Instrumentation()
+        self._insct_step_timer = instruments.timer("intersection_step")
+        self._vehicle_step_timer = instruments.timer("vehicle_step")
+        self._meso_step_timer = instruments.timer("meso_step")
+        self._collision_timer = instruments.timer("collision_upsert")
+        self._get_updates_timer = instruments.timer("traffic_get_updates")
+        self._collision_checks = instruments.counter("collision_checks")
+        self._vehicles_moved = instruments.counter("vehicles_moved")
+        self._vehicles_arrived = instruments.counter("vehicles_arrived")
+        self._queued_vehicles = instruments.gauge("queued_vehicles")
+        self._meso_vehicles = instruments.gauge("meso_vehicles")
 
     def add_vehicle(self, node: RoadSegmentNode):
         """Add vehicle to traffic list"""
         id = self.vehicle_ids = self.vehicle_ids + 1
         v = Vehicle(self.config, id, node)
         x, y = v._world_coords
-        self.vehicles.append(v)
+        self.vehicles[id] = v
+        if self._in_focus(v):
+            self.micro[id] = v
+            self.collision_tracker.upsert_object(
+                id, v.get_collision_rect(self.vehicle_radius)
+            )
+        else:
+            self.meso.add(v)
         self.updates.append((Update.ADDED, (v._id, x, y)))
         return v
 
+    def remove_vehicle(self, vehicle):
+        """Remove vehicle from traffic"""
+        self._stop(vehicle)
+        del self.vehicles[vehicle._id]
+        if vehicle._id in self.meso:
+            self.meso.remove(vehicle)
+        else:
+            self.micro.pop(vehicle._id, None)
+            self.awake.pop(vehicle._id, None)
+            self.collision_tracker.remove_object(vehicle._id)
+
+        if vehicle._waiting_at_insct:
+            node = vehicle._last_t_node
+            self.inscts[node.tile_index].queues[node.dir].remove(vehicle._id)
+            self.insct_stats[node.tile_index].left(
+                vehicle._id, node.dir, self.time
+            )
+
+        vehicle.set_path(EMPTY_PATH)
+        self._update_occupancy(vehicle)
+        self.arrivals.discard(vehicle._id)
+
+        x, y = vehicle._world_coords
+        self.updates.append((Update.REMOVED, (vehicle._id, x, y)))
+
+    def remove_road(self, r, c, nodes: Set[RoadSegmentNode]):
+        """Update traffic after the road at (r, c) was removed.
+
+        Vehicles at or travelling to removed nodes are removed. Vehicles
+        whose paths lead through removed nodes stop before the first one,
+        and vehicles sent to a removed destination stop at their next node.
+
+        nodes - travel nodes removed with the road
+        returns: vehicles whose paths were cut short
+        """
+        detoured = []
+        for v in list(self.vehicles.values()):
+            if v._last_t_node in nodes or v._t_node in nodes:
+                self.remove_vehicle(v)
+            elif isinstance(v._route, NextHopRoute):
+                # Next hops avoid removed nodes once the table is rebuilt
+                if v._route.destination in nodes:
+                    self.set_vehicle_path(v, (v._t_node,) if v._t_node else ())
+                    detoured.append(v)
+            elif not nodes.isdisjoint(v.path):
+                path = v.path
+                for i, node in enumerate(path):
+                    if node in nodes:
+                        break
+                self.set_vehicle_path(v, path[:i])
+                detoured.append(v)
+
+        self.inscts.pop((r, c), None)
+        self.meso.remove_road(r, c, nodes)
+        return detoured
+
+    def set_vehicle_path(self, vehicle, path: Sequence[RoadSegmentNode]):
+        """Set a vehicle's travel path, shared with any other vehicle on the
+        same path. See `Vehicle.set_path()`.
+        """
+        self._stop(vehicle)
+        if not isinstance(path, NextHopRoute):
+            path = self.paths.intern(path)
+        vehicle.set_path(path)
+        self._update_occupancy(vehicle)
+        if vehicle._id in self.meso:
+            self.meso.path_changed(vehicle)
+        elif not vehicle._waiting_at_insct:
+            self._depart(vehicle, self.time)
+            self.awake[vehicle._id] = vehicle
+
+    def set_focus(self, focus: np.ndarray):
+        """Simulate vehicles microscopically only on tiles where focus is
+        True. None simulates every vehicle microscopically.
+
+        Vehicles in focus are promoted right away. Moving vehicles leaving
+        focus are demoted when they next reach a node.
+        """
+        self.focus = focus
+        if focus is not None and self.micro is self.vehicles:
+            self.micro = dict(self.vehicles)
+        for v in list(self.meso.vehicles.values()):
+            if self._in_focus(v):
+                self._promote(v)
+                self._depart(v, self.time)
+        for v in list(self.micro.values()):
+            if v._t_node is None and not self._in_focus(v):
+                self._demote(v)
+        if focus is None:
+            self.micro = self.vehicles
+
+    def _in_focus(self, vehicle) -> bool:
+        """Whether either end of vehicle's current edge is in focus"""
+        focus = self.focus
+        if focus is None or focus.item(*vehicle._last_t_node.tile_index):
+            return True
+        t_node = vehicle._t_node
+        return t_node is not None and focus.item(*t_node.tile_index)
+
+    def _promote(self, vehicle):
+        """Switch vehicle to microscopic simulation"""
+        self.meso.remove(vehicle)
+        if vehicle.has_path():
+            vehicle._set_target()
+        self.micro[vehicle._id] = vehicle
+        if vehicle.has_path():
+            self.awake[vehicle._id] = vehicle
+        self.collision_tracker.upsert_object(
+            vehicle._id, vehicle.get_collision_rect(self.vehicle_radius)
+        )
+
+    def _demote(self, vehicle):
+        """Switch vehicle to mesoscopic simulation"""
+        self._stop(vehicle)
+        del self.micro[vehicle._id]
+        self.awake.pop(vehicle._id, None)
+        self.collision_tracker.remove_object(vehicle._id)
+        self.meso.add(vehicle)
+        x, y = vehicle._world_coords
+        self.updates.append((Update.MOVED, (vehicle._id, x, y)))
+
+    def _sleep(self, vehicle):
+        """Post the final position of a vehicle that stopped moving. The
+        caller removes it from `self.awake`.
+        """
+        self.collision_tracker.upsert_object(
+            vehicle._id, vehicle.get_collision_rect(self.vehicle_radius)
+        )
+        x, y = vehicle._world_coords
+        self.updates.append((Update.MOVED, (vehicle._id, x, y)))
+
+    def _depart(self, vehicle, start):
+        """When event driven, schedule vehicle's arrival at its target node,
+        leaving its current location at time `start`.
+        """
+        if not self.event_driven or vehicle._t_node is None:
+            return
+        x, y = vehicle._world_coords
+        t_x, t_y = vehicle._t_node.world_coords
+        arrival = start + math.hypot(t_x - x, t_y - y) / vehicle.speed
+        self._legs[vehicle._id] = (start, arrival, x, y)
+        heapq.heappush(
+            self._arrivals,
+            (arrival, next(self._arrival_counter), vehicle._id),
+        )
+
+    def _stop(self, vehicle):
+        """When event driven, stop vehicle where it is now, cancelling its
+        arrival.
+        """
+        if self._legs:
+            leg = self._legs.pop(vehicle._id, None)
+            if leg is not None:
+                vehicle._world_coords = self._interpolate(vehicle, leg)
+
+    def _interpolate(self, vehicle, leg) -> Tuple[float, float]:
+        """Position of vehicle along its leg at the current time"""
+        start, arrival, x, y = leg
+        if self.time >= arrival:
+            return vehicle._t_node.world_coords
+        frac = (self.time - start) / (arrival - start)
+        t_x, t_y = vehicle._t_node.world_coords
+        return x + (t_x - x) * frac, y + (t_y - y) * frac
+
+    def _sync_positions(self):
+        """When event driven, bring moving vehicles' positions up to date"""
+        vehicles = self.vehicles
+        for id, leg in self._legs.items():
+            v = vehicles[id]
+            v._world_coords = self._interpolate(v, leg)
+
+    def _update_occupancy(self, vehicle):
+        """Move vehicle's contribution to `edge_occupancy` to the edge it's
+        currently traveling, if it changed.
+        """
+        t_node = vehicle._t_node
+        edge = vehicle._edge
+        if (edge[1] if edge else None) is t_node:
+            return
+
+        occupancy = self.edge_occupancy
+        if edge:
+            occupancy[edge] -= 1
+            if not occupancy[edge]:
+                del occupancy[edge]
+            self.congestion_changes.add(edge[0])
+
+        if t_node is not None:
+            edge = (vehicle._last_t_node, t_node)
+            occupancy[edge] = occupancy.get(edge, 0) + 1
+            self.congestion_changes.add(edge[0])
+            vehicle._edge = edge
+        else:
+            vehicle._edge = None
+            self.arrivals.add(vehicle._id)
+
+    def queued_at(self, node: RoadSegmentNode) -> int:
+        """Number of vehicles queued at an intersection's ENTER node"""
+        insct = self.inscts.get(node.tile_index)
+        return len(insct.queues[node.dir]) if insct else 0
+
+    def get_congestion_changes(self) -> Set[RoadSegmentNode]:
+        """Get nodes whose outgoing edges' congestion changed, and clear"""
+        changes = self.congestion_changes
+        self.congestion_changes = set()
+        return changes
+
+    def get_arrivals(self) -> Set[int]:
+        """Get ids of vehicles that stopped at the end of their path, and
+        clear
+        """
+        arrivals = self.arrivals
+        self.arrivals = set()
+        return arrivals
+
     def step(self, tick, grid):
         """Step each vehicle in traffic list"""
-        for insct in self.inscts.values():
-            insct.step(tick, self.vehicles)
-
-        for v in self.vehicles:
+        now = self.time
+        self.time += tick
+        arrived_before = len(self.arrivals)
+
+        wait_time = self.config.VEHICLE_STOP_WAIT_TIME
+        clear_time = self.config.INTERSECTION_CLEAR_TIME
+        with self._insct_step_timer:
+            queued = 0
+            for tile_index, insct in self.inscts.items():
+                released_id = insct.step(
+                    tick, self.vehicles, wait_time, clear_time
+                )
+                if released_id is not None:
+                    released = self.vehicles[released_id]
+                    self.insct_stats[tile_index].released_vehicle(
+                        released_id, released._last_t_node.dir, self.time
+                    )
+                    self.congestion_changes.add(released._last_t_node)
+                    self._depart(released, now)
+                    if released.has_path():
+                        self.awake[released_id] = released
+                queued += insct.queue_length()
+
+        entering = []
+        with self._meso_step_timer:
+            arrived, promote = self.meso.step(tick, grid, self._in_focus)
+            for v in arrived:
+                self._update_occupancy(v)
+                x, y = v._world_coords
+                self.updates.append((Update.MOVED, (v._id, x, y)))
+            for v in promote:
+                self._promote(v)
+                # Stop at the intersection ahead, as if arriving at it
+                node = v._last_t_node
+                if (
+                    v._t_node is not None
+                    and node.node_type == RoadNodeType.ENTER
+                    and grid.tile_type(*node.tile_index).is_intersection()
+                ):
+                    entering.append((v, node.dir))
+                else:
+                    self._depart(v, now)
+
+        leaving = []
+        stopped = []
+        moved = len(arrived)
+        with self._vehicle_step_timer:
+            if self.event_driven:
+                moved += self._step_arrivals(grid, entering, leaving, stopped)
+            else:
+                moved += self._step_vehicles(
+                    tick, grid, entering, leaving, stopped
+                )
+            for v in leaving:
+                self._demote(v)
+
+        # When event driven, collisions of moving vehicles are only tracked
+        # when displayed. See `get_updates()`.
+        if not self.event_driven:
+            self._upsert_collisions()
+
+        awake = self.awake
+        for v, segment_dir in entering:
+            self._add_vehicle_to_insct(v, segment_dir)
+            stopped.append(v)
+        for v in stopped:
+            if awake.pop(v._id, None):
+                self._sleep(v)
+
+        self._vehicles_moved.inc(moved)
+        self._vehicles_arrived.inc(len(self.arrivals) - arrived_before)
+        self._queued_vehicles.set(queued + len(entering))
+        self._meso_vehicles.set(len(self.meso))
+
+    def _step_vehicles(self, tick, grid, entering, leaving, stopped) -> int:
+        """Step every awake vehicle, collecting vehicles entering
+        intersections, leaving focus and reaching their destinations.
+
+        returns: number of vehicles moved
+        """
+        moved = 0
+        focus = self.focus
+        for v in self.awake.values():
+            coords = v._world_coords
+            t_node = v._t_node
             entering_insct, segment_dir = v.step(tick, grid)
+            if v._world_coords != coords:
+                moved += 1
+            if v._t_node is not t_node:
+                self._update_occupancy(v)
+                if focus is not None and not self._in_focus(v):
+                    leaving.append(v)
+                    continue
+            if entering_insct:
+                entering.append((v, segment_dir))
+            elif v._t_node is None:
+                stopped.append(v)
+        return moved
 
-            v_c_obj = v.get_collision_rect()
-            self.collision_tracker.upsert_object(v._id, v_c_obj)
+    def _step_arrivals(self, grid, entering, leaving, stopped) -> int:
+        """Step vehicles arriving at nodes by the current time, and start
+        them towards their next nodes. Collects vehicles entering
+        intersections, leaving focus and reaching their destinations.
 
-            if entering_insct:
-                self._add_vehicle_to_insct(v, segment_dir)
+        returns: number of vehicles moving
+        """
+        legs, arrivals = self._legs, self._arrivals
+        focus = self.focus
+        while arrivals and arrivals[0][0] <= self.time:
+            arrival, _, id = heapq.heappop(arrivals)
+            leg = legs.get(id)
+            if leg is None or leg[1] != arrival:
+                continue
+            del legs[id]
+
+            v = self.vehicles[id]
+            v._world_coords = v._t_node.world_coords
+            entering_insct = v.entering_insct(grid)
+            v._last_t_node = v._t_node
+            v._advance()
+            # Trajectories aren't used when event driven
+            v._t_node = v.next_node()
+            self._update_occupancy(v)
+
+            if focus is not None and not self._in_focus(v):
+                leaving.append(v)
+            elif entering_insct:
+                entering.append((v, v._last_t_node.dir))
+            elif v._t_node is None:
+                stopped.append(v)
+            else:
+                self._depart(v, arrival)
+        return len(legs)
+
+    def _upsert_collisions(self):
+        radius = self.vehicle_radius
+        with self._collision_timer:
+            for v in self.awake.values():
+                v_c_obj = v.get_collision_rect(radius)
+                self.collision_tracker.upsert_object(v._id, v_c_obj)
 
     def _add_vehicle_to_insct(self, vehicle, drctn: Direction):
         r, c = world_coords_to_grid_index(
@@ -62,25 +497,78 @@ class Traffic(Updateable):
         )
 
         if not self.inscts.get((r, c)):
-            self.inscts[(r, c)] = Intersection(self.config)
+            self.inscts[(r, c)] = Intersection()
+        if (r, c) not in self.insct_stats:
+            self.insct_stats[(r, c)] = IntersectionStats(self.time)
 
-        self.inscts[(r, c)].enqueue(vehicle, drctn)
+        self.inscts[(r, c)].enqueue(
+            vehicle, drctn, self.config.VEHICLE_STOP_WAIT_TIME
+        )
+        self.insct_stats[(r, c)].enqueued(vehicle._id, drctn, self.time)
+        self.congestion_changes.add(vehicle._last_t_node)
 
-    def get_updates(self) -> List[Tuple[Update, Tuple[int, float, float]]]:
-        """Get updates and clear updates queue"""
-        updates = self.updates
+    def intersection_stats(self) -> np.ndarray:
+        """Return the running statistics of every intersection as an array
+        of `INTERSECTION_STATS_DTYPE`, as of now.
+        """
+        rows = [
+            (
+                r,
+                c,
+                stats.released,
+                stats.mean_queue(self.time),
+                stats.max_queue,
+                stats.mean_wait(),
+                stats.max_wait,
+                stats.wait_histogram,
+            )
+            for (r, c), stats in self.insct_stats.items()
+        ]
+        return np.array(rows, dtype=INTERSECTION_STATS_DTYPE)
 
-        # For now, always update vehicles
-        for v in self.vehicles:
-            x, y = v._world_coords
-            updates.append((Update.MOVED, (v._id, x, y)))
+    def snapshot(self) -> np.ndarray:
+        """Return id, location and waiting state of every vehicle as an array
+        of `VEHICLE_STATE_DTYPE`.
+        """
+        self._sync_positions()
+        return np.array(
+            [
+                (v._id, *v._world_coords, v._waiting_at_insct)
+                for v in self.vehicles.values()
+            ],
+            dtype=VEHICLE_STATE_DTYPE,
+        )
 
-            if self.config.DEBUG.DISPLAY_VEHICLE_COLLISIONS:
-                collided = self.collision_tracker.has_collision(v._id)
-                updates.append((Update.STATE_CHANGED, (v._id, collided)))
+    def get_updates(self) -> List[Tuple[Update, Tuple[int, float, float]]]:
+        """Get updates and clear updates queue"""
+        with self._get_updates_timer:
+            updates = self.updates
+            display_collisions = self.display_collisions
+            self._sync_positions()
+            if display_collisions and self.event_driven:
+                self._upsert_collisions()
+
+            # Update moving microscopic vehicles. Others post their moves
+            # as they stop, or, if mesoscopic, as they reach nodes.
+            for v in self.awake.values():
+                x, y = v._world_coords
+                updates.append((Update.MOVED, (v._id, x, y)))
+
+            # Vehicles may be hit while stopped, so check them all
+            if display_collisions:
+                has_collision = self.collision_tracker.has_collision
+                for id in self.micro:
+                    updates.append(
+                        (Update.STATE_CHANGED, (id, has_collision(id)))
+                    )
+                self._collision_checks.inc(len(self.micro))
+
+            self.updates = []
+        return updates
 
+    def discard_updates(self):
+        """Clear the updates queue, without posting vehicle moves"""
         self.updates = []
-        return updates
 
 
 class Intersection:
@@ -88,23 +576,21 @@ class Intersection:
     intersection edge nodes in the TravelGraph.
 
     Behaves as if all segment directions have a stop sign.
+
+    Queues and wait timers are indexed by `Direction`.
     """
 
-    def __init__(self, config):
-        self.config = config
+    __slots__ = (
+        "queues",
+        "wait_timers",
+        "_last_dequeue_dir",
+        "_clear_timer",
+    )
 
-        self.queues: Dict(Direction, int) = {
-            Direction.UP: [],  # list of vehicle ids
-            Direction.RIGHT: [],
-            Direction.DOWN: [],
-            Direction.LEFT: [],
-        }
-        self.wait_timers: Dict(Direction, float) = {
-            Direction.UP: 0,
-            Direction.RIGHT: 0,
-            Direction.DOWN: 0,
-            Direction.LEFT: 0,
-        }
+    def __init__(self):
+        # Vehicle ids waiting in each direction
+        self.queues: List[deque] = [deque() for _ in Direction]
+        self.wait_timers: List[float] = [0] * len(Direction)
 
         self._last_dequeue_dir = Direction.LEFT  # so UP goes first
 
@@ -113,30 +599,50 @@ class Intersection:
         # intersection.
         self._clear_timer = 0
 
-    def enqueue(self, vehicle, drctn: Direction):
-        """Add vehicle to direction queue"""
+    def enqueue(self, vehicle, drctn: Direction, wait_time):
+        """Add vehicle to direction queue
+
+        wait_time - seconds the vehicle stops for, if first in the queue
+        """
         if not self.queues[drctn]:
-            self.wait_timers[drctn] = self.config.VEHICLE_STOP_WAIT_TIME
+            self.wait_timers[drctn] = wait_time
         self.queues[drctn].append(vehicle._id)
         vehicle._waiting_at_insct = True
 
-    def _dequeue(self, drctn: Direction, vehicles):
-        """Remove vehicle from direction queue"""
-        vehicle_id = self.queues[drctn].pop(0)
+    def queue_length(self):
+        """Number of vehicles waiting in all direction queues"""
+        return sum(len(queue) for queue in self.queues)
+
+    def _dequeue(self, drctn: Direction, vehicles, wait_time):
+        """Remove vehicle from direction queue
+
+        wait_time - seconds the next vehicle in the queue stops for
+        returns: id of the released vehicle
+        """
+        vehicle_id = self.queues[drctn].popleft()
         vehicles[vehicle_id]._waiting_at_insct = False
 
         if self.queues[drctn]:
-            self.wait_timers[drctn] = self.config.VEHICLE_STOP_WAIT_TIME
+            self.wait_timers[drctn] = wait_time
+
+        return vehicle_id
 
-    def step(self, tick, vehicles):
-        """Release vehicles from their queues, when possible"""
+    def step(self, tick, vehicles, wait_time, clear_time):
+        """Release vehicles from their queues, when possible
 
-        for direction, timer in self.wait_timers.items():
-            self.wait_timers[direction] = max(timer - tick, 0)
+        wait_time  - seconds each vehicle stops for before entering
+        clear_time - seconds a released vehicle takes to clear the
+                     intersection
+        returns: id of the vehicle released, if any
+        """
+
+        wait_timers = self.wait_timers
+        for direction, timer in enumerate(wait_timers):
+            wait_timers[direction] = max(timer - tick, 0)
 
         self._clear_timer = max(self._clear_timer - tick, 0)
         if self._clear_timer > 0:
-            return
+            return None
 
         # Vehicles should enter the intersection in a clockwise rotation.
         # Determine order of directions to let out by rotating our list.
@@ -154,18 +660,31 @@ class Intersection:
                 continue
 
             if self.queues[drctn]:
-                self._dequeue(drctn, vehicles)
+                vehicle_id = self._dequeue(drctn, vehicles, wait_time)
                 self._last_dequeue_dir = drctn
-                self._clear_timer = self.config.INTERSECTION_CLEAR_TIME
-                break
+                self._clear_timer = clear_time
+                return vehicle_id
+
+        return None
 
 
 class Vehicle(Collidable):
     """A Vehicle that travels along the TravelGraph"""
 
-    def __init__(self, config, id, node: RoadSegmentNode):
-        self.config = config
+    __slots__ = (
+        "_id",
+        "speed",
+        "_world_coords",
+        "_route",
+        "_cursor",
+        "_last_t_node",
+        "_t_node",
+        "_trajectory",
+        "_waiting_at_insct",
+        "_edge",
+    )
 
+    def __init__(self, config, id, node: RoadSegmentNode):
         # Attributes
         self._id = id
         self.speed = (
@@ -175,8 +694,10 @@ class Vehicle(Collidable):
         # Location
         self._world_coords = node.world_coords
 
-        # Travel path
-        self._path = []
+        # Travel path or route, shared with other vehicles, and the index of
+        # the next node to travel to
+        self._route = EMPTY_PATH
+        self._cursor = 0
         self._last_t_node = node  # last target node
 
         self._t_node = None  # target node
@@ -185,14 +706,44 @@ class Vehicle(Collidable):
         # Intersection
         self._waiting_at_insct = False
 
-    def set_path(self, path: List[RoadSegmentNode]):
-        """Set travel path for vehicle. This should be a list of nodes where
-        any (path[i], path[i+1]) are connected nodes in a `TravelGraph`.
+        # Edge counted towards `Traffic.edge_occupancy`
+        self._edge = None
+
+    def set_path(self, path: Sequence[RoadSegmentNode]):
+        """Set travel path for vehicle. This should be a sequence of nodes
+        where any (path[i], path[i+1]) are connected nodes in a
+        `TravelGraph`. Pass a `TravelPath` or `NextHopRoute` to share it
+        with other vehicles.
         """
-        self._clear_target()
-        self._path = path
+        if not isinstance(path, (TravelPath, NextHopRoute)):
+            path = TravelPath(tuple(path))
+        self._route = path
+        self._cursor = 0
         self._set_target()
 
+    @property
+    def path(self) -> Tuple[RoadSegmentNode, ...]:
+        """Nodes left to travel to. Copies them, so prefer `has_path()` and
+        `next_node()` in hot loops.
+        """
+        return self._route.remaining(self._cursor, self._last_t_node)
+
+    def has_path(self) -> bool:
+        """Vehicle has nodes left to travel to"""
+        return self.next_node() is not None
+
+    def next_node(self) -> RoadSegmentNode:
+        """Next node to travel to, or None if the path is done"""
+        return self._route.node_at(self._cursor, self._last_t_node)
+
+    def destination(self) -> RoadSegmentNode:
+        """Last node of the path, or None if there's no path"""
+        return self._route.destination
+
+    def _advance(self):
+        """Move the cursor past the next node. Set `_last_t_node` first."""
+        self._cursor += 1
+
     def _move_towards_target(self, trajectory, max_move_dist):
         """Attempt to move a vehicle a certain distance towards a target
         location.
@@ -211,14 +762,14 @@ class Vehicle(Collidable):
         """Vehicle has a target node and trajectory."""
         return self._t_node is not None and self._trajectory is not None
 
-    def _clear_target(self):
-        """Clear Vehicle target node and trajectory."""
-        self._t_node = None  # target node
-        self._trajectory = None
-
     def _set_target(self):
-        """Set Vehicle target node and trajectory."""
-        self._t_node = self._path[0]
+        """Set Vehicle target node and trajectory, or clear them if the path
+        is done.
+        """
+        self._t_node = self.next_node()
+        if self._t_node is None:
+            self._trajectory = None
+            return
 
         trajectory = pathing.LinearTrajectory(
             *self._world_coords, *self._t_node.world_coords
@@ -236,11 +787,10 @@ class Vehicle(Collidable):
         remaining_move_dist = self.speed * tick
 
         while not self._waiting_at_insct and remaining_move_dist > 0:
-            if not self._path:
-                return False, None
-
             if not self._has_target():
                 self._set_target()
+                if self._t_node is None:
+                    return False, None
 
             # Attempt move towards target
             dist_moved = self._move_towards_target(
@@ -252,12 +802,9 @@ class Vehicle(Collidable):
 
             # Target reached
             if self._world_coords == self._t_node.world_coords:
-                self._last_t_node = self._path.pop(0)
-
-                if self._path:
-                    self._set_target()
-                else:
-                    self._clear_target()
+                self._last_t_node = self._t_node
+                self._advance()
+                self._set_target()
 
             # Target was an intersection
             if entering_insct:
@@ -274,21 +821,11 @@ class Vehicle(Collidable):
             and self._t_node.node_type == RoadNodeType.ENTER
         ):
 
-            r, c = world_coords_to_grid_index(
-                self.config.TILE_WIDTH,
-                self.config.TILE_HEIGHT,
-                *self._world_coords,
-            )
-            return grid.tile_type(r, c).is_intersection()
+            return grid.tile_type(*self._t_node.tile_index).is_intersection()
 
         return False
 
-    def get_collision_rect(self) -> Rect:
+    def get_collision_rect(self, radius) -> Rect:
         """Return collision box for the Vehicle as a Rect."""
         x, y = self._world_coords
-        return Rect(
-            x - self.config.VEHICLE_RADIUS,
-            y - self.config.VEHICLE_RADIUS,
-            2 * self.config.VEHICLE_RADIUS,
-            2 * self.config.VEHICLE_RADIUS,
-        )
+        return Rect(x - radius, y - radius, 2 * radius, 2 * radius)
@@ -0,0 +1,267 @@
+"""Headless, seeded simulation scenarios.
+
+Scenarios build a `RoadNetwork` without a window and step it with a fixed
+tick, so runs with the same scenario and seed are repeatable.
+"""
+
+import random
+from dataclasses import dataclass
+from time import perf_counter_ns
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+from road.demand import Demand
+from road.digraph import NoPathError
+from road.network import RoadNetwork
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """A headless simulation setup
+
+    road_density   - fraction of grid tiles covered by road, grown outwards
+                     from the center of the grid as one connected network
+    trips_per_hour - vehicles spawned by `Demand`, uniformly over all
+                     roads. Trip vehicles are removed once they arrive.
+    focus          - tile rectangles (r0, c0, r1, c1) where vehicles are
+                     simulated microscopically. See
+                     `RoadNetwork.set_focus()`. None for everywhere.
+    event_driven   - step vehicles only as they reach nodes. See `Traffic`.
+    hubs           - if set, vehicles are sent to one of this many random
+                     hub nodes, along next-hop tables, rather than routed
+                     to random nodes. See `RoadNetwork.send_to_hub()`.
+    """
+
+    name: str
+    grid_width: int
+    grid_height: int
+    road_density: float
+    vehicles: int
+    steps: int = 300
+    tick: float = 1 / 60
+    seed: int = 0
+    trips_per_hour: float = 0
+    focus: Tuple[Tuple[int, int, int, int], ...] = None
+    event_driven: bool = False
+    hubs: int = 0
+
+
+@dataclass
+class RunResult:
+    """Outcome of a scenario run
+
+    step_times  - wall time of each `RoadNetwork.step()` call, in seconds
+    frame_times - wall time of each full loop iteration, including path
+                  assignment and `on_step`, in seconds
+    """
+
+    network: RoadNetwork
+    step_times: np.ndarray
+    frame_times: np.ndarray
+
+
+# Named scenarios for profiling and soak runs
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in [
+        # Matches the in-game stress test: a fully paved default-sized grid
+        Scenario("stress", 25, 15, road_density=1.0, vehicles=1000),
+        Scenario("sparse", 25, 15, road_density=0.3, vehicles=200),
+        Scenario("small", 10, 10, road_density=1.0, vehicles=100),
+        Scenario("large", 60, 40, road_density=0.7, vehicles=3000),
+        # As "large", but only a screen-sized region in full detail
+        Scenario(
+            "lod",
+            60,
+            40,
+            road_density=0.7,
+            vehicles=3000,
+            focus=((12, 17, 27, 42),),
+        ),
+        # As "large", stepping vehicles only as they reach nodes
+        Scenario(
+            "events",
+            60,
+            40,
+            road_density=0.7,
+            vehicles=3000,
+            event_driven=True,
+        ),
+        # As "large", with every vehicle headed to one of a few hubs
+        Scenario(
+            "hubs",
+            60,
+            40,
+            road_density=0.7,
+            vehicles=3000,
+            hubs=8,
+        ),
+        Scenario(
+            "demand",
+            25,
+            15,
+            road_density=1.0,
+            vehicles=0,
+            steps=3600,
+            trips_per_hour=100_000,
+        ),
+    ]
+}
+
+
+def build_network(config, scenario: Scenario) -> RoadNetwork:
+    """Build a road network with roads and vehicles for a scenario"""
+    rng = random.Random(f"{scenario.seed}:build")
+    network = RoadNetwork(
+        config,
+        scenario.grid_width,
+        scenario.grid_height,
+        event_driven=scenario.event_driven,
+        collision_cell_size=config.COLLISION_CELL_SIZE,
+        collision_hierarchy=config.COLLISION_HIERARCHY,
+    )
+
+    for r, c in grow_roads(
+        rng,
+        scenario.grid_width,
+        scenario.grid_height,
+        scenario.road_density,
+    ):
+        network.add_road(r, c, restrict_to_neighbors=False)
+    if scenario.focus:
+        network.set_focus(scenario.focus)
+
+    nodes = list(network.graph.G.nodes)
+    for _ in range(scenario.vehicles):
+        network.traffic.add_vehicle(rng.choice(nodes))
+
+    return network
+
+
+def grow_roads(rng, w, h, density) -> List[tuple]:
+    """Return tile indexes of a connected road network covering `density` of
+    a w x h grid, grown outwards from the center in random order.
+    """
+    target = max(1, round(w * h * density))
+    start = (h // 2, w // 2)
+
+    placed = [start]
+    seen = {start}
+    frontier = []
+
+    def extend_frontier(r, c):
+        for n_r, n_c in ((r - 1, c), (r, c + 1), (r + 1, c), (r, c - 1)):
+            if 0 <= n_r < h and 0 <= n_c < w and (n_r, n_c) not in seen:
+                seen.add((n_r, n_c))
+                frontier.append((n_r, n_c))
+
+    extend_frontier(*start)
+    while len(placed) < target and frontier:
+        # Swap-remove a random frontier tile
+        i = rng.randrange(len(frontier))
+        frontier[i], frontier[-1] = frontier[-1], frontier[i]
+        tile = frontier.pop()
+        placed.append(tile)
+        extend_frontier(*tile)
+
+    return placed
+
+
+def assign_random_paths(network, rng: np.random.Generator):
+    """Send every vehicle without a path to a random node. Vehicles that
+    can't reach their node, e.g. after a road removal split the network,
+    stay idle until the next call picks them another.
+
+    Random targets are rarely shared, so vehicles take the shortest path
+    rather than each target keeping a search for congestion repairs.
+    """
+    idle = [v for v in network.traffic.vehicles.values() if not v.has_path()]
+    if idle:
+        targets = network.node_index.sample_uniform(rng, len(idle))
+        for v, target in zip(idle, targets):
+            try:
+                network.send_to(v, target)
+            except NoPathError:
+                continue
+
+
+def assign_hub_paths(network, rng: np.random.Generator, hubs: list):
+    """Send every vehicle without a path to a random hub"""
+    idle = [v for v in network.traffic.vehicles.values() if not v.has_path()]
+    if idle:
+        picks = rng.integers(len(hubs), size=len(idle))
+        for v, i in zip(idle, picks.tolist()):
+            network.send_to_hub(v, hubs[i])
+
+
+def spawn_trips(network, demand: Demand, tick, trips: list):
+    """Remove trip vehicles that arrived, and spawn vehicles for trips
+    starting over the next tick.
+
+    trips - vehicles on trips, updated in place
+    """
+    traffic = network.traffic
+    arrived = [v for v in trips if not v.has_path()]
+    if arrived:
+        for v in arrived:
+            traffic.remove_vehicle(v)
+        trips[:] = [v for v in trips if v.has_path()]
+
+    _, origins, destinations = demand.trips(tick)
+    for origin, destination in zip(origins, destinations):
+        v = traffic.add_vehicle(origin)
+        try:
+            network.router.route(v, destination)
+        except NoPathError:
+            traffic.remove_vehicle(v)
+            continue
+        trips.append(v)
+
+
+def run(
+    config,
+    scenario: Scenario,
+    on_step: Callable[[RoadNetwork, int], None] = None,
+    network: RoadNetwork = None,
+) -> RunResult:
+    """Run a scenario headless for its configured number of steps.
+
+    on_step - called after every step with (network, step)
+    network - network to run, if already built with `build_network()`
+    """
+    rng = np.random.default_rng([scenario.seed, 0])
+    network = network or build_network(config, scenario)
+    demand = None
+    trips = []
+    if scenario.trips_per_hour:
+        demand = Demand.from_zone_weights(
+            network.node_index,
+            scenario.trips_per_hour,
+            seed=[scenario.seed, 1],
+        )
+    hubs = []
+    if scenario.hubs:
+        hubs = network.node_index.sample_uniform(rng, scenario.hubs)
+    step_times = np.empty(scenario.steps)
+    frame_times = np.empty(scenario.steps)
+
+    for step in range(scenario.steps):
+        frame_start = perf_counter_ns()
+        if demand:
+            spawn_trips(network, demand, scenario.tick, trips)
+        if hubs:
+            assign_hub_paths(network, rng, hubs)
+        else:
+            assign_random_paths(network, rng)
+
+        start = perf_counter_ns()
+        network.step(scenario.tick)
+        step_times[step] = (perf_counter_ns() - start) / 1e9
+
+        if on_step:
+            on_step(network, step)
+
+        frame_times[step] = (perf_counter_ns() - frame_start) / 1e9
+
+    return RunResult(network, step_times, frame_times)
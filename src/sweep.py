@@ -0,0 +1,191 @@
+"""Usage: sweep.py [options] <parameter>=<values>...
+       sweep.py --list
+
+Runs a headless scenario once for every combination of parameter values,
+fanned out over a process pool, and prints a table of summary metrics.
+
+Parameters are config fields, e.g. VEHICLE_STOP_WAIT_TIME, or scenario
+fields, e.g. vehicles. Values are comma separated, or start:stop:count for
+count evenly spaced values from start to stop.
+
+Every run builds its own network from a per-run config, in a worker process.
+Each point is run with seeds 0 to --seeds - 1, so runs with the same seed
+share road layouts and trips across points, and differences between points
+come from the parameters alone.
+
+Example:
+  sweep.py VEHICLE_STOP_WAIT_TIME=0.25:1:4 vehicles=250,500,1000
+
+Options:
+  --list              List available scenarios
+  --scenario=<name>   Scenario to sweep [default: stress]
+  --steps=<n>         Override the scenario's step count
+  --seeds=<n>         Runs per point [default: 1]
+  --workers=<n>       Worker processes. Defaults to one per core.
+  --output=<path>     Also write the table as csv to this path
+"""
+
+import csv
+import dataclasses
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List
+
+import numpy as np
+from docopt import docopt
+
+from config import config
+
+import scenarios
+
+
+def parse_parameter(config, scenario, text) -> tuple:
+    """Parse "name=values" into (name, [value, ..]), with values cast to
+    the type of the config or scenario field they override.
+    """
+    name, _, values = text.partition("=")
+    if hasattr(config, name):
+        current = getattr(config, name)
+    elif name in {f.name for f in dataclasses.fields(scenario)}:
+        current = getattr(scenario, name)
+    else:
+        raise ValueError(f"Unknown config or scenario field: {name}")
+
+    if values.count(":") == 2:
+        start, stop, count = values.split(":")
+        points = np.linspace(float(start), float(stop), int(count)).tolist()
+    else:
+        points = values.split(",")
+
+    return name, [_cast(current, v) for v in points]
+
+
+def _cast(current, value):
+    """Cast a parameter value to the type of the field it overrides"""
+    if isinstance(current, bool):
+        return str(value).lower() in ("1", "true", "yes")
+    if isinstance(current, int):
+        return int(float(value))
+    return float(value)
+
+
+def sweep_points(parameters: Dict[str, list]) -> List[dict]:
+    """Return every combination of parameter values"""
+    names = list(parameters)
+    return [
+        dict(zip(names, values))
+        for values in itertools.product(*parameters.values())
+    ]
+
+
+def run_point(config, scenario, overrides: dict) -> dict:
+    """Run scenario with overridden config and scenario fields, returning
+    summary metrics. Runs in a worker process.
+    """
+    scenario_fields = {f.name for f in dataclasses.fields(scenario)}
+    config = dataclasses.replace(
+        config,
+        **{k: v for k, v in overrides.items() if k not in scenario_fields},
+    )
+    scenario = dataclasses.replace(
+        scenario,
+        **{k: v for k, v in overrides.items() if k in scenario_fields},
+    )
+
+    queued = np.empty(scenario.steps)
+
+    def on_step(network, step):
+        queued[step] = network.instruments.gauge("queued_vehicles").value
+
+    result = scenarios.run(config, scenario, on_step=on_step)
+    step_ms = result.step_times * 1000
+    minutes = scenario.steps * scenario.tick / 60
+    arrivals = result.network.instruments.counter("vehicles_arrived").value
+    return {
+        **overrides,
+        "mean_step_ms": step_ms.mean(),
+        "p99_step_ms": np.percentile(step_ms, 99),
+        "arrivals_per_min": arrivals / minutes,
+        "mean_queued": queued.mean(),
+        "max_queued": int(queued.max()),
+    }
+
+
+def run_sweep(
+    config, scenario, points: List[dict], seeds=1, workers=None
+) -> List[dict]:
+    """Run every point with every seed on a process pool. Returns one row
+    per run, in the order of points and seeds.
+    """
+    runs = [
+        {**point, "seed": seed} for point in points for seed in range(seeds)
+    ]
+    rows = [None] * len(runs)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(run_point, config, scenario, run): i
+            for i, run in enumerate(runs)
+        }
+        for n, future in enumerate(as_completed(futures), 1):
+            rows[futures[future]] = future.result()
+            print(f"\r{n}/{len(runs)} runs", end="", file=sys.stderr)
+    print(file=sys.stderr)
+    return rows
+
+
+def format_table(rows: List[dict]) -> str:
+    """Format rows as an aligned text table"""
+    columns = list(rows[0])
+    lines = [columns] + [
+        [
+            f"{row[c]:.3f}" if isinstance(row[c], float) else str(row[c])
+            for c in columns
+        ]
+        for row in rows
+    ]
+    widths = [max(len(line[i]) for line in lines) for i in range(len(columns))]
+    return "\n".join(
+        "  ".join(cell.rjust(w) for cell, w in zip(line, widths))
+        for line in lines
+    )
+
+
+if __name__ == "__main__":
+    arguments = docopt(__doc__)
+
+    if arguments["--list"]:
+        for scenario in scenarios.SCENARIOS.values():
+            print(scenario)
+        sys.exit(0)
+
+    scenario = scenarios.SCENARIOS[arguments["--scenario"]]
+    if arguments["--steps"]:
+        scenario = dataclasses.replace(
+            scenario, steps=int(arguments["--steps"])
+        )
+
+    try:
+        parameters = dict(
+            parse_parameter(config, scenario, text)
+            for text in arguments["<parameter>=<values>"]
+        )
+    except ValueError as e:
+        sys.exit(str(e))
+
+    workers = arguments["--workers"]
+    rows = run_sweep(
+        config,
+        scenario,
+        sweep_points(parameters),
+        seeds=int(arguments["--seeds"]),
+        workers=int(workers) if workers else os.cpu_count(),
+    )
+    print(format_table(rows))
+
+    if arguments["--output"]:
+        with open(arguments["--output"], "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
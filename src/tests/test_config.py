@@ -0,0 +1,72 @@
+import dataclasses
+import pickle
+
+import pytest
+
+from config import Config, DebugConfig, load_config
+
+
+class _Settings(dict):
+    """Stands in for dynaconf settings: items, plus a DEBUG attribute"""
+
+    def __init__(self, values, debug):
+        super().__init__(values)
+        self.DEBUG = debug
+
+
+def _settings():
+    values = {f.name: i for i, f in enumerate(dataclasses.fields(Config))}
+    values.pop("DEBUG")
+    debug = {
+        "DISPLAY_TRAVEL_EDGES": True,
+        "DISPLAY_VEHICLE_COLLISIONS": False,
+    }
+    return _Settings(values, debug)
+
+
+def test_from_settings():
+    settings = _settings()
+    config = Config.from_settings(settings)
+    for name, value in settings.items():
+        assert getattr(config, name) == value
+    assert config.DEBUG == DebugConfig(
+        DISPLAY_TRAVEL_EDGES=True, DISPLAY_VEHICLE_COLLISIONS=False
+    )
+
+    # Every setting is required
+    del settings["REROUTE_BUDGET"]
+    with pytest.raises(KeyError):
+        Config.from_settings(settings)
+
+
+def test_load_config():
+    from dynaconf import settings
+
+    config = load_config()
+    for f in dataclasses.fields(Config):
+        if f.name != "DEBUG":
+            assert getattr(config, f.name) == settings[f.name]
+    for f in dataclasses.fields(DebugConfig):
+        assert getattr(config.DEBUG, f.name) == settings.DEBUG[f.name]
+
+
+def test_frozen():
+    config = Config.from_settings(_settings())
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        config.TILE_WIDTH = 8
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        config.DEBUG.DISPLAY_TRAVEL_EDGES = False
+    # Slots only, so no attributes can be added either
+    assert not hasattr(config, "__dict__")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        config.UNKNOWN = 1
+
+
+def test_pickle():
+    config = Config.from_settings(_settings())
+    unpickled = pickle.loads(pickle.dumps(config))
+    assert unpickled == config
+    assert type(unpickled.DEBUG) is DebugConfig
+    assert unpickled.DEBUG == config.DEBUG
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        unpickled.TILE_WIDTH = 8
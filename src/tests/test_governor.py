@@ -0,0 +1,132 @@
+from governor import FrameGovernor
+from instrumentation import Instrumentation
+
+BUDGET = 10
+
+
+def _governor(calls):
+    governor = FrameGovernor(
+        BUDGET, Instrumentation(), headroom=0.8, smoothing=1, settle_frames=2
+    )
+    for name in ("a", "b"):
+        governor.add(
+            name,
+            shed=lambda name=name: calls.append(("shed", name)),
+            restore=lambda name=name: calls.append(("restore", name)),
+        )
+    return governor
+
+
+def _frames(governor, ms, n=1):
+    for _ in range(n):
+        governor.end_frame(ms * 1e6)
+
+
+def test_shed_order():
+    calls = []
+    governor = _governor(calls)
+    level = governor.instruments.gauge("governor_level")
+
+    _frames(governor, 5, 10)
+    assert governor.level == 0 and not calls
+
+    # Shed in registration order, one change per settle period
+    _frames(governor, 12)
+    assert calls == [("shed", "a")]
+    assert governor.active == ["a"] and governor.is_shed("a")
+    assert not governor.is_shed("b")
+    _frames(governor, 12, 2)
+    assert governor.active == ["a"]
+    _frames(governor, 12)
+    assert calls == [("shed", "a"), ("shed", "b")]
+    assert level.value == 2
+
+    # Nothing left to shed
+    _frames(governor, 12, 10)
+    assert governor.level == 2 and len(calls) == 2
+
+
+def test_settling():
+    calls = []
+    governor = _governor(calls)
+
+    # Time saved is measured once the frame time has settled
+    _frames(governor, 12)
+    _frames(governor, 9)
+    assert "a" not in governor.saved_ms
+    _frames(governor, 7)
+    assert governor.saved_ms == {"a": 5}
+
+    # Frames under budget, but restoring would go over the headroom
+    _frames(governor, 7, 10)
+    assert governor.active == ["a"]
+
+
+def test_restore_with_headroom():
+    calls = []
+    governor = _governor(calls)
+    _frames(governor, 12)
+    _frames(governor, 7, 2)
+    assert governor.saved_ms == {"a": 5}
+
+    # Restored once frames fit within headroom with the saved time added
+    # back: 3.5 + 5 isn't under 0.8 * 10, but 2.5 + 5 is
+    _frames(governor, 3.5, 10)
+    assert governor.active == ["a"]
+    _frames(governor, 2.5)
+    assert governor.active == [] and calls[-1] == ("restore", "a")
+    assert governor.instruments.gauge("governor_level").value == 0
+
+    # Settles before shedding again
+    _frames(governor, 12, 2)
+    assert governor.active == []
+    _frames(governor, 12)
+    assert governor.active == ["a"]
+    assert governor.report() == {
+        "budget_ms": BUDGET,
+        "frame_ms": 12,
+        "phases": {},
+        "active": ["a"],
+        "saved_ms": {"a": 5},
+    }
+
+
+def test_shed_by_phase():
+    calls = []
+    instruments = Instrumentation()
+    governor = FrameGovernor(
+        BUDGET, instruments, headroom=0.8, smoothing=1, settle_frames=2
+    )
+    governor.add_phase("render", ["render_draw"], 0.5)
+    governor.add_phase("step", ["vehicle_step", "collision_upsert"], 0.5)
+    for name, phase in (("render_rate", "render"), ("step_work", "step")):
+        governor.add(
+            name, phase=phase, shed=lambda name=name: calls.append(name)
+        )
+
+    def frame(render_ms, step_ms, collision_ms=0):
+        for timer, ms in (
+            ("render_draw", render_ms),
+            ("vehicle_step", step_ms),
+            ("collision_upsert", collision_ms),
+        ):
+            instruments.timer(timer).last_tick_ns = ms * 1e6
+        governor.end_frame((render_ms + step_ms + collision_ms) * 1e6)
+
+    # Over budget in the step, so step work is shed before the render
+    # rate, though it was registered later
+    frame(2, 6, 3)
+    assert governor.over_budget() == ["step"]
+    assert calls == ["step_work"]
+    assert governor.report()["phases"] == {
+        "render": {"ms": 2, "budget_ms": 5},
+        "step": {"ms": 9, "budget_ms": 5},
+    }
+
+    # Over budget with no phase over its share, e.g. from time spent
+    # outside of phases: shed in registration order
+    frame(1, 1)
+    frame(1, 1)
+    governor.end_frame(12e6)
+    assert governor.over_budget() == []
+    assert governor.active == ["step_work", "render_rate"]
@@ -0,0 +1,123 @@
+import json
+from urllib.request import urlopen
+
+import pytest
+
+import instrumentation
+from instrumentation import Instrumentation
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake `perf_counter_ns()`, advanced by assigning to `clock[0]`"""
+    now = [0]
+    monkeypatch.setattr(instrumentation, "perf_counter_ns", lambda: now[0])
+    return now
+
+
+def _instruments(clock):
+    """Instrumentation with two ticks recorded: 30ns in two calls to
+    "step", then 5ns
+    """
+    instruments = Instrumentation()
+    timer = instruments.timer("step")
+    for start, end in ((0, 10), (20, 40)):
+        clock[0] = start
+        with timer:
+            clock[0] = end
+    instruments.end_tick()
+    clock[0] = 100
+    with timer:
+        clock[0] = 105
+    instruments.end_tick()
+
+    instruments.counter("path_queries").inc()
+    instruments.counter("path_queries").inc(2)
+    instruments.gauge("queued").set(7)
+    instruments.gauge("queued").set(4)
+    return instruments
+
+
+def test_timer(clock):
+    instruments = _instruments(clock)
+    timer = instruments.timer("step")
+    assert instruments.timer("step") is timer
+    assert instruments.ticks == 2
+    assert timer.calls == 3
+    assert timer.total_ns == 35
+    # Per tick times cover every call in the tick
+    assert timer.last_tick_ns == 5
+    assert timer.max_tick_ns == 30
+
+    # A tick without calls counts as zero
+    instruments.end_tick()
+    assert timer.last_tick_ns == 0 and timer.max_tick_ns == 30
+
+
+def test_counter_and_gauge(clock):
+    instruments = _instruments(clock)
+    assert instruments.counter("path_queries").value == 3
+    assert instruments.gauge("queued").value == 4
+    assert instruments.counter("new").value == 0
+
+
+def test_json(clock):
+    instruments = _instruments(clock)
+    assert json.loads(instruments.to_json()) == {
+        "ticks": 2,
+        "phases": {
+            "step": {
+                "calls": 3,
+                "total_seconds": 35e-9,
+                "mean_seconds": pytest.approx(35e-9 / 3),
+                "last_tick_seconds": 5e-9,
+                "max_tick_seconds": 30e-9,
+            }
+        },
+        "counters": {"path_queries": 3},
+        "gauges": {"queued": 4},
+    }
+
+
+def test_prometheus(clock):
+    instruments = _instruments(clock)
+    p = instrumentation.METRIC_PREFIX
+    assert instruments.to_prometheus() == "\n".join(
+        [
+            f"# HELP {p}_ticks_total Ticks completed.",
+            f"# TYPE {p}_ticks_total counter",
+            f"{p}_ticks_total 2",
+            f"# HELP {p}_phase_seconds_total Time spent in phase.",
+            f"# TYPE {p}_phase_seconds_total counter",
+            f'{p}_phase_seconds_total{{phase="step"}} {35e-9}',
+            f"# HELP {p}_phase_calls_total Times phase was entered.",
+            f"# TYPE {p}_phase_calls_total counter",
+            f'{p}_phase_calls_total{{phase="step"}} 3',
+            f"# HELP {p}_phase_last_tick_seconds Phase time last tick.",
+            f"# TYPE {p}_phase_last_tick_seconds gauge",
+            f'{p}_phase_last_tick_seconds{{phase="step"}} {5e-9}',
+            f"# HELP {p}_phase_max_tick_seconds Max phase time in a tick.",
+            f"# TYPE {p}_phase_max_tick_seconds gauge",
+            f'{p}_phase_max_tick_seconds{{phase="step"}} {30e-9}',
+            f"# TYPE {p}_path_queries_total counter",
+            f"{p}_path_queries_total 3",
+            f"# TYPE {p}_queued gauge",
+            f"{p}_queued 4",
+            "",
+        ]
+    )
+
+
+def test_serve(clock):
+    instruments = _instruments(clock)
+    server = instruments.serve(0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        with urlopen(f"{url}/metrics") as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert response.read().decode() == instruments.to_prometheus()
+        with urlopen(f"{url}/metrics.json") as response:
+            assert json.load(response) == instruments.snapshot()
+    finally:
+        server.shutdown()
+        server.server_close()
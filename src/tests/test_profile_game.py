@@ -0,0 +1,133 @@
+import json
+import os
+import time
+from collections import namedtuple
+
+import profile_game
+import scenarios
+from profile_game import MemorySoak, output_memory
+from road.grid import TileGrid
+
+SRC = os.path.dirname(os.path.abspath(profile_game.__file__))
+
+# Stands in for `tracemalloc.Frame`
+Frame = namedtuple("Frame", ["filename", "lineno"])
+
+
+def _frame(path, lineno=1):
+    return Frame(os.path.join(SRC, path), lineno)
+
+
+def test_attribution():
+    soak = MemorySoak(interval=1, warmup=0, tick=1, frames=4)
+    first, last = profile_game._class_lines(
+        os.path.join(SRC, "road/grid.py"), "TileGrid"
+    )
+
+    # Classes take precedence over the rest of their file
+    assert soak._subsystem([_frame("road/grid.py", first + 1)]) == "grid"
+    assert soak._subsystem([_frame("road/grid.py", last + 1)]) == "graph"
+    # The innermost frame in a subsystem wins. Frames run from the oldest.
+    traceback = [
+        _frame("road/traffic.py"),
+        _frame("physics/collision.py"),
+        Frame(__file__, 1),
+    ]
+    assert soak._subsystem(traceback) == "collision"
+    assert soak._subsystem([Frame(__file__, 1)]) == "other"
+
+    with soak:
+        grid = TileGrid(300, 300)
+        soak.on_step(None, 0)
+    usage = soak.snapshots[0]["subsystems"]
+    assert usage["grid"] >= grid.grid.nbytes + grid.masks.nbytes
+
+
+def _allocate():
+    return bytearray(1 << 20)
+
+
+def test_top_growth():
+    soak = MemorySoak(interval=1, warmup=0, tick=1)
+    with soak:
+        soak.on_step(None, 0)
+        kept = _allocate()
+        soak.on_step(None, 1)
+
+    # Attributed to the line that allocated it
+    (top,) = soak.top_growth(1)
+    assert top.size_diff >= len(kept)
+    frame = top.traceback[0]
+    assert frame.filename == __file__
+    assert frame.lineno == _allocate.__code__.co_firstlineno + 1
+
+
+def _growing_soak(warmup, kib_per_min):
+    """Soak with a snapshot every simulated minute, growing kib_per_min
+    once warmed up, after jumping by 10 MiB during warmup
+    """
+    soak = MemorySoak(interval=3600, warmup=warmup, tick=1 / 60)
+    for minute in range(1, 11):
+        step = minute * 3600
+        total = 1 << 20
+        if step >= warmup:
+            total += (10 << 20) + (step - warmup) // 3600 * kib_per_min * 1024
+        soak.snapshots.append(
+            {
+                "step": step,
+                "minutes": minute,
+                "total": total,
+                "subsystems": {"traffic": total},
+            }
+        )
+    return soak
+
+
+def test_growth_threshold(tmp_path):
+    path = tmp_path / "memory.json"
+    soak = _growing_soak(warmup=4 * 3600, kib_per_min=100)
+    growth = soak.growth()
+    assert abs(growth["total"] - 100) < 1e-6
+    assert abs(growth["traffic"] - 100) < 1e-6
+
+    assert not output_memory(soak, 64, path)
+    with open(path) as f:
+        result = json.load(f)
+    assert not result["passed"]
+    assert result["max_growth_kib_per_min"] == 64
+
+    assert output_memory(soak, 128, path)
+    assert output_memory(
+        _growing_soak(warmup=4 * 3600, kib_per_min=0), 0, path
+    )
+
+    # Too few snapshots after warmup to measure, which can't pass
+    soak = _growing_soak(warmup=10 * 3600, kib_per_min=0)
+    assert soak.growth() == {}
+    assert not output_memory(soak, 1e9, path)
+
+
+def test_min_soak_steps():
+    # Snapshots at steps 600, 1200, ..: the first two once warmed up
+    assert profile_game.min_soak_steps(1800, 600) == 2400
+    assert profile_game.min_soak_steps(1700, 600) == 2400
+    assert profile_game.min_soak_steps(0, 600) == 1200
+
+
+def test_frame_times_exclude_snapshots(tmp_path, monkeypatch):
+    scenario = scenarios.Scenario("tiny", 3, 3, 1.0, vehicles=5, steps=4)
+
+    def slow_collect():
+        time.sleep(0.1)
+
+    monkeypatch.setattr(profile_game.gc, "collect", slow_collect)
+    frame_times, _ = profile_game.profile_scenario(
+        scenario,
+        "soak",
+        interval=None,
+        render=False,
+        output_dir=tmp_path,
+        snapshot_interval=2,
+        warmup=0,
+    )
+    assert frame_times.max() < 0.1
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+import scenarios
+from road.digraph import NoPathError
+from road.network import RoadNetwork
+from test_helpers import config
+
+N = 4
+
+
+def _mocked_config():
+    return config.mock_config(
+        tile_width=4,
+        tile_height=4,
+        road_width=2,
+        vehicle_radius=1,
+        vehicle_stop_wait_time=0.1,
+        intersection_clear_time=0.1,
+        reroute_interval=0.5,
+        congestion_vehicle_cost=1,
+        reroute_threshold=0,
+        reroute_budget=2,
+    )
+
+
+def test_assign_random_paths_across_cut():
+    network = RoadNetwork(_mocked_config(), N, N)
+    for r in range(N):
+        for c in range(N):
+            network.add_road(r, c, restrict_to_neighbors=False)
+    inscts = network.graph.intersections
+    west = network.traffic.add_vehicle(inscts[(0, 0)].enter_nodes()[0])
+    east = network.traffic.add_vehicle(inscts[(0, 3)].enter_nodes()[0])
+
+    # Cut the network in two along column 2
+    for r in range(N):
+        network.remove_road(r, 2)
+    with pytest.raises(NoPathError):
+        network.router.route(west, inscts[(3, 3)].exit_nodes()[0])
+    assert not west.has_path()
+
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        scenarios.assign_random_paths(network, rng)
+        for v, cols in ((west, {0, 1}), (east, {3})):
+            if v.has_path():
+                assert v.destination().tile_index[1] in cols
+                network.traffic.set_vehicle_path(v, [])